@@ -1,40 +1,6 @@
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned, FieldError
 from .models import CollectionCode
-import xlrd
-from datetime import datetime
-import pytz
-
-
-def open_book(folder, file):
-    """
-    Open an Excel workbook
-    :param folder: string representing folder path with starting and ending slashes,
-    e.g. '/Users/dnr266/Documents/PaleoCore/projects/Laetoli/csho_versions/'
-    :param file: string representation of the file name, with no slashes, e.g. 'laetoli_csho_1998.xls'
-    :return: Returns an xlrd workbook object
-    """
-    return xlrd.open_workbook(folder+file)
-
-
-def get_max_sheet(book):
-    """
-    Get the sheet in the workbook with the most rows of data
-    :param book: An xlrd book object
-    :return: Returns an xlrd sheet object
-    """
-    row_counts = [s.nrows for s in book.sheets()]  # list of row counts for each sheet
-    max_sheet_index = row_counts.index(max(row_counts))  # find list index for largest sheet
-    sheet = book.sheet_by_index(max_sheet_index)  # return the sheet with the greatest number of rows
-    return sheet
-
-
-def get_header_list(sheet):
-    """
-    Get a list of header row cell values.
-    :param sheet:
-    :return: Returns a list of values from the first row in the sheet.
-    """
-    return [c.value for c in sheet.row(0)]
+from projects.workbooks import open_book, get_max_sheet, get_header_list, convert_date
 
 
 lookup_dict = {
@@ -95,25 +61,3 @@ def validate_header_list(header_list):
         else:
             result = 0
     return result
-
-
-def convert_date(date_cell, date_mode):
-    """
-    Convert the dates in the excel spreadsheets into python datetime objects.
-    The spreadsheet date columns have mixed values, some are strings and others are dates expressed as integers in
-    Excel date format.  This function converts the different formats into a common pythonic representation.
-    :param date_cell:
-    :param date_mode:
-    :return: Returns a python datetime object, with default time.
-    """
-    date_value = None
-    if date_cell.ctype == 1:  # unicode string
-        try:
-            date_format = '%d/%m/%y'
-            date_value = datetime.strptime(date_cell.value, date_format)
-        except ValueError:
-            date_format = '%d/%m/%Y'
-            date_value = datetime.strptime(date_cell.value, date_format)
-    elif date_cell.ctype == 3:
-        date_value = xlrd.xldate_as_datetime(date_cell.value, date_mode)
-    return date_value
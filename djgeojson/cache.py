@@ -0,0 +1,274 @@
+"""
+    Tile cache for ``TiledGeoJSONLayerView`` and ``MVTLayerView``.
+
+    Cached tiles are keyed by model, z/x/y and a digest of the options changing the
+    tile content (properties, srid, ...). Tiles are evicted one by one when a geometry
+    falling in their extent changes, see ``invalidate_geometry``. Only the zoom levels
+    holding cached tiles are evicted, and changes touching more than ``MAX_TILES`` tiles
+    clear the whole model instead.
+
+    Disabled unless configured with the ``GEOJSON_TILE_CACHE`` setting::
+
+        GEOJSON_TILE_CACHE = {
+            'BACKEND': 'djgeojson.cache.DjangoTileCache',  # or 'djgeojson.cache.FileSystemTileCache'
+            'LOCATION': 'default',  # cache alias, or a directory for the filesystem backend
+            'TIMEOUT': None,  # seconds, None for tiles living until invalidated
+            'MAX_ZOOM': 14,  # highest zoom level cached, deeper tiles are always rendered
+            'MAX_TILES': 256,  # tiles evicted one by one on geometry change, above the model is cleared
+            'MODELS': ['mlp.occurrence'],  # models evicted on save and delete, None for all the geometry models
+        }
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+DEFAULT_MAX_ZOOM = 14
+DEFAULT_MAX_TILES = 256
+#: Latitude limit of the spherical mercator tiling
+MAX_LATITUDE = 85.0511287798066
+
+
+def lonlat_to_tile(lon, lat, zoom):
+    """
+    Tile (x, y) containing a WGS84 position at a given zoom level
+    http://wiki.openstreetmap.org/wiki/Slippy_map_tilenames#Lon..2Flat._to_tile_numbers_2
+    """
+    n = 2 ** zoom
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    lat_rad = math.radians(lat)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_for_extent(extent, zoom):
+    """
+    All tiles (x, y) intersecting a WGS84 extent (xmin, ymin, xmax, ymax) at a given zoom level
+    """
+    xmin, ymin, xmax, ymax = extent
+    x_west, y_north = lonlat_to_tile(xmin, ymax, zoom)
+    x_east, y_south = lonlat_to_tile(xmax, ymin, zoom)
+    for x in range(x_west, x_east + 1):
+        for y in range(y_north, y_south + 1):
+            yield x, y
+
+
+def tile_count(extent, zoom):
+    """
+    Number of tiles intersecting a WGS84 extent at a given zoom level, see tiles_for_extent
+    """
+    xmin, ymin, xmax, ymax = extent
+    x_west, y_north = lonlat_to_tile(xmin, ymax, zoom)
+    x_east, y_south = lonlat_to_tile(xmax, ymin, zoom)
+    return (x_east - x_west + 1) * (y_south - y_north + 1)
+
+
+def geometry_extent(geometry):
+    """
+    WGS84 extent of a geometry, None for empty geometries
+    """
+    if geometry is None or geometry.empty:
+        return None
+    if geometry.srid and geometry.srid != 4326:
+        geometry = geometry.transform(4326, clone=True)
+    return geometry.extent
+
+
+def options_digest(**options):
+    """
+    Short digest of the view options changing the content of a tile
+    """
+    encoded = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.md5(encoded.encode('utf-8')).hexdigest()[:12]
+
+
+class BaseTileCache(object):
+
+    def __init__(self, location=None, timeout=None, max_zoom=DEFAULT_MAX_ZOOM, max_tiles=DEFAULT_MAX_TILES,
+                 models=None):
+        self.location = location
+        self.timeout = timeout
+        self.max_zoom = max_zoom
+        self.max_tiles = max_tiles
+        self.models = models  # labels of the models evicted on geometry change, None for all
+
+    def get(self, model_label, z, x, y, variant):
+        raise NotImplementedError
+
+    def set(self, model_label, z, x, y, variant, content):
+        raise NotImplementedError
+
+    def invalidate_tile(self, model_label, z, x, y):
+        raise NotImplementedError
+
+    def clear(self, model_label):
+        raise NotImplementedError
+
+    def cached_zooms(self, model_label):
+        """
+        Zoom levels that may hold cached tiles of a model
+        """
+        raise NotImplementedError
+
+    def invalidate_extents(self, model_label, extents):
+        """
+        Evict, at the cached zoom levels, the tiles intersecting any of the WGS84 extents.
+        The model is cleared instead when more than max_tiles tiles would be evicted.
+        """
+        extents = [extent for extent in extents if extent is not None]
+        zooms = sorted(z for z in self.cached_zooms(model_label) if z <= self.max_zoom)
+        if not extents or not zooms:
+            return
+        if sum(tile_count(extent, z) for extent in extents for z in zooms) > self.max_tiles:
+            self.clear(model_label)
+            return
+        for z in zooms:
+            tiles = set()
+            for extent in extents:
+                tiles.update(tiles_for_extent(extent, z))
+            for x, y in tiles:
+                self.invalidate_tile(model_label, z, x, y)
+
+    def invalidate_geometry(self, model_label, geometry):
+        """
+        Evict the cached tiles whose extent contains the geometry
+        """
+        self.invalidate_extents(model_label, [geometry_extent(geometry)])
+
+
+class DjangoTileCache(BaseTileCache):
+    """
+    Tiles stored in a Django cache (e.g. redis in production).
+
+    Each tile has a version number, bumped on invalidation, so that all variants of a
+    tile are evicted with a single write.
+    """
+    key_prefix = 'djgeojson:tile'
+
+    def __init__(self, location='default', **kwargs):
+        super(DjangoTileCache, self).__init__(location=location, **kwargs)
+        self.cache = caches[location]
+
+    def model_key(self, model_label):
+        return '%s:%s' % (self.key_prefix, model_label)
+
+    def zooms_key(self, model_label):
+        return '%s:zooms' % self.model_key(model_label)
+
+    def tile_key(self, model_label, z, x, y):
+        return '%s:%s:%s:%s:%s' % (self.key_prefix, model_label, z, x, y)
+
+    def content_key(self, model_label, z, x, y, variant):
+        model_key = self.model_key(model_label)
+        tile_key = self.tile_key(model_label, z, x, y)
+        versions = self.cache.get_many([model_key, tile_key])
+        return '%s:%s.%s:%s' % (tile_key, versions.get(model_key, 0), versions.get(tile_key, 0), variant)
+
+    def get(self, model_label, z, x, y, variant):
+        return self.cache.get(self.content_key(model_label, z, x, y, variant))
+
+    def set(self, model_label, z, x, y, variant, content):
+        self.cache.set(self.content_key(model_label, z, x, y, variant), content, self.timeout)
+        zooms = self.cached_zooms(model_label)
+        if z not in zooms:
+            self.cache.set(self.zooms_key(model_label), zooms | {z}, None)
+
+    def cached_zooms(self, model_label):
+        return self.cache.get(self.zooms_key(model_label)) or set()
+
+    def bump(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, None)
+
+    def invalidate_tile(self, model_label, z, x, y):
+        self.bump(self.tile_key(model_label, z, x, y))
+
+    def clear(self, model_label):
+        self.bump(self.model_key(model_label))
+
+
+class FileSystemTileCache(BaseTileCache):
+    """
+    Tiles stored as files, in <location>/<model>/<z>/<x>/<y>/<variant>.tile
+    """
+
+    def __init__(self, location=None, **kwargs):
+        location = location or os.path.join(settings.MEDIA_ROOT, 'tiles')
+        super(FileSystemTileCache, self).__init__(location=location, **kwargs)
+
+    def tile_dir(self, model_label, z, x, y):
+        return os.path.join(self.location, model_label, str(z), str(x), str(y))
+
+    def tile_path(self, model_label, z, x, y, variant):
+        return os.path.join(self.tile_dir(model_label, z, x, y), '%s.tile' % variant)
+
+    def get(self, model_label, z, x, y, variant):
+        path = self.tile_path(model_label, z, x, y, variant)
+        try:
+            if self.timeout is not None and time.time() - os.path.getmtime(path) > self.timeout:
+                return None
+            with open(path, 'rb') as tile_file:
+                return tile_file.read()
+        except (IOError, OSError):
+            return None
+
+    def set(self, model_label, z, x, y, variant, content):
+        path = self.tile_path(model_label, z, x, y, variant)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        # Write then rename, so that readers never get a partial tile
+        tmp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp_path, 'wb') as tile_file:
+            tile_file.write(content)
+        os.rename(tmp_path, path)
+
+    def invalidate_tile(self, model_label, z, x, y):
+        shutil.rmtree(self.tile_dir(model_label, z, x, y), ignore_errors=True)
+
+    def cached_zooms(self, model_label):
+        try:
+            names = os.listdir(os.path.join(self.location, model_label))
+        except OSError:
+            return set()
+        return set(int(name) for name in names if name.isdigit())
+
+    def clear(self, model_label):
+        shutil.rmtree(os.path.join(self.location, model_label), ignore_errors=True)
+
+
+def get_tile_cache():
+    """
+    Tile cache configured by the ``GEOJSON_TILE_CACHE`` setting, None if not configured
+    """
+    config = getattr(settings, 'GEOJSON_TILE_CACHE', None)
+    if not config:
+        return None
+    backend = import_string(config.get('BACKEND', 'djgeojson.cache.DjangoTileCache'))
+    kwargs = dict(timeout=config.get('TIMEOUT'), max_zoom=config.get('MAX_ZOOM', DEFAULT_MAX_ZOOM),
+                  max_tiles=config.get('MAX_TILES', DEFAULT_MAX_TILES), models=config.get('MODELS'))
+    if config.get('LOCATION'):
+        kwargs['location'] = config['LOCATION']
+    return backend(**kwargs)
+
+
+def invalidate_geometry(model, *geometries):
+    """
+    Evict the cached tiles of a model (and of its concrete parents, for multi-table
+    inheritance) containing any of the given geometries.
+    """
+    tile_cache = get_tile_cache()
+    if tile_cache is None:
+        return
+    extents = [geometry_extent(geometry) for geometry in geometries]
+    for each in [model] + list(model._meta.get_parent_list()):
+        if tile_cache.models is None or each._meta.label_lower in tile_cache.models:
+            tile_cache.invalidate_extents(each._meta.label_lower, extents)
@@ -0,0 +1,63 @@
+"""
+    Spatial database functions used to build GeoJSON geometries and vector tiles on the database side.
+"""
+from django.contrib.gis.db.models.functions import GeomOutputGeoFunc, AsGeoJSON, Transform  # NOQA
+from django.contrib.gis.geos import Polygon
+
+
+class Force2D(GeomOutputGeoFunc):
+    function = 'ST_Force2D'
+    arity = 1
+
+
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    function = 'ST_SimplifyPreserveTopology'
+
+    def __init__(self, expression, tolerance, **extra):
+        super(SimplifyPreserveTopology, self).__init__(
+            expression, self._handle_param(tolerance, 'tolerance', (int, float)), **extra)
+
+
+class AsMVTGeom(GeomOutputGeoFunc):
+    """
+    Geometry clipped to the tile bounds and converted to tile coordinate space (PostGIS >= 2.4)
+    """
+    function = 'ST_AsMVTGeom'
+    geom_param_pos = (0, 1)
+
+    def __init__(self, expression, bounds, extent=4096, buffer=256, clip_geom=True, **extra):
+        super(AsMVTGeom, self).__init__(
+            expression, bounds,
+            self._handle_param(extent, 'extent', int),
+            self._handle_param(buffer, 'buffer', int),
+            clip_geom, **extra)
+
+
+def tile_envelope(z, x, y):
+    """
+    Spherical mercator (EPSG:3857) polygon of a z/x/y tile
+    """
+    half_circumference = 20037508.342789244
+    size = 2 * half_circumference / 2 ** z
+    xmin = -half_circumference + x * size
+    ymax = half_circumference - y * size
+    envelope = Polygon.from_bbox((xmin, ymax - size, xmin + size, ymax))
+    envelope.srid = 3857
+    return envelope
+
+
+def geojson_expression(geometry_field, srid, simplify=None, force2d=False, precision=None, bbox=False):
+    """
+    Database expression returning the GeoJSON text of ``geometry_field``, applying the
+    same processing as ``Serializer._handle_geom``: optional force 2D, simplification
+    (in the native srid) and reprojection to ``srid``.
+    """
+    expression = geometry_field
+    if force2d:
+        expression = Force2D(expression)
+    if simplify is not None:
+        expression = SimplifyPreserveTopology(expression, simplify)
+    expression = Transform(expression, srid)
+    if precision is None:
+        return AsGeoJSON(expression, bbox=bbox)
+    return AsGeoJSON(expression, bbox=bbox, precision=precision)
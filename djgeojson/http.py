@@ -1,5 +1,5 @@
 import warnings
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 
 
 class HttpGeoJSONResponse(HttpResponse):
@@ -8,6 +8,18 @@ class HttpGeoJSONResponse(HttpResponse):
         super(HttpGeoJSONResponse, self).__init__(**kwargs)
 
 
+class StreamingHttpGeoJSONResponse(StreamingHttpResponse):
+    def __init__(self, streaming_content=(), **kwargs):
+        kwargs['content_type'] = 'application/geo+json'
+        super(StreamingHttpGeoJSONResponse, self).__init__(streaming_content, **kwargs)
+
+
+class HttpMVTResponse(HttpResponse):
+    def __init__(self, **kwargs):
+        kwargs['content_type'] = 'application/vnd.mapbox-vector-tile'
+        super(HttpMVTResponse, self).__init__(**kwargs)
+
+
 class HttpJSONResponse(HttpGeoJSONResponse):
     def __init__(self, **kwargs):
         warnings.warn("The 'HttpJSONResponse' class was renamed to 'HttpGeoJSONResponse'",
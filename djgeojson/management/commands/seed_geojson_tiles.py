@@ -0,0 +1,55 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from djgeojson.cache import get_tile_cache, geometry_extent, tiles_for_extent
+from djgeojson.views import TiledGeoJSONLayerView
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the GeoJSON tiles of a model for a zoom range into the tile cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='Model label, e.g. mlp.Occurrence')
+        parser.add_argument('--min-zoom', type=int, default=0)
+        parser.add_argument('--max-zoom', type=int, default=14)
+        parser.add_argument('--properties', default='',
+                            help='Comma separated list of properties, as configured in the tile view')
+        parser.add_argument('--srid', type=int, default=TiledGeoJSONLayerView.srid)
+        parser.add_argument('--geometry-field', default=TiledGeoJSONLayerView.geometry_field)
+        parser.add_argument('--clear', action='store_true', help='Drop the cached tiles of the model first')
+
+    def handle(self, *args, **options):
+        tile_cache = get_tile_cache()
+        if tile_cache is None:
+            raise CommandError('No tile cache configured, see the GEOJSON_TILE_CACHE setting.')
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+        if options['clear']:
+            tile_cache.clear(model._meta.label_lower)
+
+        view_options = dict(model=model,
+                            properties=[p for p in options['properties'].split(',') if p],
+                            srid=options['srid'],
+                            geometry_field=options['geometry_field'],
+                            cache_tiles=True)
+
+        # Only seed tiles that contain data
+        extents = [geometry_extent(geom) for geom in
+                   model.objects.exclude(**{options['geometry_field']: None})
+                                .values_list(options['geometry_field'], flat=True).iterator()]
+        extents = [extent for extent in extents if extent is not None]
+
+        # tiles deeper than the cache MAX_ZOOM are never cached
+        for z in range(options['min_zoom'], min(options['max_zoom'], tile_cache.max_zoom) + 1):
+            tiles = set()
+            for extent in extents:
+                tiles.update(tiles_for_extent(extent, z))
+            for x, y in sorted(tiles):
+                # Tile views keep per-request state, use a fresh one for each tile
+                view = TiledGeoJSONLayerView(**view_options)
+                view.args = []
+                view.kwargs = {'z': z, 'x': x, 'y': y}
+                view.render_to_response(context={})
+            self.stdout.write('zoom {}: {} tiles'.format(z, len(tiles)))
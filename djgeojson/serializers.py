@@ -25,6 +25,11 @@ except ImportError:
     from django.db.models.query import QuerySet
     ValuesQuerySet = None
 
+try:
+    from django.db.models.query import ModelIterable
+except ImportError:
+    ModelIterable = None
+
 from django.forms.models import model_to_dict
 from django.core.serializers.python import (_get_model,
                                             Serializer as PythonSerializer,
@@ -32,7 +37,7 @@ from django.core.serializers.python import (_get_model,
 from django.core.serializers.json import DjangoJSONEncoder
 from django.core.serializers.base import SerializationError, DeserializationError
 from django.utils.encoding import smart_text
-from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ImproperlyConfigured, FieldDoesNotExist
 
 try:
     from django.contrib.gis.geos import WKBWriter
@@ -43,12 +48,25 @@ except (ImportError, ImproperlyConfigured):
     from .nogeos import GEOSGeometry
     from .fields import GeometryField
 
+try:
+    from .functions import geojson_expression
+except (ImportError, ImproperlyConfigured):
+    geojson_expression = None
+
 from . import GEOJSON_DEFAULT_SRID
 from .fields import GeoJSONField
 
 
 logger = logging.getLogger(__name__)
 
+#: Options consumed by the serializer itself, everything else is passed to json.dump
+SERIALIZER_OPTIONS = ('stream', 'streaming', 'properties', 'primary_key', 'geometry_field', 'use_natural_keys',
+                      'crs', 'crs_type', 'srid', 'force2d', 'simplify', 'bbox', 'bbox_auto', 'with_modelname',
+                      'precision', 'geojson_in_db')
+
+#: Name of the annotation holding the GeoJSON text computed by the database
+GEOJSON_ANNOTATION = 'geojson_text'
+
 
 def hasattr_lazy(obj, name):
     if isinstance(obj, dict):
@@ -64,6 +82,13 @@ def get_field_remote_field(field):
         return field.remote_field
 
 
+class RawGeoJSON(str):
+    """
+    GeoJSON text produced by the database, spliced as is in the output.
+    """
+    pass
+
+
 class DjangoGeoJSONEncoder(DjangoJSONEncoder):
 
     def default(self, o):
@@ -170,6 +195,7 @@ class Serializer(PythonSerializer):
             self.feature_collection["bbox"] = bbox
 
         self._current = None
+        self._feature_count = 0
 
     def get_crs(self):
         crs = {}
@@ -222,7 +248,7 @@ class Serializer(PythonSerializer):
                 self.handle_field(obj, field)
 
         # Add extra-info for deserializing
-        with_modelname = self.options.pop('with_modelname', True)
+        with_modelname = self.options.get('with_modelname', True)
         if hasattr(obj, '_meta') and with_modelname:
             self._current['properties']['model'] = smart_text(obj._meta)
 
@@ -234,33 +260,68 @@ class Serializer(PythonSerializer):
             else:
                 logger.warn("No GeometryField found in object")
 
-        self.feature_collection["features"].append(self._current)
+        if self.streaming:
+            self.write_feature(self._current)
+        else:
+            self.feature_collection["features"].append(self._current)
         self._current = None
 
     def end_serialization(self):
-        self.options.pop('stream', None)
-        self.options.pop('properties', None)
-        self.options.pop('primary_key', None)
-        self.options.pop('geometry_field', None)
-        self.options.pop('use_natural_keys', None)
-        self.options.pop('crs', None)
-        self.options.pop('srid', None)
-        self.options.pop('force2d', None)
-        self.options.pop('simplify', None)
-        self.options.pop('bbox', None)
-        self.options.pop('bbox_auto', None)
-        self.options.pop('with_modelname', None)
-
         # Optional float precision control
-        precision = self.options.pop('precision', None)
+        precision = self.options.get('precision')
 
         with json_encoder_with_precision(precision, DjangoGeoJSONEncoder) as cls:
-            json.dump(self.feature_collection, self.stream, cls=cls, **self.options)
+            json.dump(self.feature_collection, self.stream, cls=cls, **self.get_json_options())
+
+    def get_json_options(self):
+        """
+        Options left over once the serializer ones are removed, passed as is to json.dump
+        """
+        return dict((key, value) for key, value in iteritems(self.options)
+                    if key not in SERIALIZER_OPTIONS)
+
+    def write_header(self):
+        """
+        Streaming mode: write the feature collection members and open the features array
+        """
+        header = dict((key, value) for key, value in iteritems(self.feature_collection)
+                      if key != 'features')
+        header = self.encode(header)
+        self.stream.write(header[:-1].rstrip() + ', "features": [')
+
+    def write_feature(self, feature):
+        """
+        Streaming mode: encode a single feature and write it right away
+        """
+        if self._feature_count:
+            self.stream.write(', ')
+        geometry = feature.get('geometry')
+        if isinstance(geometry, RawGeoJSON):
+            # Database encoded geometry: splice the text without decoding it
+            feature = dict((key, value) for key, value in iteritems(feature) if key != 'geometry')
+            self.stream.write(self.encode(feature)[:-1].rstrip() + ', "geometry": ' + geometry + '}')
+        else:
+            self.stream.write(self.encode(feature))
+        self._feature_count += 1
+
+    def encode(self, obj):
+        # Not one-shot, like json.dump, so that the float precision hack applies
+        encoder = self._encoder_class(**self.get_json_options())
+        return ''.join(encoder.iterencode(obj))
+
+    def write_footer(self):
+        """
+        Streaming mode: close the features array and the feature collection
+        """
+        self.stream.write(']}')
 
     def _handle_geom(self, value):
         """ Geometry processing (in place), depending on options """
         if value is None:
             geometry = None
+        elif self.geometry_field == GEOJSON_ANNOTATION and isinstance(value, string_types):
+            # Already processed and encoded by the database
+            geometry = RawGeoJSON(value)
         elif isinstance(value, dict) and 'type' in value:
             geometry = value
         else:
@@ -364,27 +425,39 @@ class Serializer(PythonSerializer):
         self._current['properties'][field_name] = values
 
     def serialize_object_list(self, objects):
+        for _ in self.iter_object_list(objects):
+            pass
+
+    def iter_object_list(self, objects):
         if len(objects) == 0:
             return
 
-        # Transform to list of dicts instead of objects
+        # Transform to dicts instead of objects
         if not isinstance(objects[0], dict):
-            values = []
-            for obj in objects:
-                objdict = model_to_dict(obj)
-                # In case geometry is not a DB field
-                if self.geometry_field not in objdict:
-                    objdict[self.geometry_field] = getattr(obj, self.geometry_field)
-                if self.properties:
-                    extras = [f for f in self.properties if hasattr(obj, f)]
-                    for field_name in extras:
-                        objdict[field_name] = getattr(obj, field_name)
-                values.append(objdict)
-            objects = values
-
-        self.serialize_values_queryset(objects)
+            objects = (self.object_to_dict(obj) for obj in objects)
+
+        for obj in self.iter_values_queryset(objects):
+            yield obj
+
+    def object_to_dict(self, obj):
+        objdict = model_to_dict(obj)
+        # In case geometry is not a DB field
+        if self.geometry_field not in objdict:
+            objdict[self.geometry_field] = getattr(obj, self.geometry_field)
+        if self.properties:
+            extras = [f for f in self.properties if hasattr(obj, f)]
+            for field_name in extras:
+                objdict[field_name] = getattr(obj, field_name)
+        return objdict
 
     def serialize_values_queryset(self, queryset):
+        for _ in self.iter_values_queryset(queryset):
+            pass
+
+    def iter_values_queryset(self, queryset):
+        """
+        Serialize dicts one at a time, yielding each object once its feature is complete
+        """
         for obj in queryset:
             self.start_object(obj)
 
@@ -398,16 +471,27 @@ class Serializer(PythonSerializer):
                     self.handle_field(obj, field_name)
 
             self.end_object(obj)
+            yield obj
 
     def serialize_queryset(self, queryset):
+        for _ in self.iter_queryset(queryset):
+            pass
+
+    def iter_queryset(self, queryset):
+        """
+        Serialize model instances one at a time, yielding each object once its feature is complete
+        """
         opts = queryset.model._meta
         local_fields = opts.local_fields
         many_to_many_fields = opts.many_to_many
         reversed_fields = [obj.field for obj in get_all_related_objects(opts)]
         reversed_fields += [obj.field for obj in get_all_related_many_to_many_objects(opts)]
 
+        # Streaming mode does not keep the instances in the queryset result cache
+        objects = queryset.iterator() if self.streaming else queryset
+
         # populate each queryset obj as a feature
-        for obj in queryset:
+        for obj in objects:
             self.start_object(obj)
 
             # handle the geometry field
@@ -444,14 +528,119 @@ class Serializer(PythonSerializer):
                     if self.properties is None or field_name in self.properties:
                         self.handle_reverse_field(obj, field, field_name)
             self.end_object(obj)
+            yield obj
 
-    def serialize(self, queryset, **options):
+    def get_values_fields(self, queryset):
         """
-        Serialize a queryset.
+        Column names to fetch with ``values()`` when the properties are restricted to
+        concrete fields (or annotations) of the queryset model, otherwise None.
         """
+        if ModelIterable is None or getattr(queryset, '_iterable_class', None) is not ModelIterable:
+            return None
+        if not self.properties or self.primary_key:
+            return None
+
+        opts = queryset.model._meta
+        annotations = queryset.query.annotations
+
+        def is_column(name):
+            if name in annotations:
+                return True
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                return False  # dynamic attribute, needs the model instance
+            if not field.concrete or field.many_to_many:
+                return False
+            if field.is_relation and self.use_natural_keys:
+                return False
+            return field.serialize or field.primary_key
+
+        field_names = list(self.properties)
+        if not is_column(self.geometry_field) or not all(is_column(name) for name in field_names):
+            return None
+        return field_names
+
+    def iter_queryset_values(self, queryset, field_names):
+        """
+        Fast path for querysets restricted to a few properties: a single query fetching
+        the primary key, the geometry and the property columns, without building model
+        instances nor querying relations.
+        """
+        model_name = smart_text(queryset.model._meta)
+        with_modelname = self.options.get('with_modelname', True)
+        columns = [self.geometry_field] + [name for name in field_names if name != self.geometry_field]
+        rows = queryset.values('pk', *columns)
+        if self.streaming:
+            rows = rows.iterator()
+
+        for row in rows:
+            self._current = {"type": "Feature", "properties": {}}
+            primary_key = row.pop('pk')
+            if primary_key:
+                self._current['id'] = primary_key
+
+            # handle the geometry field
+            self.handle_field(row, self.geometry_field)
+
+            for field_name in field_names:
+                if field_name != self.geometry_field:
+                    self.handle_field(row, field_name)
+
+            if with_modelname:
+                self._current['properties']['model'] = model_name
+            self.end_object(row)
+            yield row
+
+    def annotate_geojson(self, queryset):
+        """
+        Database-side geometry processing: force 2D, simplification, reprojection,
+        precision and GeoJSON encoding are done by the spatial database (``ST_AsGeoJSON``),
+        the resulting text is then written without being decoded.
+
+        With ``bbox_auto``, the bounding box is a member of the geometry instead of the feature.
+        """
+        if geojson_expression is None:
+            raise ImproperlyConfigured('Database GeoJSON encoding requires GeoDjango.')
+        expression = geojson_expression(self.geometry_field, self.srid,
+                                        simplify=self.options.get('simplify'),
+                                        force2d=self.options.get('force2d'),
+                                        precision=self.options.get('precision'),
+                                        bbox=bool(self.bbox_auto))
+        queryset = queryset.annotate(**{GEOJSON_ANNOTATION: expression})
+        # The geometry column itself is not needed anymore
+        try:
+            if isinstance(queryset.model._meta.get_field(self.geometry_field), GeometryField):
+                queryset = queryset.defer(self.geometry_field)
+        except FieldDoesNotExist:
+            pass
+        self.geometry_field = GEOJSON_ANNOTATION
+        return queryset
+
+    def iter_objects(self, queryset):
+        if ValuesQuerySet is not None and isinstance(queryset, ValuesQuerySet):
+            return self.iter_values_queryset(queryset)
+
+        elif isinstance(queryset, list):
+            return self.iter_object_list(queryset)
+
+        elif isinstance(queryset, QuerySet):
+            if self.geojson_in_db:
+                queryset = self.annotate_geojson(queryset)
+            field_names = self.get_values_fields(queryset)
+            if field_names is not None:
+                return self.iter_queryset_values(queryset, field_names)
+            return self.iter_queryset(queryset)
+
+        return iter(())
+
+    def setup_options(self, options):
         self.options = options
 
         self.stream = options.get("stream", StringIO())
+        self.geojson_in_db = options.get("geojson_in_db", False)
+        # Database encoded geometries can only be written feature by feature
+        self.streaming = options.get("streaming", False) or self.geojson_in_db
         self.primary_key = options.get("primary_key", None)
         self.properties = options.get("properties")
         self.geometry_field = options.get("geometry_field", "geom")
@@ -461,20 +650,79 @@ class Serializer(PythonSerializer):
         self.srid = options.get("srid", GEOJSON_DEFAULT_SRID)
         self.crs = options.get("crs", True)
 
-        self.start_serialization()
-
-        if ValuesQuerySet is not None and isinstance(queryset, ValuesQuerySet):
-            self.serialize_values_queryset(queryset)
+    def serialize(self, queryset, **options):
+        """
+        Serialize a queryset.
 
-        elif isinstance(queryset, list):
-            self.serialize_object_list(queryset)
+        With ``streaming=True`` each feature is written to the stream as soon as it
+        is built, instead of collecting the whole feature collection in memory.
+        """
+        self.setup_options(options)
 
-        elif isinstance(queryset, QuerySet):
-            self.serialize_queryset(queryset)
+        if self.streaming:
+            for _ in self.iter_chunks(queryset):
+                pass
+            return self.getvalue()
 
+        self.start_serialization()
+        for _ in self.iter_objects(queryset):
+            pass
         self.end_serialization()
         return self.getvalue()
 
+    def iterserialize(self, queryset, **options):
+        """
+        Serialize a queryset as a generator of GeoJSON text chunks, one per feature
+        (plus the feature collection header and footer).
+
+        Suitable for ``StreamingHttpResponse``: peak memory does not depend on the
+        number of rows in the queryset.
+        """
+        options['stream'] = ChunkBuffer()
+        options['streaming'] = True
+        self.setup_options(options)
+        return self.iter_chunks(queryset)
+
+    def iter_chunks(self, queryset):
+        # Optional float precision control, kept for the whole serialization
+        precision = self.options.get('precision')
+
+        with json_encoder_with_precision(precision, DjangoGeoJSONEncoder) as cls:
+            self._encoder_class = cls
+            self.start_serialization()
+            self.write_header()
+            for _ in self.iter_objects(queryset):
+                chunk = self.flush()
+                if chunk:
+                    yield chunk
+            self.write_footer()
+            chunk = self.flush()
+            if chunk:
+                yield chunk
+
+    def flush(self):
+        """
+        Streaming mode: pop what was written since the last call, when the stream allows it
+        """
+        if callable(getattr(self.stream, 'flush_chunk', None)):
+            return self.stream.flush_chunk()
+
+
+class ChunkBuffer(object):
+    """
+    Write-only file-like object keeping only the text written since the last ``flush_chunk``.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, value):
+        self.chunks.append(value)
+
+    def flush_chunk(self):
+        chunk = ''.join(self.chunks)
+        self.chunks = []
+        return chunk
+
 
 def Deserializer(stream_or_string, **options):
     """
@@ -1,19 +1,23 @@
 from __future__ import unicode_literals
 
 import json
+import shutil
+import tempfile
+from unittest import mock
 
 import django
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.conf import settings
 from django.core import serializers
 from django.core.exceptions import ValidationError, SuspiciousOperation
 from django.contrib.gis.db import models
-from django.contrib.gis.geos import LineString, Point, GeometryCollection
+from django.contrib.gis.geos import LineString, Point, Polygon, GeometryCollection
 from django.utils.encoding import smart_text
 
 from .templatetags.geojson_tags import geojsonfeature
 from .serializers import Serializer
-from .views import GeoJSONLayerView, TiledGeoJSONLayerView
+from .views import GeoJSONLayerView, TiledGeoJSONLayerView, MVTLayerView
+from .cache import FileSystemTileCache, lonlat_to_tile, tiles_for_extent
 from .fields import GeoJSONField, GeoJSONFormField, GeoJSONValidator
 
 
@@ -241,6 +245,141 @@ class GeoJsonSerializerTest(TestCase):
             })
 
 
+class StreamingSerializerTest(TestCase):
+
+    def assertStreamsLikeSerialize(self, objects, **options):
+        expected = json.loads(Serializer().serialize(objects, **options))
+        streamed = json.loads(''.join(Serializer().iterserialize(objects, **options)))
+        self.assertEqual(streamed, expected)
+
+    def test_basic(self):
+        Route.objects.create(name='green', geom="LINESTRING (0 0, 1 1)")
+        Route.objects.create(name='blue', geom="LINESTRING (0 0, 1 1)")
+        self.assertStreamsLikeSerialize(Route.objects.all(), properties=['name', 'upper_name'])
+
+    def test_yields_one_chunk_per_feature(self):
+        Route.objects.create(name='green', geom="LINESTRING (0 0, 1 1)")
+        Route.objects.create(name='blue', geom="LINESTRING (0 0, 1 1)")
+        chunks = list(Serializer().iterserialize(Route.objects.all(), crs=False))
+        # header + first feature, second feature, footer
+        self.assertEqual(len(chunks), 3)
+
+    def test_empty_queryset(self):
+        chunks = Serializer().iterserialize(Route.objects.none(), crs=False)
+        self.assertEqual(json.loads(''.join(chunks)), {"type": "FeatureCollection", "features": []})
+
+    def test_precision(self):
+        self.assertStreamsLikeSerialize([{'geom': 'SRID=2154;POINT (1 1)'}], precision=2, crs=False)
+
+    def test_simplify(self):
+        self.assertStreamsLikeSerialize([{'geom': 'SRID=4326;LINESTRING (1 1, 1.5 1, 2 3, 3 3)'}],
+                                        simplify=0.5, crs=False)
+
+    def test_force2d(self):
+        self.assertStreamsLikeSerialize([{'geom': 'SRID=4326;POINT Z (1 2 3)'}], force2d=True, crs=False)
+
+    def test_bbox_auto(self):
+        self.assertStreamsLikeSerialize([{'geom': 'SRID=4326;LINESTRING (1 1, 3 3)'}], bbox_auto=True, crs=False)
+
+    def test_crs_and_bbox(self):
+        self.assertStreamsLikeSerialize([{'geom': 'SRID=4326;POINT (1 2)'}], crs_type="name", bbox=[0, 0, 2, 2])
+
+    def test_serialize_with_streaming_option(self):
+        route = Route.objects.create(name='green', geom="LINESTRING (0 0, 1 1)")
+        features = json.loads(Serializer().serialize(Route.objects.all(), streaming=True,
+                                                     properties=['name'], crs=False))
+        self.assertEqual(features['features'][0]['id'], route.pk)
+        self.assertEqual(features['features'][0]['properties']['name'], 'green')
+
+
+class ValuesFastPathTest(TestCase):
+
+    def setUp(self):
+        self.route = Route.objects.create(name='green', geom="LINESTRING (0 0, 1 1)")
+        self.route.countries.add(Country.objects.create(label='FR', geom="POLYGON ((0 0, 0 1, 1 1, 0 0))"))
+        Sign(label='A', route=self.route).save()
+
+    def test_restricted_properties_use_values(self):
+        serializer = Serializer()
+        serializer.setup_options({'properties': ['name']})
+        self.assertEqual(serializer.get_values_fields(Route.objects.all()), ['name'])
+
+    def test_dynamic_properties_use_instances(self):
+        serializer = Serializer()
+        serializer.setup_options({'properties': ['name', 'upper_name']})
+        self.assertIsNone(serializer.get_values_fields(Route.objects.all()))
+
+    def test_unrestricted_properties_use_instances(self):
+        serializer = Serializer()
+        serializer.setup_options({'properties': None})
+        self.assertIsNone(serializer.get_values_fields(Route.objects.all()))
+
+    def test_many_to_many_properties_use_instances(self):
+        serializer = Serializer()
+        serializer.setup_options({'properties': ['name', 'countries']})
+        self.assertIsNone(serializer.get_values_fields(Route.objects.all()))
+
+    def test_geometry_property_uses_instances(self):
+        serializer = Serializer()
+        serializer.setup_options({'properties': ['label']})
+        self.assertIsNone(serializer.get_values_fields(Sign.objects.all()))
+
+    def test_single_query(self):
+        Route.objects.create(name='blue', geom="LINESTRING (0 0, 1 1)")
+        with self.assertNumQueries(1):
+            Serializer().serialize(Route.objects.all(), properties=['name'])
+
+    def test_same_output_as_instances(self):
+        features = json.loads(Serializer().serialize(Route.objects.all(), properties=['name', 'id']))
+        self.assertEqual(features['features'], [{
+            "geometry": {"type": "LineString", "coordinates": [[0.0, 0.0], [1.0, 1.0]]},
+            "type": "Feature",
+            "properties": {"model": "djgeojson.route", "name": "green", "id": self.route.pk},
+            "id": self.route.pk}])
+
+    def test_properties_mapping(self):
+        features = json.loads(Serializer().serialize(Route.objects.all(), properties={'name': 'label'},
+                                                     with_modelname=False))
+        self.assertEqual(features['features'][0]['properties'], {'label': 'green'})
+
+
+class DatabaseGeoJSONTest(TestCase):
+
+    def setUp(self):
+        self.route = Route.objects.create(name='green', geom="LINESTRING (1 1, 1.5 1, 2 3, 3 3)")
+
+    def test_same_geometry_as_python(self):
+        expected = json.loads(Serializer().serialize(Route.objects.all(), properties=['name']))
+        features = json.loads(Serializer().serialize(Route.objects.all(), properties=['name'],
+                                                     geojson_in_db=True))
+        self.assertEqual(features, expected)
+
+    def test_instances_path(self):
+        features = json.loads(Serializer().serialize(Route.objects.all(), properties=['name', 'upper_name'],
+                                                     geojson_in_db=True, crs=False))
+        self.assertEqual(features['features'][0]['properties']['upper_name'], 'GREEN')
+        self.assertEqual(features['features'][0]['geometry']['coordinates'],
+                         [[1.0, 1.0], [1.5, 1.0], [2.0, 3.0], [3.0, 3.0]])
+
+    def test_simplify(self):
+        features = json.loads(Serializer().serialize(Route.objects.all(), properties=['name'],
+                                                     geojson_in_db=True, simplify=0.5, crs=False))
+        self.assertEqual(features['features'][0]['geometry']['coordinates'],
+                         [[1.0, 1.0], [2.0, 3.0], [3.0, 3.0]])
+
+    def test_srid_and_precision(self):
+        features = json.loads(Serializer().serialize(Route.objects.all(), properties=['name'],
+                                                     geojson_in_db=True, srid=3857, precision=0, crs=False))
+        self.assertEqual(features['features'][0]['geometry']['coordinates'][0], [111319, 111325])
+
+    def test_view_option(self):
+        view = GeoJSONLayerView(model=Route, properties=['name'], geojson_in_db=True)
+        view.object_list = []
+        response = view.render_to_response(context={})
+        geojson = json.loads(smart_text(response.content))
+        self.assertEqual(geojson['features'][0]['properties']['name'], 'green')
+
+
 class ForeignKeyTest(TestCase):
 
     def setUp(self):
@@ -520,6 +659,26 @@ class ViewsTest(TestCase):
         self.assertEqual(geojson['features'][0]['properties']['route'],
                          'green')
 
+    def test_view_streaming(self):
+        class StreamingGeoJSON(GeoJSONLayerView):
+            properties = ['name']
+            streaming = True
+        view = StreamingGeoJSON(model=Route)
+        view.object_list = []
+        response = view.render_to_response(context={})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        geojson = json.loads(smart_text(b''.join(response.streaming_content)))
+        self.assertEqual(geojson['features'][0]['properties']['name'],
+                         'green')
+
+    def test_view_crs_can_be_disabled(self):
+        view = GeoJSONLayerView(model=Route, crs=False)
+        view.object_list = []
+        response = view.render_to_response(context={})
+        geojson = json.loads(smart_text(response.content))
+        self.assertNotIn('crs', geojson)
+
 
 class TileEnvelopTest(TestCase):
     def setUp(self):
@@ -661,6 +820,118 @@ class TiledGeoJSONViewTest(TestCase):
         self.assertEqual(self.view.simplify, 200)
 
 
+class MVTLayerViewTest(TestCase):
+    def setUp(self):
+        self.view = MVTLayerView(model=Route, properties=['name'])
+        self.view.args = []
+        Route.objects.create(name='green', geom=LineString((0, 1), (10, 1)))
+
+    def test_content_type(self):
+        self.view.kwargs = {'z': 4, 'x': 8, 'y': 7}
+        response = self.view.render_to_response(context={})
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+
+    def test_tile_with_features(self):
+        self.view.kwargs = {'z': 4, 'x': 8, 'y': 7}
+        response = self.view.render_to_response(context={})
+        self.assertTrue(len(response.content) > 0)
+        # layer name and property values are stored as plain strings in the protobuf
+        self.assertIn(b'route', response.content)
+        self.assertIn(b'green', response.content)
+
+    def test_empty_tile(self):
+        self.view.kwargs = {'z': 4, 'x': 6, 'y': 8}
+        response = self.view.render_to_response(context={})
+        self.assertNotIn(b'green', response.content)
+
+    def test_features_in_buffer(self):
+        # the tile spans 0 to 22.5 degrees of longitude, its buffer 1.4 degrees more
+        Route.objects.create(name='blue', geom=LineString((23, 5), (30, 5)))
+        Route.objects.create(name='red', geom=LineString((25, 5), (30, 5)))
+        self.view.kwargs = {'z': 4, 'x': 8, 'y': 7}
+        response = self.view.render_to_response(context={})
+        self.assertIn(b'blue', response.content)
+        self.assertNotIn(b'red', response.content)
+
+    def test_properties_mapping(self):
+        self.view.properties = {'name': 'label'}
+        self.view.kwargs = {'z': 4, 'x': 8, 'y': 7}
+        response = self.view.render_to_response(context={})
+        self.assertIn(b'label', response.content)
+
+    def test_wrong_tile_parameters(self):
+        self.view.kwargs = {'z': 'a', 'x': 8, 'y': 7}
+        self.assertRaises(SuspiciousOperation, self.view.render_to_response, context={})
+
+
+class TileCacheTest(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.tile_cache = FileSystemTileCache(location=self.location, max_zoom=8)
+
+    def tearDown(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    def test_lonlat_to_tile(self):
+        self.assertEqual(lonlat_to_tile(0.5, 0.5, 4), (8, 7))
+        self.assertEqual(lonlat_to_tile(-179.9, 85, 0), (0, 0))
+
+    def test_tiles_for_extent(self):
+        self.assertEqual(set(tiles_for_extent((-10, -1, 10, 1), 4)), {(7, 7), (7, 8), (8, 7), (8, 8)})
+
+    def test_get_set(self):
+        self.assertIsNone(self.tile_cache.get('djgeojson.route', 4, 8, 7, 'abc'))
+        self.tile_cache.set('djgeojson.route', 4, 8, 7, 'abc', b'{}')
+        self.assertEqual(self.tile_cache.get('djgeojson.route', 4, 8, 7, 'abc'), b'{}')
+
+    def test_invalidate_geometry_evicts_containing_tiles_only(self):
+        self.tile_cache.set('djgeojson.route', 4, 8, 7, 'abc', b'{}')
+        self.tile_cache.set('djgeojson.route', 4, 6, 8, 'abc', b'{}')
+        self.tile_cache.invalidate_geometry('djgeojson.route', Point(1, 1, srid=4326))
+        self.assertIsNone(self.tile_cache.get('djgeojson.route', 4, 8, 7, 'abc'))
+        self.assertEqual(self.tile_cache.get('djgeojson.route', 4, 6, 8, 'abc'), b'{}')
+
+    def test_invalidate_geometry_evicts_cached_zooms_only(self):
+        self.tile_cache.set('djgeojson.route', 4, 8, 7, 'abc', b'{}')
+        self.assertEqual(self.tile_cache.cached_zooms('djgeojson.route'), {4})
+        with mock.patch.object(self.tile_cache, 'invalidate_tile') as invalidate_tile:
+            self.tile_cache.invalidate_geometry('djgeojson.route', Point(1, 1, srid=4326))
+        invalidate_tile.assert_called_once_with('djgeojson.route', 4, 8, 7)
+
+    def test_invalidate_large_extent_clears_model(self):
+        self.tile_cache.max_tiles = 4
+        self.tile_cache.set('djgeojson.route', 4, 8, 7, 'abc', b'{}')
+        self.tile_cache.set('djgeojson.route', 4, 6, 8, 'abc', b'{}')
+        self.tile_cache.invalidate_geometry('djgeojson.route', Polygon.from_bbox((0, 0, 60, 60)))
+        self.assertIsNone(self.tile_cache.get('djgeojson.route', 4, 6, 8, 'abc'))
+
+    def test_clear(self):
+        self.tile_cache.set('djgeojson.route', 4, 8, 7, 'abc', b'{}')
+        self.tile_cache.clear('djgeojson.route')
+        self.assertIsNone(self.tile_cache.get('djgeojson.route', 4, 8, 7, 'abc'))
+
+    def test_tile_variant_depends_on_queryset(self):
+        kwargs = {'z': 4, 'x': 8, 'y': 7}
+        view = TiledGeoJSONLayerView(model=Route, args=[], kwargs=kwargs)
+        filtered = TiledGeoJSONLayerView(queryset=Route.objects.filter(name='green'), args=[], kwargs=kwargs)
+        self.assertNotEqual(view.get_tile_variant(), filtered.get_tile_variant())
+        self.assertNotEqual(view.get_tile_variant(), MVTLayerView(model=Route, args=[], kwargs=kwargs)
+                            .get_tile_variant())
+
+    def test_view_serves_cached_tile(self):
+        Route.objects.create(geom=LineString((0, 1), (10, 1)))
+        tile_cache_setting = {'BACKEND': 'djgeojson.cache.FileSystemTileCache', 'LOCATION': self.location}
+        with override_settings(GEOJSON_TILE_CACHE=tile_cache_setting):
+            view = TiledGeoJSONLayerView(model=Route, cache_tiles=True, args=[], kwargs={'z': 4, 'x': 8, 'y': 7})
+            content = view.render_to_response(context={}).content
+            view = TiledGeoJSONLayerView(model=Route, cache_tiles=True, args=[], kwargs={'z': 4, 'x': 8, 'y': 7})
+            with self.assertNumQueries(0):
+                response = view.render_to_response(context={})
+        self.assertEqual(response.content, content)
+        geojson = json.loads(smart_text(response.content))
+        self.assertEqual(geojson['features'][0]['geometry']['coordinates'], [[0.0, 1.0], [10.0, 1.0]])
+
+
 class Address(models.Model):
     geom = GeoJSONField()
 
@@ -7,10 +7,12 @@ try:
     from django.contrib.gis.db.models.functions import Intersection
 except (ImportError, ImproperlyConfigured):
     Intersection = None
+from django.db import connections
+from django.db.models import F
 from django.views.generic import ListView
 from django.utils.decorators import method_decorator
 from django.views.decorators.gzip import gzip_page
-from django.core.exceptions import SuspiciousOperation
+from django.core.exceptions import EmptyResultSet, SuspiciousOperation
 from django.core.exceptions import ImproperlyConfigured
 
 try:
@@ -26,7 +28,13 @@ try:
 except (ImportError, ImproperlyConfigured):
     from .fields import PointField
 
-from .http import HttpGeoJSONResponse
+try:
+    from .functions import AsMVTGeom, SimplifyPreserveTopology, Transform, tile_envelope
+except (ImportError, ImproperlyConfigured):
+    AsMVTGeom = None
+
+from .http import HttpGeoJSONResponse, StreamingHttpGeoJSONResponse, HttpMVTResponse
+from .cache import get_tile_cache, options_digest
 from .serializers import Serializer as GeoJSONSerializer
 from . import GEOJSON_DEFAULT_SRID
 
@@ -36,6 +44,7 @@ class GeoJSONResponseMixin(object):
     A mixin that can be used to render a GeoJSON response.
     """
     response_class = HttpGeoJSONResponse
+    streaming_response_class = StreamingHttpGeoJSONResponse
     """ Select fields for properties """
     properties = []
     """ Limit float precision """
@@ -52,29 +61,47 @@ class GeoJSONResponseMixin(object):
     bbox = None
     """ bbox auto """
     bbox_auto = False
+    """ Coordinate reference system member (deprecated in RFC 7946 GeoJSON) """
+    crs = True
+    """ Stream features to the client one by one """
+    streaming = False
+    """ Let the spatial database transform, simplify and encode geometries """
+    geojson_in_db = False
 
     use_natural_keys = False
 
     with_modelname = True
 
+    def get_serializer_options(self):
+        return dict(properties=self.properties,
+                    precision=self.precision,
+                    simplify=self.simplify,
+                    srid=self.srid,
+                    geometry_field=self.geometry_field,
+                    force2d=self.force2d,
+                    bbox=self.bbox,
+                    bbox_auto=self.bbox_auto,
+                    crs=self.crs,
+                    geojson_in_db=self.geojson_in_db,
+                    use_natural_keys=self.use_natural_keys,
+                    with_modelname=self.with_modelname)
+
     def render_to_response(self, context, **response_kwargs):
         """
         Returns a JSON response, transforming 'context' to make the payload.
+
+        With ``streaming`` enabled, features are serialized lazily while the
+        response is sent, so memory use does not grow with the queryset size.
         """
         serializer = GeoJSONSerializer()
-        response = self.response_class(**response_kwargs)
         queryset = self.get_queryset()
+        options = self.get_serializer_options()
+
+        if self.streaming:
+            chunks = serializer.iterserialize(queryset, ensure_ascii=False, **options)
+            return self.streaming_response_class(chunks, **response_kwargs)
 
-        options = dict(properties=self.properties,
-                       precision=self.precision,
-                       simplify=self.simplify,
-                       srid=self.srid,
-                       geometry_field=self.geometry_field,
-                       force2d=self.force2d,
-                       bbox=self.bbox,
-                       bbox_auto=self.bbox_auto,
-                       use_natural_keys=self.use_natural_keys,
-                       with_modelname=self.with_modelname)
+        response = self.response_class(**response_kwargs)
         serializer.serialize(queryset, stream=response, ensure_ascii=False,
                              **options)
         return response
@@ -96,6 +123,9 @@ class TiledGeoJSONLayerView(GeoJSONLayerView):
     trim_to_boundary = True
     """Simplify geometries by zoom level (dict <int:float>)"""
     simplifications = None
+    """Cache rendered tiles, see djgeojson.cache"""
+    cache_tiles = False
+    tile_format = 'geojson'
 
     def tile_coord(self, xtile, ytile, zoom):
         """
@@ -124,13 +154,20 @@ class TiledGeoJSONLayerView(GeoJSONLayerView):
                 error_msg = "Tile (z, x, y) parameters could not be processed."
                 raise SuspiciousOperation(error_msg)
 
+    def get_tile_margin(self):
+        """
+        Margin around the tile of the features queried, as a fraction of the tile size
+        """
+        return 0
+
     def get_queryset(self):
         """
         Inspired by Glen Roberton's django-geojson-tiles view
         """
         self.z, self.x, self.y = self._parse_args()
-        nw = self.tile_coord(self.x, self.y, self.z)
-        se = self.tile_coord(self.x + 1, self.y + 1, self.z)
+        margin = self.get_tile_margin()
+        nw = self.tile_coord(self.x - margin, self.y - margin, self.z)
+        se = self.tile_coord(self.x + 1 + margin, self.y + 1 + margin, self.z)
         bbox = Polygon((nw, (se[0], nw[1]),
                        se, (nw[0], se[1]), nw))
         qs = super(TiledGeoJSONLayerView, self).get_queryset()
@@ -160,3 +197,129 @@ class TiledGeoJSONLayerView(GeoJSONLayerView):
             self.geometry_field = 'intersection'
 
         return qs
+
+    def get_tile_cache(self):
+        if not self.cache_tiles:
+            return None
+        return get_tile_cache()
+
+    def get_tile_variant(self):
+        """
+        Digest of the options changing the tile content, part of the cache key. The view class and the query of
+        its queryset are included, so that views of the same model with different filters do not share tiles.
+        """
+        try:
+            query = str(super(TiledGeoJSONLayerView, self).get_queryset().query)
+        except EmptyResultSet:
+            query = None
+        return options_digest(view='%s.%s' % (type(self).__module__, type(self).__qualname__),
+                              query=query,
+                              tile_format=self.tile_format,
+                              properties=self.properties,
+                              srid=self.srid,
+                              geometry_field=self.geometry_field,
+                              precision=self.precision,
+                              simplifications=self.simplifications,
+                              trim_to_boundary=self.trim_to_boundary,
+                              force2d=self.force2d,
+                              bbox_auto=self.bbox_auto,
+                              crs=self.crs,
+                              use_natural_keys=self.use_natural_keys,
+                              with_modelname=self.with_modelname,
+                              geojson_in_db=self.geojson_in_db)
+
+    def render_to_response(self, context, **response_kwargs):
+        """
+        Serve the tile from the tile cache when enabled, rendering and storing it on a miss.
+        """
+        tile_cache = self.get_tile_cache()
+        if tile_cache is None:
+            return super(TiledGeoJSONLayerView, self).render_to_response(context, **response_kwargs)
+
+        z, x, y = self._parse_args()
+        if z > tile_cache.max_zoom:
+            # deeper tiles are not evicted on geometry change, see BaseTileCache.invalidate_extents
+            return self.render_tile(context, **response_kwargs)
+        model = self.model or self.queryset.model
+        key = (model._meta.label_lower, z, x, y, self.get_tile_variant())
+        content = tile_cache.get(*key)
+        if content is None:
+            response = self.render_tile(context, **response_kwargs)
+            content = b''.join(response) if response.streaming else response.content
+            tile_cache.set(*(key + (content,)))
+        return self.response_class(content=content, **response_kwargs)
+
+    def render_tile(self, context, **response_kwargs):
+        return super(TiledGeoJSONLayerView, self).render_to_response(context, **response_kwargs)
+
+
+class MVTLayerView(TiledGeoJSONLayerView):
+    """
+    A generic view to serve a model as Mapbox Vector Tiles, encoded by PostGIS (>= 2.4)
+    with ST_AsMVT. Takes the same ``properties`` and zoom based ``simplifications`` as
+    ``TiledGeoJSONLayerView``; properties must be model fields or annotations.
+    """
+    response_class = HttpMVTResponse
+    tile_format = 'mvt'
+    # ST_AsMVTGeom clips geometries to the tile
+    trim_to_boundary = False
+    """Layer name in the tile, defaults to the model name"""
+    layer_name = None
+    """Tile extent in tile coordinate space"""
+    extent = 4096
+    """Clipping buffer in tile coordinate space"""
+    buffer = 256
+
+    def get_tile_margin(self):
+        # features within the clipping buffer are kept by ST_AsMVTGeom, avoiding seams at the tile edges
+        return float(self.buffer) / self.extent
+
+    def get_property_names(self):
+        """
+        (field, attribute name) pairs for the selected properties
+        """
+        if isinstance(self.properties, dict):
+            return list(self.properties.items())
+        return [(field, field) for field in self.properties or []]
+
+    def get_tile_query(self, queryset):
+        """
+        SQL and params returning the tile as a single bytea value
+        """
+        if AsMVTGeom is None:
+            raise ImproperlyConfigured('Vector tiles require GeoDjango and PostGIS.')
+        envelope = tile_envelope(self.z, self.x, self.y)
+        geometry = self.geometry_field
+        if self.simplify is not None:
+            geometry = SimplifyPreserveTopology(geometry, self.simplify)
+        geometry = AsMVTGeom(Transform(geometry, envelope.srid), envelope,
+                             extent=self.extent, buffer=self.buffer)
+
+        # Positional aliases, model fields cannot be shadowed by annotations
+        properties = self.get_property_names()
+        columns = dict(('_mvt_%s' % i, F(field)) for i, (field, name) in enumerate(properties))
+        columns['_mvt_geom'] = geometry
+        sql, params = queryset.values(**columns).query.sql_with_params()
+
+        quote_name = connections[queryset.db].ops.quote_name
+        renames = ['%s AS %s' % (quote_name('_mvt_%s' % i), quote_name(name))
+                   for i, (field, name) in enumerate(properties)]
+        renames.append('%s AS geom' % quote_name('_mvt_geom'))
+        layer_name = self.layer_name or queryset.model._meta.model_name
+        tile_sql = ('SELECT ST_AsMVT(tile, %%s, %%s, %%s) FROM (SELECT %s FROM (%s) AS features) AS tile'
+                    % (', '.join(renames), sql))
+        return tile_sql, (layer_name, self.extent, 'geom') + tuple(params)
+
+    def render_tile(self, context, **response_kwargs):
+        queryset = self.get_queryset()
+        sql, params = self.get_tile_query(queryset)
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        content = bytes(row[0]) if row and row[0] is not None else b''
+        return self.response_class(content=content, **response_kwargs)
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.get_tile_cache() is None:
+            return self.render_tile(context, **response_kwargs)
+        return super(MVTLayerView, self).render_to_response(context, **response_kwargs)
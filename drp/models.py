@@ -36,26 +36,6 @@ class Taxon(projects.models.Taxon):
         else:
             return self.parent.name
 
-    def full_name(self):
-        if self.parent is None:
-            return self.name
-        elif self.parent.parent is None:
-            return self.name
-        else:
-            return self.parent.full_name() + ", " + self.name
-
-    def full_lineage(self):
-        """
-        Get a list of taxon object representing the full lineage hierarchy
-        :return: list of taxon objects ordered highest rank to lowest
-        """
-        if self.parent is None:
-            return [self]
-        if self.parent.parent is None:
-            return [self]
-        else:
-            return self.parent.full_lineage()+[self]
-
     def __str__(self):
         if self.rank.name == 'Species' and self.parent:
             return "[" + self.rank.name + "] " + self.parent.name + " " + self.name
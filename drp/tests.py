@@ -1,6 +1,8 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from drp.models import Occurrence, Biology, Locality
-from drp.models import Taxon, IdentificationQualifier
+from drp.models import Taxon, TaxonRank, IdentificationQualifier
 from datetime import datetime
 from django.contrib.auth.models import User
 from django.contrib.gis.geos import Point, Polygon
@@ -31,6 +33,28 @@ class LocalityMethodsTests(TestCase):
         self.assertEqual(Locality.objects.count(), starting_record_count+1)
 
 
+class TaxonLineageTests(TestCase):
+    """
+    Test the lineage methods inherited from projects.models.Taxon
+    """
+    def setUp(self):
+        parent = None
+        for ordinal, (rank_name, name) in enumerate([('Root', 'Life'), ('Class', 'Mammalia'), ('Order', 'Primates'),
+                                                     ('Family', 'Hominidae'), ('Genus', 'Australopithecus'),
+                                                     ('Species', 'afarensis')]):
+            rank = TaxonRank.objects.create(name=rank_name, plural=rank_name + 's', ordinal=ordinal)
+            parent = Taxon.objects.create(name=name, parent=parent, rank=rank)
+        self.taxon = parent
+
+    def test_full_lineage(self):
+        taxon = Taxon.objects.get(pk=self.taxon.pk)
+        with CaptureQueriesContext(connection) as queries:
+            full_name = taxon.full_name()
+        self.assertEqual(len(queries), 1)  # the lineage is read from the path, not parent by parent
+        self.assertEqual(full_name, 'Mammalia, Primates, Hominidae, Australopithecus, afarensis')
+        self.assertEqual(taxon.full_lineage()[-1], taxon)
+
+
 # class OccurrenceCreationMethodTests(TestCase):
 #     """
 #     Test Occurrence instance creation and methods
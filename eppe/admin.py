@@ -1,26 +1,8 @@
 from django.contrib import admin
 from .models import Fossil, Locality, Taxon, Identification, Context
-from django.http import StreamingHttpResponse
-import csv
-import os
 import projects.admin
 
 
-class Echo(object):
-    """
-    From the django docs on streaming large csv files
-    https://docs.djangoproject.com/en/1.11/howto/outputting-csv/#streaming-csv-files
-    An object that implement just the write method of the file-like interface.
-    """
-    def write(self, value):
-        """
-        Wrtie the value by returning it, instead of storing in a buffer
-        :param value:
-        :return:
-        """
-        return value
-
-
 # Register your models here.
 
 verbatim_taxon_field_list = [
@@ -106,7 +88,7 @@ class IdentificationInline(admin.TabularInline):
     extra = 1
 
 
-class FossilAdmin(admin.ModelAdmin):
+class FossilAdmin(projects.admin.ExportJobAdminMixin, admin.ModelAdmin):
     def date_discovered(self, obj):
         return obj.date_recorded.strftime("%Y %b %d")
 
@@ -191,116 +173,19 @@ class FossilAdmin(admin.ModelAdmin):
             'problem_remarks': 'problem_comment',
 
         }
-        pseudo_buffer = Echo()
-        writer = csv.writer(pseudo_buffer)
-
-        def get_headers():
-            return mapping_dict.keys()
-
-        # Trick to get foreign key field values
-        # see https://stackoverflow.com/questions/20235807/how-to-get-foreign-key-values-with-getattr-from-models
-        def get_field_value(instance, field):
-            field_path = field.split('.')
-            attr = instance
-            for elem in field_path:
-                try:
-                    attr = getattr(attr, elem)
-                except AttributeError:
-                    return None
-            return attr
-
-        def get_row_data(o, md):
-            row_data = []
-            for key in md:
-                # for each item in the field mapping dict get the db value for that field
-                field_value = get_field_value(o, md[key])
-                if callable(field_value):  # method attribute
-                    row_data.append(field_value())
-                else:
-                    row_data.append(field_value)
-            # Return list without empty strings and Nulls.
-            return ['' if i in [None, False, 'None', 'False'] else i for i in row_data]
-
-        def get_rows(items):
-            yield writer.writerow(get_headers())
-            for item in items:
-                yield writer.writerow(get_row_data(item, mapping_dict))
-
-        response = StreamingHttpResponse(
-            streaming_content=(get_rows(queryset)),
-            content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="DwC_Export.csv"'
-        return response
+        return self.start_export(request, queryset, 'projects.exports.mapped_rows', 'DwC_Export.csv',
+                                 options={'mapping': mapping_dict})
     create_dwc.short_description = 'Download Selected to DwC .csv'
 
     def create_data_csv(self, request, queryset):
         """
-        Export data to csv format.  The LGRP version of this admin action uses StreamingHTTPResponse because it
-        takes ca 155 seconds for the server to query the data, which causes a server timeout using the normal
-        HTTPResponse class. Need to optimize the query to run faster, but in the meantime I implemented the
-        streaming response to prevent the timeout. The lag seems to be caused by the large number of
-        related tables and foreign key relations that need to be followed when exporting the data. The HRP dataset
-        is larger but takes less time to export because it has fewer foreign key relationships. The long-term solution
-        is to separate the export and the download actions, i.e. have the action save the export to a file and then
-        redirect to another webpage showing all the export files available for download.
+        Export data to csv format. The export follows a large number of related tables and takes longer than
+        the server timeout, so it runs in a background job and the file is downloaded from the Export Job admin.
         :param request:
         :param queryset:
         :return:
         """
-        pseudo_buffer = Echo()
-        writer = csv.writer(pseudo_buffer)
-
-        # Fetch model field names. We need to account for data originating from tables, relations and methods.
-        f = Fossil()  # create an empty instance of a specimen object
-        concrete_field_names = f.get_concrete_field_names()  # fetch a list of concrete field names
-        method_field_names = f.method_fields_to_export()  # fetch a list for method field names
-        fk_fields = [field for field in f._meta.get_fields() if field.is_relation]  # get a list of field objects
-        fk_field_names = [field.name for field in fk_fields]  # fetch a list of foreign key field names
-
-        def get_headers():
-            return concrete_field_names + method_field_names + fk_field_names
-
-        def get_fk_values(occurrence, fk):
-            """
-            Get the values associated with a foreign key relation
-            :param occurrence:
-            :param fk:
-            :return:
-            """
-            qs = None
-            return_string = ''
-            try:
-                qs = [obj for obj in getattr(occurrence, fk).all()]  # if fk is one to many try getting all objects
-            except AttributeError:
-                return_string = str(getattr(occurrence, fk))  # if one2one or many2one get single related value
-
-            if qs:
-                try:
-                    # Getting the name of related objects requires calling the file or image object.
-                    # This solution may break if relation is neither file nor image.
-                    return_string = '|'.join([str(os.path.basename(p.image.name)) for p in qs])
-                except AttributeError:
-                    return_string = '|'.join([str(os.path.basename(p.file.name)) for p in qs])
-
-            return return_string
-
-        def get_row_data(o, cfs=concrete_field_names, mfs=method_field_names, fks=fk_field_names):
-            concrete_values = [getattr(o, field) for field in cfs]
-            method_values = [getattr(o, method)() for method in mfs]
-            fk_values = [get_fk_values(o, fk) for fk in fks]
-            row_data = concrete_values + method_values + fk_values
-            return ['' if i in [None, False, 'None', 'False'] else i for i in row_data]  # Replace ''.
-
-        def get_rows(items):
-            yield writer.writerow(get_headers())
-            for item in items:
-                yield writer.writerow(get_row_data(item))
-
-        response = StreamingHttpResponse(
-            streaming_content=(get_rows(queryset)),
-            content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="Fossil_Export.csv"'
-        return response
+        return self.start_export(request, queryset, 'projects.exports.model_rows', 'Fossil_Export.csv')
     create_data_csv.short_description = 'Download Selected to .csv'
 
     class Media:
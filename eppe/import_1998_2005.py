@@ -1,13 +1,16 @@
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned, FieldError
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Concat
 from .models import Fossil, Context
-import xlrd
+from projects.authorities import get_client
+from projects.cleaning import CleaningLog, Replacements, clean_column
+from projects.models import ProjectStatistics
+from projects.workbooks import open_book, get_header_list, WorkbookLoader
 from datetime import datetime
 import pytz
 import re
 from paleocore.settings import PROJECT_ROOT
 import collections
-import idigbio
-import requests
 import string
 
 # Define global variables
@@ -53,38 +56,6 @@ def make_file_string(year):
     return 'laetoli_csho_'+str(year)+'.xls'
 
 
-def open_book(folder, file):
-    """
-    Open an Excel workbook
-    :param folder: string representing folder path with starting and ending slashes,
-    e.g. '/Users/dnr266/Documents/PaleoCore/projects/Laetoli/csho_versions/'
-    :param file: string representation of the file name, with no slashes, e.g. 'laetoli_csho_1998.xls'
-    :return: Returns an xlrd workbook object
-    """
-    return xlrd.open_workbook(folder+file)
-
-
-def get_max_sheet(book):
-    """
-    Get the sheet in the workbook with the most rows of data
-    :param book: An xlrd book object
-    :return: Returns an xlrd sheet object
-    """
-    row_counts = [s.nrows for s in book.sheets()]  # list of row counts for each sheet
-    max_sheet_index = row_counts.index(max(row_counts))  # find list index for largest sheet
-    sheet = book.sheet_by_index(max_sheet_index)  # return the sheet with the greatest number of rows
-    return sheet
-
-
-def get_header_list(sheet):
-    """
-    Get a list of header row cell values.
-    :param sheet:
-    :return: Returns a list of values from the first row in the sheet.
-    """
-    return [c.value for c in sheet.row(0)]
-
-
 # The lookup_dict is used to map column names across the different excel files.
 lookup_dict = {
     'Specimen Number': 'verbatim_specimen_number',
@@ -163,111 +134,38 @@ def validate_all_headers(file_years=YEARS):
             print("Header for {} is NOT valid".format(file))
 
 
-# Functions for processing and reading data from Excel Files
-def convert_date(date_cell, date_mode):
+class CSHOLoader(WorkbookLoader):
     """
-    Convert the dates in the excel spreadsheets into python datetime objects.
-    The spreadsheet date columns have mixed values, some are strings and others are dates expressed as integers in
-    Excel date format.  This function converts the different formats into a common pythonic representation.
-    :param date_cell:
-    :param date_mode:
-    :return: Returns a python datetime object, with default time.
+    Loader of the CSHO workbooks, see import_files
     """
-    date_value = None
-    if date_cell.ctype == 1:  # unicode string
-        try:
-            date_format = '%d/%m/%y'
-            date_value = datetime.strptime(date_cell.value, date_format)
-        except ValueError:
-            date_format = '%d/%m/%Y'
-            date_value = datetime.strptime(date_cell.value, date_format)
-    elif date_cell.ctype == 3:
-        date_value = xlrd.xldate_as_datetime(date_cell.value, date_mode)
-    return date_value
+    def __init__(self, workers=None):
+        super(CSHOLoader, self).__init__(Fossil, lookup_dict, date_fields=['verbatim_date_discovered'],
+                                         required_field='verbatim_specimen_number', workers=workers)
 
+    def build(self, values, extra):
+        fossil = super(CSHOLoader, self).build(values, extra)
+        fossil.catalog_number = fossil.verbatim_specimen_number
+        return fossil
 
-def make_row_dict(book, header_list, row_data_cell_list):
-    """
-    Assumes header row is valid
-    :param book: an excel workbook object
-    :param header_list: a list of column headings
-    :param row_data_cell_list: a list of xl cell data
-    :return: returns a dictionary with Fossil model keys and excel row data as values
+
+def import_files(folder=FOLDER_PATH, year_list=CSHO_YEARS, workers=None):
     """
-    cells_dict = dict(zip(header_list, row_data_cell_list))  # dictionary of cell values
-    try:
-        date_discovered = convert_date(cells_dict['Date Discovered'], book.datemode)  # convert xl dates to datetime
-    except KeyError:  # check for alternate capitalization
-        date_discovered = convert_date(cells_dict['Date discovered'], book.datemode)  # convert xl dates to datetime
-    row_cells_list = list(cells_dict.items())  # list of tuples of dict items
-    # use list comprehension to generate tuples of dict items replacing cell instances with cell values
-    row_values_list = [(i[0], i[1].value) for i in row_cells_list]
-    row_values_dict = dict(row_values_list)  # convert the list back to a dict
-    try:
-        row_values_dict['Date Discovered'] = date_discovered  # replace cell values (text or float) with datetime
-    except KeyError:
-        row_values_dict['Date discovered'] = date_discovered  # replace cell values (text or float) with datetime
-    occurrence_item_list = [(lookup_dict[i[0]], i[1]) for i in row_values_dict.items()]
-    item_dict = dict(occurrence_item_list)
-    if item_dict['verbatim_specimen_number']:
-        item_dict['catalog_number'] = item_dict['verbatim_specimen_number']
-    else:
-        item_dict = None  # no verbatim specimen number signals empty row.
-    return item_dict
-
-
-def import_sheet(year, file, book, header, sheet, header_row=True, verbose=verbose_default):
-    """
-    Import data from an Excel spreadsheet. Skips empty rows.
-    :param year: Integer value for the woorkbook year.
-    :param file: String value containing file name without leading or trailing slashes.
-    :param book: An Excel workbook object
-    :param header: A list of column header names
-    :param sheet: An Excel spreadsheet object
-    :param header_row: header row present or not
-    :param verbose: verbose output desired
-    :return: returns an integer row count and an integer created count. If all goes well the two should match.
-    """
-    created_count = 0
-    starting_row = 1
-    row_count = 0
-    if not header_row:
-        starting_row = 0
-    for row in range(starting_row, sheet.nrows):
-        if verbose:
-            print("processing row {}".format(row_count))
-        row_dict = make_row_dict(book, header, sheet.row(row))
-        if row_dict:
-            row_dict['verbatim_workbook_name'] = file
-            row_dict['verbatim_workbook_year'] = year
-            # specimen_number = row_dict['verbatim_specimen_number']
-            Fossil.objects.create(**row_dict)
-            created_count += 1
-            row_count += 1
-        else:  # if empty row
-            row_count += 1
-            print('skipping blank row {}'.format(row_count))
-    return row_count, created_count
-
-
-def import_file(folder, file, year, verbose=verbose_default):
-    """
-    Procedure to import data from an Excel workbook
-    :param folder: Directory path to workbook as string and with trailing slash, e.g. '/eppe/fixtures/'
-    :param file: File name of workbook including extension, e.g. 'csho_laetoli_1998.xls'
-    :param year: Year of data being imported as integer, e.g. 1998
-    :param verbose: True/False for more verbose output
-    :return:
+    Procedure to import the workbooks of several years. The workbooks are read in parallel and the fossils of each
+    workbook created in bulk, in one transaction per workbook.
+    :param folder: Directory path to the workbooks as string and with trailing slash, e.g. '/eppe/fixtures/'
+    :param year_list: Years of the workbooks, e.g. (1998, 1999)
+    :param workers: Number of processes reading the workbooks, by default one per workbook up to the number of CPUs
+    :return: Returns the list of WorkbookLoadResult, with the counts and rows per second of each workbook
     """
-    print("\nImporting data from {}".format(file))  # Indicate function has started
-    book = open_book(folder, file)  # open the excel workbook
-    sheet = get_max_sheet(book)  # get the sheet from the workbook
-    header = get_header_list(sheet)  # get the header as a list
-    if validate_header_list(header):  # validate the header, make sure all columns are in lookup dictionary
-        rc, cc = import_sheet(year, file, book, header, sheet, verbose=verbose)  # import data from the sheet
-        print("Processed {rc} rows and created {cc} new Fossil objects.".format(rc=rc, cc=cc))
-    else:
-        print('Invalid Header List')
+    workbooks = [(folder + make_file_string(year),
+                  {'verbatim_workbook_name': make_file_string(year), 'verbatim_workbook_year': year})
+                 for year in year_list]
+    results = []
+    for result in CSHOLoader(workers=workers).load(workbooks):
+        print(result)
+        results.append(result)
+    ProjectStatistics.refresh('eppe')  # bulk inserts do not send post_save
+    return results
 
 
 # Function to delete duplicate and incorrect records
@@ -1075,13 +973,54 @@ def update_description():
         f.save()
 
 
-def update_taxon_fields(qs=Fossil.objects.all(), verbose=True):
+parenthetical_re = re.compile(r'[(].+[)]')  # matches anything in parentheses
+
+
+def clean_taxon_string(fs, replace):
+    """
+    Clean a verbatim taxon string, e.g. 'cf. Anacus (?)' => 'Anancus', 'cf.'
+    :param fs: verbatim taxon string
+    :param replace: Replacements fixing random misspellings and typos
+    :return: returns the cleaned taxon string, or None if blank, and the identification qualifier string
+    """
+    idq = None
+    if fs:
+        fs = fs.strip()  # get verbatim value, remove leading and trailing spaces
+        fs = parenthetical_re.sub('', fs)  # remove parenthetical
+        fs = replace(fs)  # fix random misspellings and typos
+        fs, idq = update_idq(fs)  # parse entries for identification qualifiers.
+        # clean any excess whitespace
+        fs = fs.replace('   ', ' ')  # remove triple spaces
+        fs = fs.replace('  ', ' ')  # remove double spaces
+        fs = fs.strip()  # remove leading and trailing spaces
+
+    if fs in ['', ' ', None]:  # convert any blanks to None
+        fs = None
+    return fs, idq
+
+
+def move_to_taxon_remarks(fossils, field_name):
+    """
+    Append the values of a field to the taxon remarks and clear the field, in one update query
+    :return: Returns the number of fossils updated
+    """
+    return fossils.update(**{
+        'taxon_remarks': Case(When(Q(taxon_remarks__isnull=True) | Q(taxon_remarks=''), then=F(field_name)),
+                              default=Concat('taxon_remarks', Value(' '), field_name),
+                              output_field=Fossil._meta.get_field('taxon_remarks')),
+        field_name: None})
+
+
+def update_taxon_fields(qs=Fossil.objects.all(), verbose=True, log_path=None):
     """
     Function to read values from verbatim taxon field (e.g. verbatim_kingdom, etc.) clean the entries and
     write them to the taxonomic fields (e.g. tkingdom). All taxon fields start with 't' to avoid conflicts
     with python keywords (e.g. class, order). The function also updates the
     identification_qualifier field.
-    :return:
+    Each distinct verbatim value is cleaned once and the taxon fields are updated with one query per field,
+    see projects.cleaning.clean_column.
+    :param log_path: optional path of a csv file listing the changes to the taxon fields
+    :return: Returns the CleaningLog of the changes to the taxon fields
     """
     print("Updating taxonomic fields")
     krep = {
@@ -1212,35 +1151,31 @@ def update_taxon_fields(qs=Fossil.objects.all(), verbose=True):
 
     }
 
-    p_re = re.compile(r'[(].+[)]')  # matches anything in parentheses
-
-    def clean_taxon_field(obj, verbatim_taxon_field_name, rep_dict):
+    def clean_taxon_field(verbatim_taxon_field_name, taxon_field_name, rep_dict):
         if verbose:
             print("Cleaning {}".format(verbatim_taxon_field_name))
-        fs = getattr(obj, verbatim_taxon_field_name)  # get value for taxon field
-        if fs:
-            fs = fs.strip()  # get verbatim value, remove leading and trailing spaces
-            fs = p_re.sub('', fs)  # remove parenthetical
-            fs = multireplace(fs, rep_dict)  # fix random misspellings and typos
-            fs, idq = update_idq(fs)  # parse entries for identification qualifiers.
+        replace = Replacements(rep_dict)
+
+        def clean(fs):
+            fs, idq = clean_taxon_string(fs, replace)
+            cleaned = {taxon_field_name: fs}
             if idq:  # if ident. qualifiers are found, update record.
-                setattr(obj, 'identification_qualifier', idq)
-            # clean any excess whitespace
-            fs = fs.replace('   ', ' ')  # remove triple spaces
-            fs = fs.replace('  ', ' ')  # remove double spaces
-            fs = fs.strip()  # remove leading and trailing spaces
-
-        if fs in ['', ' ', None]:  # convert any blanks to None
-            fs = None
-        return fs
-
-    def update_tsubphylum(obj):
-        if obj.tphylum == 'Vertebrata':
-            obj.tsubphylum = obj.tphylum
-            obj.tphylum = 'Chordata'
-        elif obj.tphylum == 'Hexapoda':
-            obj.tsubphylum = obj.tphylum
-            obj.tphylum = 'Arthropoda'
+                cleaned['identification_qualifier'] = idq
+            if taxon_field_name == 'tphylum':
+                update_tsubphylum(cleaned)
+            return cleaned
+        targets = [taxon_field_name, 'identification_qualifier']
+        if taxon_field_name == 'tphylum':
+            targets.append('tsubphylum')
+        return clean_column(qs, verbatim_taxon_field_name, targets, clean)
+
+    def update_tsubphylum(cleaned):
+        if cleaned['tphylum'] == 'Vertebrata':
+            cleaned['tsubphylum'] = cleaned['tphylum']
+            cleaned['tphylum'] = 'Chordata'
+        elif cleaned['tphylum'] == 'Hexapoda':
+            cleaned['tsubphylum'] = cleaned['tphylum']
+            cleaned['tphylum'] = 'Arthropoda'
 
     def clean_higher_taxonomy():
         if verbose:
@@ -1248,21 +1183,17 @@ def update_taxon_fields(qs=Fossil.objects.all(), verbose=True):
 
         # Update Subfamily entries recorded in Family column
         fossils = Fossil.objects.filter(verbatim_family__contains='inae')
-        for f in fossils:
-            f.tsubfamily = f.verbatim_family
-            f.tsubfamily = f.tsubfamily.replace('Cercopithecidae - Colobinae', 'Colobinae')
-            f.taxon_rank = "subfamily"
-            f.save()
+        clean_column(fossils, 'verbatim_family', ['tsubfamily', 'taxon_rank'],
+                     lambda family: {'tsubfamily': family.replace('Cercopithecidae - Colobinae', 'Colobinae'),
+                                     'taxon_rank': 'subfamily'})
 
         # Fix phylum, subphylum for Insectivora
         fixes = Fossil.objects.filter(verbatim_class='Mammalia').filter(verbatim_phylum_subphylum='Arthropoda')
-        fixes.update(tphylum='Chordata')
-        fixes.update(tsubphylum='Vertebrata')
+        fixes.update(tphylum='Chordata', tsubphylum='Vertebrata')
 
         # Fix vertebrate gastropods
         fixes = Fossil.objects.filter(verbatim_class='Gastropoda').filter(verbatim_phylum_subphylum='Vertebrata')
-        fixes.update(tphylum='Mollusca')
-        fixes.update(tsubphylum=None)
+        fixes.update(tphylum='Mollusca', tsubphylum=None)
 
         # Fix missing Order
         fixes = Fossil.objects.filter(verbatim_order='').filter(verbatim_family='Bovidae')
@@ -1274,9 +1205,7 @@ def update_taxon_fields(qs=Fossil.objects.all(), verbose=True):
 
         # Fix mammal coleoptera
         fixes = Fossil.objects.filter(verbatim_class='Mammalia', verbatim_order='Coleoptera')
-        fixes.update(tphylum='Arthropoda')
-        fixes.update(tsubphylum='Hexapoda')
-        fixes.update(tclass='Insecta')
+        fixes.update(tphylum='Arthropoda', tsubphylum='Hexapoda', tclass='Insecta')
 
         # Update bovid tribes where absent
         fixes = Fossil.objects.filter(verbatim_genus__contains='Connochaetes', verbatim_tribe__in=['', ' ', None])
@@ -1311,40 +1240,13 @@ def update_taxon_fields(qs=Fossil.objects.all(), verbose=True):
         f.save()
 
         # Fix EP 1548/98, EP 2265/00  ttribe = 'Hippotragini Or Alcelaphini'
-        fossils = Fossil.objects.filter(ttribe='Hippotraginii Or Alcelaphini')
-        for f in fossils:
-            # move tribe to taxon_remarks
-            if f.taxon_remarks:
-                f.taxon_remarks += ' ' + f.ttribe
-            else:
-                f.taxon_remarks = f.ttribe
-            # clear tribe
-            f.ttribe = None
-            f.save()
+        move_to_taxon_remarks(Fossil.objects.filter(ttribe='Hippotraginii Or Alcelaphini'), 'ttribe')
 
         # Fix EP 2045/00 ttribe = 'Not Neotragini'
-        fossils = Fossil.objects.filter(ttribe='Not Neotragini')
-        for f in fossils:
-            # move tribe to taxon_remarks
-            if f.taxon_remarks:
-                f.taxon_remarks += ' ' + f.ttribe
-            else:
-                f.taxon_remarks = f.ttribe
-            # clear tribe
-            f.ttribe = None
-            f.save()
+        move_to_taxon_remarks(Fossil.objects.filter(ttribe='Not Neotragini'), 'ttribe')
 
         # Fix 5 items with tgenus = 'Antidorcas or Gazella'
-        fossils = Fossil.objects.filter(tgenus='Antidorcas or Gazella')
-        for f in fossils:
-            # move genus to taxon_remarks
-            if f.taxon_remarks:
-                f.taxon_remarks += ' ' + f.tgenus
-            else:
-                f.taxon_remarks = f.tgenus
-            # clear genus
-            f.tgenus = None
-            f.save()
+        move_to_taxon_remarks(Fossil.objects.filter(tgenus='Antidorcas or Gazella'), 'tgenus')
 
         # Fix EP 575/00 genus = Machairodontinae
         ep575 = Fossil.objects.get(catalog_number='EP 575/00')
@@ -1502,28 +1404,27 @@ def update_taxon_fields(qs=Fossil.objects.all(), verbose=True):
                 'description': 'fragment of carapace',
             }
         }
-        for catno in update_dict.keys():
-            if Fossil.objects.filter(catalog_number=catno):
-                fossil = Fossil.objects.get(catalog_number=catno)
-                fossil = update_from_dict(fossil, update_dict[fossil.catalog_number])
-                fossil.save()
-
-    # Update taxon columns
-    for record in qs:  # cleans only records in qs
-        if verbose:
-            print("cleaning taxon fields for {}".format(record.catalog_number))
-        record.tkingdom = clean_taxon_field(record, 'verbatim_kingdom', krep)
-        record.tphylum = clean_taxon_field(record, 'verbatim_phylum_subphylum', krep)
-        update_tsubphylum(record)
-        record.tclass = clean_taxon_field(record, 'verbatim_class', krep)
-        record.torder = clean_taxon_field(record, 'verbatim_order', krep)
-        record.tfamily = clean_taxon_field(record, 'verbatim_family', frep)
-        record.ttribe = clean_taxon_field(record, 'verbatim_tribe', trep)
-        record.tgenus = clean_taxon_field(record, 'verbatim_genus', grep)
-        record.tspecies = clean_taxon_field(record, 'verbatim_species', srep)
-        record.save()
+        for catno, values in update_dict.items():
+            Fossil.objects.filter(catalog_number=catno).update(**values)
+
+    # Update taxon columns, in this order as the identification qualifier of the last field with one is kept
+    log = CleaningLog()
+    log.extend(clean_taxon_field('verbatim_kingdom', 'tkingdom', krep))
+    log.extend(clean_taxon_field('verbatim_phylum_subphylum', 'tphylum', krep))
+    log.extend(clean_taxon_field('verbatim_class', 'tclass', krep))
+    log.extend(clean_taxon_field('verbatim_order', 'torder', krep))
+    log.extend(clean_taxon_field('verbatim_family', 'tfamily', frep))
+    log.extend(clean_taxon_field('verbatim_tribe', 'ttribe', trep))
+    log.extend(clean_taxon_field('verbatim_genus', 'tgenus', grep))
+    log.extend(clean_taxon_field('verbatim_species', 'tspecies', srep))
+    if verbose:
+        for field, count in log.summary().items():
+            print("{} {} values changed".format(count, field))
+    if log_path:
+        log.write_csv(log_path)
     clean_higher_taxonomy()
     fix_unique()  # works on entire DB and fixes specific records
+    return log
 
 
 def update_scientific_name_taxon_rank(qs=Fossil.objects.all()):
@@ -1562,6 +1463,15 @@ def update_scientific_name_taxon_rank(qs=Fossil.objects.all()):
         f.save()
 
 
+# regexes of update_idq, matching all of the following:
+# test_list = ['? major', '?major', 'aff. major', 'Nov. sp.', 'indet', 'Indet.', 'cf.', 'Cf', 'cf. major', 'sp.',
+#             'Sp.', 'sp', 'Sp', ' sp.', 'major sp. nov.', 'sp. A', 'sp. A, sp. B', 'major']
+idqls = re.compile(r'^large sp.$|^small sp.$|[Ii]ndeterminate')
+ndetre = re.compile(r'[Nn]o [Dd]et[.]*[ her]*')
+noidre = re.compile(r'[nN][oO] [iI][dD]')
+idqre = re.compile(r'[sS]p[.]?.*|[cC]f[.]?|[iI]ndet[.]?|Nov[.]?.*|[Aa]ff[.]? |[?]|no det.')
+
+
 def update_idq(rts):
     """
     Function to update the identification qualifier field when appropriate.
@@ -1577,13 +1487,6 @@ def update_idq(rts):
     """
     idq = None
     ts = rts.strip()
-    # regex matches all of the following:
-    # test_list = ['? major', '?major', 'aff. major', 'Nov. sp.', 'indet', 'Indet.', 'cf.', 'Cf', 'cf. major', 'sp.',
-    #             'Sp.', 'sp', 'Sp', ' sp.', 'major sp. nov.', 'sp. A', 'sp. A, sp. B', 'major']
-    idqls = re.compile(r'^large sp.$|^small sp.$|[Ii]ndeterminate')
-    ndetre = re.compile(r'[Nn]o [Dd]et[.]*[ her]*')
-    noidre = re.compile(r'[nN][oO] [iI][dD]')
-    idqre = re.compile(r'[sS]p[.]?.*|[cC]f[.]?|[iI]ndet[.]?|Nov[.]?.*|[Aa]ff[.]? |[?]|no det.')
     if ts:
         if idqls.search(ts):
             idq = ts
@@ -1929,9 +1832,8 @@ def validate_locality(verbose=False):
 
 
 def validate_taxon_name(taxon_name, taxon_rank, verbose=True):
-    api = idigbio.json()
-    r = api.search_records(rq={taxon_rank: taxon_name})
-    if r['itemCount']:
+    r = get_client().idigbio_record(taxon_name, taxon_rank)
+    if r and r['itemCount']:
         if verbose:
             print("{} OK {}".format(taxon_name, r['itemCount']))
     else:
@@ -1941,23 +1843,20 @@ def validate_taxon_name(taxon_name, taxon_rank, verbose=True):
 def validate_taxon_field(taxon_name, verbose=True):
     taxon_field_name = 't'+taxon_name
     # print('Validating {}'.format(taxon_field_name))
-    api = idigbio.json()  # connection to idigbio db
     tlist = [t[0] for t in field_list(taxon_field_name, report=False) if t[0]]  # list of taxon names excluding None
+    rank = 'scientificname' if taxon_field_name == 'tspecies' else taxon_name
+    # cached lookups, the names missing from the cache are searched concurrently
+    results = get_client().idigbio_records([(taxon, rank) for taxon in tlist])
     for taxon in tlist:
         # print('validating {}'.format(taxon))
-        if taxon_field_name == 'tspecies':
-            r = api.search_records(rq={'scientificname': taxon})
-        else:
-            r = api.search_records(rq={taxon_name: taxon})  # search
-        if r:
-            if r['itemCount']:
-                if verbose:
-                    print("{} OK {}".format(taxon, r['itemCount']))
-            else:
-                print("{} ERROR".format(taxon))
+        if (taxon, rank) not in results:
+            continue  # failed search, see get_client().errors
+        r = results[(taxon, rank)]
+        if r and r['itemCount']:
+            if verbose:
+                print("{} OK {}".format(taxon, r['itemCount']))
         else:
-            pass
-            # print("{} ERROR".format(taxon))
+            print("{} ERROR".format(taxon))
 
 
 def validate_geological_context(verbose=False):
@@ -2080,9 +1979,7 @@ def validate_geological_context(verbose=False):
 def main(year_list=CSHO_YEARS):
     # import data
     print('Importing data from XL spreadsheets...')
-    for year in year_list:
-        file = make_file_string(year)
-        import_file(folder=FOLDER_PATH, file=file, year=year)
+    import_files(folder=FOLDER_PATH, year_list=year_list)
     print('{} records imported'.format(Fossil.objects.all().count()))
     print(hr)
 
@@ -2192,17 +2089,15 @@ def multireplace(in_string, replacements):
     :param replacements: a dictionary of replacement values {value to find, value to replace}
     :return: returns string with all matches replaced.
     Credit to bgusach, https://gist.github.com/bgusach/a967e0587d6e01e889fd1d776c5f3729
+    The regular expression of each replacement dictionary is compiled once, see projects.cleaning.Replacements
     """
-    # Place longer ones first to keep shorter substrings from matching where the longer ones should take place
-    # For instance given the replacements {'ab': 'AB', 'abc': 'ABC'} against the string 'hey abc', it should produce
-    # 'hey ABC' and not 'hey ABc'
-    sub_strings = sorted(replacements, key=len, reverse=True)
+    key = tuple(sorted(replacements.items()))
+    if key not in _replacements_cache:
+        _replacements_cache[key] = Replacements(replacements)
+    return _replacements_cache[key](in_string)
 
-    # Create a big OR regex that matches any of the substrings to replace
-    regexp = re.compile('|'.join(map(re.escape, sub_strings)))
 
-    # For each match, look up the new string in the replacements
-    return regexp.sub(lambda match: replacements[match.group(0)], in_string)
+_replacements_cache = {}
 
 
 def q2cf(taxon_string):
@@ -2251,23 +2146,15 @@ def update_from_dict(obj, update_dict):
 
 
 def get_pbdb_taxon(taxon_name):
-    url = 'https://paleobiodb.org/data1.2/taxa/single.txt?name='+taxon_name
-    resp = requests.get(url)
-    if resp.status_code == 200:
-        h, d = resp.content.decode('utf-8').replace('"', '').split('\r\n')[0:2]
-        h = h.split(',')
-        d = d.split(',')
-        result = dict(zip(h, d))
-    else:
-        result = None
-    return result
+    """
+    PBDB record of a taxon name, None if unknown, cached see projects.authorities
+    """
+    return get_client().pbdb_taxon(taxon_name)
 
 
 def get_idigbio_taxon(taxon_name, taxon_rank):
-    result = None
-    api = idigbio.json()
-    taxon_rank.replace('tspecies', 'scientificname')
-    r = api.search_records(rq={taxon_rank: taxon_name})
-    if r:
-        result = r
-    return result
+    """
+    iDigBio search of the records of a taxon name, cached see projects.authorities
+    """
+    taxon_rank = taxon_rank.replace('tspecies', 'scientificname')
+    return get_client().idigbio_record(taxon_name, taxon_rank)
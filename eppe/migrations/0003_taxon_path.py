@@ -0,0 +1,25 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+from projects.taxonomy import rebuild_paths
+
+
+def build_taxon_paths(apps, schema_editor):
+    rebuild_paths(apps.get_model('eppe', 'Taxon'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eppe', '0002_auto_20200326_0022'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxon',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(build_taxon_paths, migrations.RunPython.noop),
+    ]
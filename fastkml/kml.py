@@ -113,6 +113,37 @@ class KML(object):
         else:
             raise TypeError
 
+    def iter_placemarks(self, xml_file):
+        """ iterate over the placemarks of a kml file, one at a time.
+
+        The file (a path or a file like object, e.g. a member of a kmz
+        archive) is read incrementally and the elements of each placemark
+        are released once it has been yielded, so that the memory used does
+        not grow with the size of the document. Placemarks are found in
+        any Document or Folder, other features are skipped.
+        """
+        if config.LXML:
+            context = etree.iterparse(
+                xml_file, events=('start', 'end'), huge_tree=True
+            )
+        else:
+            context = etree.iterparse(xml_file, events=('start', 'end'))
+        parents = []
+        for event, element in context:
+            if event == 'start':
+                if not parents and not element.tag.endswith('kml'):
+                    raise TypeError
+                parents.append(element)
+                continue
+            parents.pop()
+            if element.tag.rsplit('}', 1)[-1] != 'Placemark':
+                continue
+            feature = Placemark(element.tag[:-len('Placemark')])
+            feature.from_element(element)
+            yield feature
+            # release the placemark and the elements read before it
+            del parents[-1][:]
+
     def etree_element(self):
         # self.ns may be empty, which leads to unprefixed kml elements.
         # However, in this case the xlmns should still be mentioned on the kml
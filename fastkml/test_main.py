@@ -28,6 +28,7 @@ from fastkml import config
 from fastkml import gx  # NOQA
 
 import datetime
+from io import BytesIO
 from dateutil.tz import tzutc, tzoffset
 
 from fastkml.config import etree
@@ -858,6 +859,43 @@ class KmlFromStringTestCase(unittest.TestCase):
         self.assertFalse('maxLines' in k.to_string())
         self.assertTrue('Diffrent Snippet' in k.to_string())
 
+    def test_iter_placemarks(self):
+        doc = b"""<kml xmlns="http://www.opengis.net/kml/2.2">
+        <Document>
+          <name>Document.kml</name>
+          <Placemark>
+            <name>Document Feature 1</name>
+            <Point>
+              <coordinates>-122.371,37.816,0</coordinates>
+            </Point>
+          </Placemark>
+          <Folder>
+            <name>Folder.kml</name>
+            <Placemark>
+              <name>Folder Feature 1</name>
+              <description>Folder description</description>
+              <Point>
+                <coordinates>-122.370,37.817,0</coordinates>
+              </Point>
+            </Placemark>
+          </Folder>
+        </Document>
+        </kml>"""
+        placemarks = kml.KML().iter_placemarks(BytesIO(doc))
+        placemark = next(placemarks)
+        self.assertTrue(isinstance(placemark, kml.Placemark))
+        self.assertEqual(placemark.name, 'Document Feature 1')
+        self.assertEqual(placemark.ns, config.NS)
+        self.assertEqual(placemark.geometry.x, -122.371)
+        placemark = next(placemarks)
+        self.assertEqual(placemark.name, 'Folder Feature 1')
+        self.assertEqual(placemark.description, 'Folder description')
+        self.assertEqual(list(placemarks), [])
+
+    def test_iter_placemarks_wrong_file(self):
+        placemarks = kml.KML().iter_placemarks(BytesIO(b'<xml></xml>'))
+        self.assertRaises(TypeError, list, placemarks)
+
     def test_from_wrong_string(self):
         doc = kml.KML()
         self.assertRaises(TypeError, doc.from_string, '<xml></xml>')
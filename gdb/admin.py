@@ -1,8 +1,6 @@
 from django.contrib import admin
 from django.http import HttpResponse
 from .models import Occurrence, Biology, Locality, Taxon, TaxonRank
-import unicodecsv
-import os
 import projects.admin
 
 curatorial_fields = ('Curatorial', {
@@ -151,7 +149,7 @@ class LocalityAdmin(projects.admin.PaleoCoreLocalityAdminGoogle):
 #     model = Locality
 
 
-class BiologyAdmin(admin.ModelAdmin):
+class BiologyAdmin(projects.admin.ExportJobAdminMixin, admin.ModelAdmin):
     readonly_fields = ['catalog_number', 'nalma', 'sub_age']
     biology_fieldsets = list(biology_default_admin_fieldsets)
     #
@@ -171,67 +169,12 @@ class BiologyAdmin(admin.ModelAdmin):
 
     def create_data_csv(self, request, queryset):
         """
-        Export biology data to csv format. Still some issues with unicode characters.
+        Export biology data to csv format, in a background job. The file is downloaded from the Export Job admin.
         :param request:
         :param queryset:
         :return:
         """
-        response = HttpResponse(content_type='text/csv')  # declare the response type
-        # TODO generalize project file name
-        # Use ContentType.objects.get_for_model(myobject)
-        response['Content-Disposition'] = 'attachment; filename="GDB_Biology.csv"'  # declare the file name
-        writer = unicodecsv.writer(response)  # open a .csv writer
-        b = Biology()  # create an empty instance of a biology object
-
-        # Fetch model field names. We need to account for data originating from tables, relations and methods.
-        concrete_field_names = b.get_concrete_field_names()  # fetch a list of concrete field names
-        method_field_names = b.method_fields_to_export()  # fetch a list for method field names
-
-        fk_fields = [f for f in b._meta.get_fields() if f.is_relation]  # get a list of field objects
-        fk_field_names = [f.name for f in fk_fields]  # fetch a list of foreign key field names
-
-        # Concatenate to make a master field list
-        field_names = concrete_field_names + method_field_names + fk_field_names
-        writer.writerow(field_names)  # write column headers
-
-        def get_fk_values(o, fk):
-            """
-            Get the values associated with a foreign key relation
-            :param o: an occurrence instance
-            :param fk: the name of the foreign key field
-            :return: returns the value of the foreign key field as a string.
-            """
-            qs = None
-            return_string = ''
-            try:
-                qs = [obj for obj in getattr(o, fk).all()]  # if fk is one to many try getting all objects
-            except AttributeError:
-                return_string = str(getattr(o, fk))  # if one2one or many2one get single related value
-
-            if qs:
-                try:
-                    # Getting the name of related objects requires calling the file or image object.
-                    # This solution may break if relation is neither file nor image.
-                    return_string = '|'.join([str(os.path.basename(p.image.name)) for p in qs])
-                except AttributeError:
-                    return_string = '|'.join([str(os.path.basename(p.file.name)) for p in qs])
-
-            return return_string
-
-        for occurrence in queryset:  # iterate through the occurrence instances selected in the admin
-            # The next line uses string comprehension to build a list of values for each field.
-            # All values are converted to strings.
-            concrete_values = [getattr(occurrence, field) for field in concrete_field_names]
-            # Create a list of values from method calls. Note the parenthesis after getattr in the list comprehension.
-            method_values = [getattr(occurrence, method)() for method in method_field_names]
-            # Create a list of values from related tables. One to many fields have related values concatenated in str.
-            fk_values = [get_fk_values(occurrence, fk) for fk in fk_field_names]
-
-            row_data = concrete_values + method_values + fk_values
-            cleaned_row_data = ['' if i in [None, False, 'None', 'False'] else i for i in row_data]  # Replace ''.
-            writer.writerow(cleaned_row_data)
-
-        return response
+        return self.start_export(request, queryset, 'projects.exports.model_rows', 'GDB_Biology.csv')
 
     class Media:
         js = ['admin/js/list_filter_collapse.js']
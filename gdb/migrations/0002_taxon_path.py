@@ -0,0 +1,25 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+from projects.taxonomy import rebuild_paths
+
+
+def build_taxon_paths(apps, schema_editor):
+    rebuild_paths(apps.get_model('gdb', 'Taxon'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gdb', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxon',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(build_taxon_paths, migrations.RunPython.noop),
+    ]
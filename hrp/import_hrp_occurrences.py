@@ -11,28 +11,24 @@ data to separate dictionary (bio_dict);
 new object against the original data and if valid saves the new object.
 4) the script reports the number of records processed, the number of objects of each class created and reports these at
 the end.
+
+The import itself is run by HRPOccurrenceImporter (see projects.imports.LegacySQLiteImporter), which reads the
+occurrence and biology tables in chunks from a single join, validates the rows in worker processes and bulk inserts
+the records of each chunk, e.g.
+./manage.py import_hrp_occurrences /path/to/HRP_Paleobase4_2016.sqlite --workers 8 --dry-run
 """
 
 # Import libraries
-import sqlite3
 from hrp.models import Taxon, TaxonRank, IdentificationQualifier
 from hrp.models import Occurrence, Locality, Archaeology, Biology, Geology
+from projects.imports import LegacySQLiteImporter
+from projects.taxonomy import TaxonIndex
 from django.contrib.gis.geos import Point
 from django.core.exceptions import ObjectDoesNotExist
 import datetime
 import re
 
-# Required imports for stand-alone django scripts
-# http://stackoverflow.com/questions/25244631/models-arent-loaded-yet-error-while-populating-in-django-1-8-and-python-2-7-8
-import django
-django.setup()
-
 # Global variables
-# initiate a list of barcodes used to verify that each barcode added in the validate_row function is unique
-barcode_list = []
-# absolute file path to the HRP sqlite database from whihc we are reading data
-hrpdb_path = '/Users/reedd/Documents/projects/PaleoCore/projects/HRP/HRP_Paleobase4_2016.sqlite'
-record_limit = ('20000',)  # a limiter setting the maximum number of records to be read from the database, for debugging
 # list of fields as they occur in the HRP sqlite database occurrence table. The list is used to correctly find
 # specific data read in from each row of the occurrence table.
 occurrence_field_list = ["OBJECTID", "Shape", "CatalogNumberNumeric", "CatalogNumberNumeric_OLD", "BasisOfRecord",
@@ -266,17 +262,13 @@ def get_matching_taxon(brow):
     # get taxon name and rank
     taxon_name, taxon_rank_name = get_taxon_name_rank(brow)
 
+    taxon_index = TaxonIndex.for_model(Taxon)
     if taxon_rank_name == 'SpecificEpithet':
         genus_name, species_name = taxon_list[7:]
-        if Taxon.objects.filter(parent__name=genus_name).filter(name=species_name).exists():
-            taxon_object = Taxon.objects.get(parent__name=genus_name, name=species_name)
-        else:
-            taxon_object = None
+        taxon_object = taxon_index.get_species(genus_name, species_name)
     else:
-        if Taxon.objects.filter(name=taxon_name).filter(rank__name=taxon_rank_name).exists():
-            taxon_object = Taxon.objects.get(name=taxon_name, rank__name=taxon_rank_name)
-        else:
-            taxon_object = None
+        matches = taxon_index.filter(taxon_name, rank_name=taxon_rank_name)
+        taxon_object = matches[0] if len(matches) == 1 else None
     return taxon_object
 
 
@@ -287,10 +279,12 @@ def get_matching_parent(brow):
     :return: Returns a taxon object, or None
     """
     taxon_list = get_taxon_list(brow)
+    taxon_index = TaxonIndex.for_model(Taxon)
     taxon_object = None
     for taxon_name in reversed(taxon_list[:-1]):
-        if Taxon.objects.filter(name=taxon_name).count() == 1:  # if there's a single match, done
-            taxon_object = Taxon.objects.get(name=taxon_name)
+        matches = taxon_index.filter(taxon_name)
+        if len(matches) == 1:  # if there's a single match, done
+            taxon_object = matches[0]
             break
     return taxon_object
 
@@ -322,6 +316,7 @@ def create_taxon(brow):
     :return: returns the newly created taxon object
     """
     taxon_name, taxon_rank_name = get_taxon_name_rank(brow)  # get taxon name and rank
+    taxon_index = TaxonIndex.for_model(Taxon)  # taxa created here are added to the index on save
     if taxon_name:
         print("Creating new %s: %s" % (taxon_rank_name, taxon_name))
         if taxon_rank_name == 'SpecificEpithet':
@@ -329,15 +324,15 @@ def create_taxon(brow):
             genus_name = taxon_name.split()[0]  # taxon_name is binomen for rank SpecificEpithet, use split to get genus
             # Note trivial name may be more than word, e.g. 'Ugandax sp. nov.' the trivial will be 'sp. nov.'
             trivial_name = ' '.join(taxon_name.split()[1:])  # get species (and all infraspecific) name(s)
-            if not Taxon.objects.filter(name=genus_name).exists():  # If genus name not in DB create it.
+            if not taxon_index.filter(genus_name):  # If genus name not in DB create it.
                 genus = Taxon.objects.create(
                     name=genus_name,
                     parent=get_matching_parent(brow),
                     rank=TaxonRank.objects.get(name='Genus')
                 )
             else:
-                genus = Taxon.objects.get(name=genus_name)  # If genus name is in DB get it.
-            if not Taxon.objects.filter(name=trivial_name, parent=genus).exists():
+                genus = taxon_index.get(genus_name)  # If genus name is in DB get it.
+            if not taxon_index.filter(trivial_name, parent=genus):
                 new_species = Taxon.objects.create(
                     name=trivial_name,
                     parent=genus,
@@ -345,7 +340,7 @@ def create_taxon(brow):
                 )
                 return new_species
         else:
-            if not Taxon.objects.filter(name=taxon_name, rank__name=taxon_rank_name).exists():
+            if not taxon_index.filter(taxon_name, rank_name=taxon_rank_name):
                 new_taxon = Taxon.objects.create(
                     name=taxon_name,
                     parent=get_matching_parent(brow),
@@ -357,18 +352,13 @@ def create_taxon(brow):
 # Validation Functions, modularize the validation function below. Each function validates a specific field.
 def valid_occurrence_id(row):
     """
-    Validates occurrence id value for use as primary key
+    Validates occurrence id value for use as primary key. Duplicates are checked by validate_unique.
     :param row:
     :return:True if valid, False if not valid
     """
     occurrence_id = row[occurrence_field_list.index('CatalogNumberNumeric')]  # read id from row data
     if occurrence_id and occurrence_id > 0:  # if occurrence_id is not Null and positive
-        if Occurrence.objects.filter(id=occurrence_id).exists():  # if occurrence_id is duplicate
-            print("Warning, Occurrence id %s already exists" % occurrence_id)   # print warning
-            return False  # return a failed validation
-        else:  # if occurrence_id not null and not duplicate then return True
-            return True
-
+        return True
     else:
         print("Missing or non-positive occurrence ID!")
         return False
@@ -408,6 +398,8 @@ def validate_row(row):
     """
     Validate row data, convert data types where necessary and
     return a dictionary of cleaned, validated data.
+    The function does not use the database, so that rows can be validated in worker processes. Duplicate ids and
+    barcodes are checked afterwards by validate_unique.
     :param row:
     :return False or row_dict:
     """
@@ -662,11 +654,10 @@ def validate_row(row):
             elif occurrence_id in known_problem_tuple:
                 row_dict['barcode'] = None
         elif barcode:
-            if len(barcode) != 6 or barcode in barcode_list:
-                print("Invalid barcode length  or duplicate barcode %s for Occurrence %s" % (barcode, occurrence_id))
+            if len(barcode) != 6:
+                print("Invalid barcode length %s for Occurrence %s" % (barcode, occurrence_id))
                 return False
-            elif barcode not in barcode_list:  # check that well formed barcodes are unique
-                barcode_list.append(barcode)
+            else:
                 row_dict['barcode'] = barcode
     elif basis_of_record == 'Observation':
         if barcode:
@@ -693,6 +684,29 @@ def validate_row(row):
     return row_dict
 
 
+def validate_unique(row_dict, occurrence_ids, barcodes):
+    """
+    Check that the id and barcode of a validated row are not used by another occurrence
+    :param row_dict: dictionary returned by validate_row
+    :param occurrence_ids: set of the ids in the database and already imported, the id of the row is added to it
+    :param barcodes: set of the barcodes in the database and already imported, the barcode of the row is added to it.
+    Barcodes are stored as integers, the barcode strings of the rows are converted before the lookup.
+    :return: True if valid, False if not valid
+    """
+    occurrence_id = row_dict['occurrence_id']
+    barcode = int(row_dict['barcode']) if row_dict['barcode'] else None
+    if occurrence_id in occurrence_ids:  # if occurrence_id is duplicate
+        print("Warning, Occurrence id %s already exists" % occurrence_id)   # print warning
+        return False  # return a failed validation
+    if barcode is not None and barcode in barcodes:  # check that well formed barcodes are unique
+        print("Duplicate barcode %s for Occurrence %s" % (barcode, occurrence_id))
+        return False
+    occurrence_ids.add(occurrence_id)
+    if barcode is not None:
+        barcodes.add(barcode)
+    return True
+
+
 # Biology validation function
 def validate_biology(row, brow, pk):
     """
@@ -725,16 +739,17 @@ def validate_biology(row, brow, pk):
         biology_row_dict['verbatim_identification_qualifier'] = idq_string  # preserve a copy of original idq
         taxon = biology_row_dict['taxon']
         # Exception handling in case Taxonomy Tables not populated
+        taxon_index = TaxonIndex.for_model(Taxon)
         try:
-            cf_obj = IdentificationQualifier.objects.get(name='cf.')
+            cf_obj = taxon_index.get_qualifier('cf.')
         except ObjectDoesNotExist:
             cf_obj = IdentificationQualifier.objects.create(name='cf.', qualified='True')
         try:
-            aff_obj = IdentificationQualifier.objects.get(name='aff.')
+            aff_obj = taxon_index.get_qualifier('aff.')
         except ObjectDoesNotExist:
             aff_obj = IdentificationQualifier.objects.create(name='aff', qualified='True')
         try:
-            sp_nov_obj = IdentificationQualifier.objects.get(name='sp. nov.')
+            sp_nov_obj = taxon_index.get_qualifier('sp. nov.')
         except ObjectDoesNotExist:
             sp_nov_obj = IdentificationQualifier.objects.create(name='sp. nov.', qualified='True')
 
@@ -785,7 +800,7 @@ def validate_biology(row, brow, pk):
             biology_row_dict['identification_qualifier'] = sp_nov_obj
             taxon_name_string = idq_string[4:]
             try:
-                taxon = Taxon.objects.get(name=taxon_name_string)
+                taxon = taxon_index.get(taxon_name_string)
             except ObjectDoesNotExist:
                 taxon_string = idq_string[4:]
                 taxon = Taxon.objects.create(name=taxon_string, parent=None, rank=TaxonRank.objects.get(name='Species'))
@@ -856,10 +871,11 @@ def validate_biology(row, brow, pk):
         return False
 
 
-def get_locality(row_dict):
+def get_locality(row_dict, localities):
     """
     Fetch the corresponding locality object for an occurrence and create a new one if necessary.
     :param row:
+    :param localities: dictionary of the locality objects by id, new localities are added to it
     :return locality_object:
     """
 
@@ -880,9 +896,8 @@ def get_locality(row_dict):
 
         # Check if Locality exists
         try:
-            locality = Locality.objects.get(pk=locality_text)
-            return locality
-        except ObjectDoesNotExist:
+            return localities[locality_text]
+        except KeyError:
             # If not create a new one and return it
             locality = Locality(id=locality_text,
                                 collection_code=collection_code,
@@ -892,6 +907,7 @@ def get_locality(row_dict):
                                 geom=geom)
 
             locality.save()
+            localities[locality_text] = locality
             return locality
 
 
@@ -1110,114 +1126,68 @@ def validate_new_biology(biology_object, brow):
     return True
 
 
-def main():
-    import_count, collection_count, observation_count, row_count, ac, bc, gc, ao, bo, go = [0] * 10
-    print("Record limit is set to: %s\n" % record_limit)
-    print("Processing records\n\n", end=' ')
-
-    occurrence_recordset = occurrence_cursor.execute('SELECT * FROM Occurrence WHERE ProjectCode = "HRP" LIMIT ?',
-                                                     record_limit)
-    for row in occurrence_recordset:
+class HRPOccurrenceImporter(LegacySQLiteImporter):
+    """
+    Import the HRP records of the occurrence and biology tables of the HRP sqlite database
+    """
+    occurrence_model = Occurrence
+
+    def get_query(self):
+        # one row per occurrence, the occurrence columns followed by the columns of its biology row, if any
+        columns = ['o."{}"'.format(field) for field in occurrence_field_list] + \
+                  ['b."{}"'.format(field) for field in biology_field_list]
+        return 'SELECT {} FROM Occurrence o LEFT JOIN Biology b ON b.CatalogNumberNumeric = o.CatalogNumberNumeric ' \
+               'WHERE o.ProjectCode = ?'.format(', '.join(columns)), ['HRP']
+
+    def prepare(self):
+        self.localities = Locality.objects.in_bulk()
+
+    @classmethod
+    def clean(cls, joined_row):
+        row = joined_row[:len(occurrence_field_list)]
+        brow = joined_row[len(occurrence_field_list):]
+        if brow[biology_field_list.index('CatalogNumberNumeric')] is None:
+            brow = None  # no matching row in the biology table
+        # Validate the Occurrence data for the row
+        return row, brow, validate_row(row)
+
+    def build(self, cleaned_row):
+        row, brow, valid_row_dict = cleaned_row
+        if not valid_row_dict or not validate_unique(valid_row_dict, self.unique_values('id'),
+                                                     self.unique_values('barcode')):
+            return None
+        pk = valid_row_dict['occurrence_id']
+        basis_of_record = valid_row_dict['basis_of_record']
+        item_type = valid_row_dict['item_type']
+        if basis_of_record == 'Collection':
+            locality = get_locality(valid_row_dict, self.localities)
+
+        # Biology Collection and Observation
+        if item_type in ('Faunal', 'Floral'):
+            valid_biology_dict = validate_biology(row, brow, pk)
+            if not valid_biology_dict:
+                return None
+            if basis_of_record == 'Collection':
+                new_occurrence = import_biology_collection(valid_row_dict, valid_biology_dict, locality)
+            else:
+                new_occurrence = import_biology_observation(valid_row_dict, valid_biology_dict)
+            if not validate_new_biology(new_occurrence, brow):
+                return None
+
+        # Archaeology Collection and Observation
+        elif item_type == 'Artifactual':
+            if basis_of_record == 'Collection':
+                new_occurrence = import_archaeology_collection(valid_row_dict, locality)
+            else:
+                new_occurrence = import_archaeology_observation(valid_row_dict)
 
-        row_count += 1
-        #print "Processing record %s" % row_count
-        #print row
+        # Geology Collection and Observation
+        else:
+            if basis_of_record == 'Collection':
+                new_occurrence = import_geology_collection(valid_row_dict, locality)
+            else:
+                new_occurrence = import_geology_observation(valid_row_dict)
 
-        # Validate the Occurrence data for the row
-        #print "Validating row data ...",
-        valid_row_dict = validate_row(row)
-
-        if valid_row_dict:
-            #print "valid"
-            pk = valid_row_dict['occurrence_id']
-            basis_of_record = valid_row_dict['basis_of_record']
-            item_type = valid_row_dict['item_type']
-            import_count += 1
-
-            # Biology Collection
-            if basis_of_record == 'Collection' and item_type in ('Faunal', 'Floral'):
-                #print "Processing Biology Collection for occurrence %s" % pk
-                brow = biology_cursor.execute('SELECT * FROM Biology WHERE CatalogNumberNumeric = ?',
-                                              (str(pk),)).fetchone()
-                bc += 1
-                locality = get_locality(valid_row_dict)
-                valid_biology_dict = validate_biology(row, brow, pk)
-                new_bio = import_biology_collection(valid_row_dict, valid_biology_dict, locality)
-                collection_count += 1
-                if validate_new_record(new_bio, row) and validate_new_biology(new_bio, brow):
-                    new_bio.save()
-
-            # Archaeology Collection
-            elif basis_of_record == 'Collection' and item_type == 'Artifactual':
-                #print "Processing Archaeology Collection for Occurrence {}".format(pk)
-                ac += 1
-                locality = get_locality(valid_row_dict)
-                new_arch = import_archaeology_collection(valid_row_dict, locality)
-                collection_count += 1
-                if validate_new_record(new_arch, row):
-                    new_arch.save()
-
-            # Geology Collection
-            elif basis_of_record == 'Collection' and item_type == 'Geological':
-                #print "Processing Geological Collection for Occurrence {}".format(pk)
-                gc += 1
-                collection_count += 1
-                locality = get_locality(valid_row_dict)
-                new_geo = import_geology_collection(valid_row_dict, locality)
-                collection_count += 1
-                if validate_new_record(new_geo, row):
-                    new_geo.save()
-
-            # Biology Observation
-            elif basis_of_record == 'Observation' and item_type in ('Faunal', 'Floral'):
-                #print "Processing Biology Observation for Occurrence %s" % pk
-                brow = biology_cursor.execute('SELECT * FROM Biology WHERE CatalogNumberNumeric = ?',
-                                              (str(pk),)).fetchone()
-                bo += 1
-                observation_count += 1
-                valid_biology_dict = validate_biology(row, brow, pk)
-                new_bio = import_biology_observation(valid_row_dict, valid_biology_dict)
-                if validate_new_record(new_bio, row) and validate_new_biology(new_bio, brow):
-                    new_bio.save()
-
-            # Archaeology Observation
-            elif basis_of_record == 'Observation' and item_type == 'Artifactual':
-                #print "Processing Archaeology Observation for Occurrence %s" % pk
-                ao += 1
-                observation_count += 1
-                new_arch = import_archaeology_observation(valid_row_dict)
-                if validate_new_record(new_arch, row):
-                    new_arch.save()
-
-            # Geology Observation
-            elif basis_of_record == 'Observation' and item_type == 'Geological':
-                #print "Processing Geological Observation for Occurrence %s" % pk
-                go += 1
-                observation_count += 1
-                new_geo = import_geology_observation(valid_row_dict)
-                if validate_new_record(new_geo, row):
-                    new_geo.save()
-
-        if row_count in range(500, 10000, 500):
-            print('.', end=' ')
-    print("Number of rows processed: %s \nNumber of records imported: %s" % (row_count, import_count))
-    print("Imported %s collections and %s observations" % (collection_count, observation_count))
-    print("Processed %s biology, %s archaeology and %s geology collections" % (bc, ac, gc))
-    print("Processed %s biology, %s archaeology and %s geology observations" % (bo, ao, go))
-
-# Create a connection to the SQLite DB with HRP data
-
-# Open a connection to the local sqlite database
-print("Opening connection to %s" % hrpdb_path)
-connection = sqlite3.connect(hrpdb_path)
-occurrence_cursor = connection.cursor()  # cursor for reading data in the occurrence table
-biology_cursor = connection.cursor()  # cursor for reading data in the biology table
-
-# Fetch data from the database
-rs = occurrence_cursor.execute('SELECT * FROM Occurrence WHERE ProjectCode = "HRP";')
-record_count = len(rs.fetchall())
-print("Database has a total of %s records" % record_count)
-
-main()
-
-connection.close()
+        if validate_new_record(new_occurrence, row):
+            return new_occurrence
+        return None
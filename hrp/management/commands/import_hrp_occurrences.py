@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from hrp.import_hrp_occurrences import HRPOccurrenceImporter
+
+
+class Command(BaseCommand):
+    help = 'Import the HRP occurrences of the HRP Paleobase sqlite database, e.g. HRP_Paleobase4_2016.sqlite'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the sqlite database')
+        parser.add_argument('--chunk-size', type=int, default=HRPOccurrenceImporter.chunk_size,
+                            help='Number of rows read and inserted at once')
+        parser.add_argument('--limit', type=int, help='Maximum number of rows read')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of processes validating the rows, by default the number of CPUs')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate the rows and report what would be imported, without saving anything')
+
+    def handle(self, *args, **options):
+        importer = HRPOccurrenceImporter(options['path'], chunk_size=options['chunk_size'], limit=options['limit'],
+                                         dry_run=options['dry_run'], progress=self.report_progress,
+                                         workers=options['workers'])
+        connection = importer.connect()
+        try:
+            self.row_total = importer.count(connection)
+        finally:
+            connection.close()
+        self.stdout.write('Database has a total of {} records'.format(self.row_total))
+        statistics = importer.run()
+        for line in statistics.summary():
+            self.stdout.write(line)
+        if options['dry_run']:
+            self.stdout.write('Dry run, nothing was saved')
+
+    def report_progress(self, statistics):
+        self.stdout.write('{}/{} rows, {:.0f} rows per second'.format(statistics.row_count, self.row_total,
+                                                                      statistics.rows_per_second))
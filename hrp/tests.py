@@ -234,3 +234,18 @@ class BiologyMethodTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Select HRP Biology to change | Django site admin')
         self.assertContains(response, '0 of 1 selected')
+
+
+class OccurrenceImportTests(TestCase):
+    """
+    Test the uniqueness checks of the HRP occurrence importer
+    """
+    def test_validate_unique_barcode_in_database(self):
+        from hrp.import_hrp_occurrences import HRPOccurrenceImporter, validate_unique
+        Occurrence.objects.create(id=1, barcode=123456, geom=Point(41.1, 11.1), field_number=datetime.now())
+        importer = HRPOccurrenceImporter('HRP_Paleobase4_2016.sqlite')
+        ids, barcodes = importer.unique_values('id'), importer.unique_values('barcode')
+        self.assertFalse(validate_unique({'occurrence_id': 2, 'barcode': '123456'}, ids, barcodes))
+        self.assertTrue(validate_unique({'occurrence_id': 3, 'barcode': '123457'}, ids, barcodes))
+        self.assertFalse(validate_unique({'occurrence_id': 4, 'barcode': '123457'}, ids, barcodes))
+        self.assertTrue(validate_unique({'occurrence_id': 5, 'barcode': None}, ids, barcodes))
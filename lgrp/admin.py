@@ -1,33 +1,17 @@
 from django.contrib import admin
 from django.contrib.auth.decorators import permission_required
 from django.conf.urls import url
-from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.http import HttpResponse, HttpResponseRedirect
 from django.urls import reverse, path
 
 from .models import *
 import lgrp.views
-import csv
 import projects.admin
 from import_export import resources
 from import_export.fields import Field
 from import_export.admin import ImportExportActionModelAdmin
 
 
-class Echo(object):
-    """
-    From the django docs on streaming large csv files
-    https://docs.djangoproject.com/en/1.11/howto/outputting-csv/#streaming-csv-files
-    An object that implement just the write method of the file-like interface.
-    """
-    def write(self, value):
-        """
-        Wrtie the value by returning it, instead of storing in a buffer
-        :param value:
-        :return:
-        """
-        return value
-
-
 class ImagesInline(admin.TabularInline):
     model = Image
     readonly_fields = ['id', 'thumbnail']
@@ -238,7 +222,7 @@ class BiologyResource(resources.ModelResource):
         model = Biology
 
 
-class BiologyAdmin(OccurrenceAdmin):
+class BiologyAdmin(projects.admin.ExportJobAdminMixin, OccurrenceAdmin):
     resource_class = BiologyResource
     list_display = list(lgrp_biology_list_display)
     list_select_related = lgrp_default_list_select_related
@@ -248,72 +232,14 @@ class BiologyAdmin(OccurrenceAdmin):
 
     def create_data_csv(self, request, queryset):
         """
-        Export data to csv format.  The LGRP version of this admin action uses StreamingHTTPResponse because it
-        takes ca 155 seconds for the server to query the data, which causes a server timeout using the normal
-        HTTPResponse class. Need to optimize the query to run faster, but in the meantime I implemented the
-        streaming response to prevent the timeout. The lag seems to be caused by the large number of
-        related tables and foreign key relations that need to be followed when exporting the data. The HRP dataset
-        is larger but takes less time to export because it has fewer foreign key relationships. The long-term solution
-        is to separate the export and the download actions, i.e. have the action save the export to a file and then
-        redirect to another webpage showing all the export files available for download.
+        Export data to csv format. Querying the data takes ca 155 seconds because of the large number of related
+        tables and foreign key relations that need to be followed, which causes a server timeout. The export runs
+        in a background job and the file is downloaded from the Export Job admin.
         :param request:
         :param queryset:
         :return:
         """
-        pseudo_buffer = Echo()
-        writer = csv.writer(pseudo_buffer)
-
-        # Fetch model field names. We need to account for data originating from tables, relations and methods.
-        b = Biology()  # create an empty instance of a biology object
-        concrete_field_names = b.get_concrete_field_names()  # fetch a list of concrete field names
-        method_field_names = b.method_fields_to_export()  # fetch a list for method field names
-        fk_fields = [f for f in b._meta.get_fields() if f.is_relation]  # get a list of field objects
-        fk_field_names = [f.name for f in fk_fields]  # fetch a list of foreign key field names
-
-        def get_headers():
-            return concrete_field_names + method_field_names + fk_field_names
-
-        def get_fk_values(occurrence, fk):
-            """
-            Get the values associated with a foreign key relation
-            :param occurrence:
-            :param fk:
-            :return:
-            """
-            qs = None
-            return_string = ''
-            try:
-                qs = [obj for obj in getattr(occurrence, fk).all()]  # if fk is one to many try getting all objects
-            except AttributeError:
-                return_string = str(getattr(occurrence, fk))  # if one2one or many2one get single related value
-
-            if qs:
-                try:
-                    # Getting the name of related objects requires calling the file or image object.
-                    # This solution may break if relation is neither file nor image.
-                    return_string = '|'.join([str(os.path.basename(p.image.name)) for p in qs])
-                except AttributeError:
-                    return_string = '|'.join([str(os.path.basename(p.file.name)) for p in qs])
-
-            return return_string
-
-        def get_row_data(o, cfs=concrete_field_names, mfs=method_field_names, fks=fk_field_names):
-            concrete_values = [getattr(o, field) for field in cfs]
-            method_values = [getattr(o, method)() for method in mfs]
-            fk_values = [get_fk_values(o, fk) for fk in fks]
-            row_data = concrete_values + method_values + fk_values
-            return ['' if i in [None, False, 'None', 'False'] else i for i in row_data]  # Replace ''.
-
-        def get_rows(items):
-            yield writer.writerow(get_headers())
-            for item in items:
-                yield writer.writerow(get_row_data(item))
-
-        response = StreamingHttpResponse(
-            streaming_content=(get_rows(queryset)),
-            content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="LGRP_Biology_Export.csv"'
-        return response
+        return self.start_export(request, queryset, 'projects.exports.model_rows', 'LGRP_Biology_Export.csv')
     create_data_csv.short_description = 'Download Selected to .csv'
 
 
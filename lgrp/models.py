@@ -1,6 +1,7 @@
 from django.contrib.gis.db import models
 from django.db.models import Manager as GeoManager
 import projects.models
+from projects.quality import ValueNotInChoices
 from lgrp.ontologies import *
 from projects.ontologies import ITEM_TYPE_VOCABULARY
 import os
@@ -305,17 +306,10 @@ class Biology(Occurrence):
         :param field_name:
         :return:
         """
-        lgrp_bio = Biology.objects.all()
-        values = list(set([getattr(bio, field_name) for bio in lgrp_bio]))
-        field = Biology._meta.get_field(field_name)[0]
-        choices = [i[0] for i in field.choices]
-        result = [v for v in values if v not in choices]
-        if (not result) or result == [None]:
-            result_tuple = (False, None, None)
-            return result_tuple
-        else:
-            result_tuple = (True, len(result), result)
-            return result_tuple
+        result = list(ValueNotInChoices(Biology, field_name).unmatched_values())
+        if not result:
+            return False, None, None
+        return True, len(result), result
 
 
 class Geology(Occurrence):
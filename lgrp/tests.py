@@ -1,5 +1,8 @@
 from django.test import TestCase
-from lgrp.models import Occurrence, Biology,Taxon, IdentificationQualifier
+from lgrp.models import Occurrence, Biology,Taxon, IdentificationQualifier, CollectionCode, Image
+from projects.exports import model_rows
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from datetime import datetime
 from django.contrib.auth.models import User
 from django.contrib.gis.geos import Point, Polygon
@@ -112,6 +115,43 @@ class OccurrenceMethodTests(TestCase):
         self.assertFalse('biology' in concrete_field_list)
 
 
+class BiologyExportTests(TestCase):
+    """
+    Test the csv export of biology occurrences, see projects.exports.model_rows
+    """
+
+    def setUp(self):
+        self.taxon = Taxon.objects.create(name='Primates', label='Primates')
+        self.coll_code = CollectionCode.objects.create(name='AA')
+
+    def create_biology(self, count):
+        for i in range(count):
+            bio = Biology.objects.create(geom=Point(41.1, 11.1), field_number=datetime.now(),
+                                         basis_of_record='Collection', barcode=i + 1,
+                                         taxon=self.taxon, coll_code=self.coll_code)
+            Image.objects.create(occurrence=bio, image='uploads/images/{}.jpg'.format(i + 1))
+
+    def count_export_queries(self):
+        queryset = Biology.objects.all()
+        with CaptureQueriesContext(connection) as context:
+            rows = list(model_rows(queryset))
+        self.assertEqual(len(rows), queryset.count() + 1)  # header and one row per record
+        return len(context.captured_queries)
+
+    def test_export_rows(self):
+        self.create_biology(1)
+        header, row = list(model_rows(Biology.objects.all()))
+        self.assertEqual(row[header.index('catalog_number')], 'AA 1')
+        self.assertEqual(str(row[header.index('taxon')]), 'Primates')
+        self.assertEqual(row[header.index('occurrence_images')], '1.jpg')
+
+    def test_export_query_count_is_constant(self):
+        self.create_biology(2)
+        small_export_queries = self.count_export_queries()
+        self.create_biology(20)
+        self.assertEqual(self.count_export_queries(), small_export_queries)
+
+
 class ImportKMZTests(TestCase):
     pass
 
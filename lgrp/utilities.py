@@ -1,4 +1,5 @@
 from .models import *
+from projects.taxonomy import TaxonIndex
 from difflib import SequenceMatcher
 from itertools import permutations
 import csv
@@ -10,13 +11,7 @@ def match_taxon(biology_object):
     find taxon objects from item_scientific_name
     Return: (True/False, match_count, match_list)
     """
-    # match, match_count, match_list = (False, 0, None)
-    match_list = Taxon.objects.filter(name=biology_object.item_scientific_name)
-    if len(match_list) == 1:  # one match
-        result_tuple = (True, 1, match_list)
-    else:
-        result_tuple = (False, len(match_list), match_list)
-    return result_tuple
+    return TaxonIndex.for_model(Taxon).match(biology_object.item_scientific_name)
 
 
 def match_element(biology_object):
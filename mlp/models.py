@@ -2,7 +2,8 @@ from django.contrib.gis.db import models
 from django.contrib.contenttypes.models import ContentType
 
 import projects.models
-import collections
+from projects.summary import OccurrenceSummary
+from projects.taxonomy import TaxonIndex
 
 from .ontologies import BASIS_OF_RECORD_VOCABULARY, ITEM_TYPE_VOCABULARY, COLLECTING_METHOD_VOCABULARY, \
     COLLECTOR_CHOICES, SIDE_VOCABULARY, FIELD_SEASON_CHOICES
@@ -107,15 +108,7 @@ class Occurrence(projects.models.PaleoCoreOccurrenceBaseClass):
         Locate occurrence objects with duplicate barcodes
         :return: Returns a list of barcodes that are duplicated, e.g. [
         """
-        all_occurrences = Occurrence.objects.all()
-        barcode_list = []
-        duplicate_list = []
-        for item in all_occurrences:
-                barcode_list.append(item.barcode)
-        for barcode, count in list(collections.Counter(barcode_list).items()):
-            if count > 1 and barcode not in [None, 0]:
-                duplicate_list.append(barcode)
-        return duplicate_list
+        return OccurrenceSummary(Occurrence).duplicate_barcodes()
 
     @staticmethod
     def get_duplicate_barcode_objects():
@@ -124,13 +117,7 @@ class Occurrence(projects.models.PaleoCoreOccurrenceBaseClass):
         :return: Returns a two key dicitonary with barcode and queryset objects where each element is a queryset for duplicate barcodes,
         e.g. {'barcode':1999, 'queryset':[<GeoQuerySet [<Occurrence: MLP-1946>, <Occurrence: MLP-1946>]>]
         """
-        result = []
-        for b in Occurrence.get_duplicate_barcodes():
-            dup_dict = {}
-            dup_dict['barcode'] = b
-            dup_dict['queryset'] = Occurrence.objects.filter(barcode=b)
-            result.append(dup_dict)
-        return result
+        return OccurrenceSummary(Occurrence).duplicate_barcode_objects()
 
     @staticmethod
     def get_missing_barcode_objects():
@@ -138,11 +125,7 @@ class Occurrence(projects.models.PaleoCoreOccurrenceBaseClass):
         Locate occurrence objects that should have barcodes but do not.
         :return:
         """
-        result = []
-        for o in Occurrence.objects.filter(basis_of_record='FossilSpecimen'):
-            if o.barcode in [None, 0, '']:
-                result.append(o)
-        return result
+        return list(OccurrenceSummary(Occurrence).missing_barcode_objects())
 
     @staticmethod
     def fields_to_display():
@@ -269,12 +252,7 @@ class Biology(Occurrence):
         find taxon objects from item_scientific_name
         Return: (True/False, match_count, match_list)
         """
-        match_list = Taxon.objects.filter(name=self.item_scientific_name)
-        if len(match_list) == 1:  # one match
-            result_tuple = (True, 1, match_list)
-        else:
-            result_tuple = (False, len(match_list), match_list)
-        return result_tuple
+        return TaxonIndex.for_model(Taxon).match(self.item_scientific_name)
 
     class Meta:
         verbose_name = "03-MLP Biology"
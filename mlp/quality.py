@@ -0,0 +1,23 @@
+"""
+MLP data quality checks, added to the default checks of projects.quality
+"""
+from django.db.models import Q
+
+from projects import quality
+from .models import Occurrence, Biology
+
+collected_fauna = Q(item_type='Faunal', basis_of_record='FossilSpecimen')
+
+duplicate_fossil_barcodes = quality.DuplicateValues(
+    Occurrence, 'barcode', condition=Q(basis_of_record='FossilSpecimen'), name='occurrence_duplicate_fossil_barcode')
+duplicate_biological_barcodes = quality.DuplicateValues(
+    Occurrence, 'barcode', condition=collected_fauna, name='occurrence_duplicate_biological_barcode')
+duplicate_biological_catalog_numbers = quality.DuplicateValues(
+    Occurrence, 'catalog_number', condition=collected_fauna, name='occurrence_duplicate_biological_catalog_number')
+missing_biology = quality.OrphanedSubtype(
+    Occurrence, Biology, condition=Q(item_type__in=['Faunal', 'Floral']),
+    description='Faunal and floral Occurrence records that are not Biology records')
+outside_project_area = quality.PointOutsideBounds(Occurrence, bbox=(40.0, 10.5, 41.5, 12.0))
+
+quality.register(duplicate_fossil_barcodes, duplicate_biological_barcodes, duplicate_biological_catalog_numbers,
+                 missing_biology, outside_project_area)
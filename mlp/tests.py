@@ -1,17 +1,25 @@
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.test.client import RequestFactory
 from django.contrib.gis.geos import Point
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.contrib.messages.middleware import MessageMiddleware
-from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
 
-from mlp.models import Occurrence, Biology, Taxon, IdentificationQualifier
-from mlp.utilities import html_escape
+from mlp.models import Occurrence, Biology, Archaeology, Geology, Taxon, TaxonRank, IdentificationQualifier
+from mlp.utilities import html_escape, get_taxon_from_scientific_name
+from projects.matching import OccurrenceMatcher
+from projects.summary import OccurrenceSummary
+from projects.taxonomy import TaxonIndex, rebuild_paths
 
 from datetime import datetime
+from io import BytesIO
+from unittest import mock
+import tempfile
 import pytz
 from zipfile import ZipFile
-from fastkml import kml, Placemark, Folder, Document
+from fastkml import Placemark
 from mlp.views import ImportKMZ
 
 # from django.core.urlresolvers import reverse
@@ -78,28 +86,209 @@ class ImportKMZMethodsTests(TestCase):
         self.assertEqual(type(self.import_kmz.get_kmz_file()), ZipFile)
         self.assertEqual(self.import_kmz.get_kmz_file().filelist[0].filename, '374.jpg')
 
-    def test_get_kml_file(self):
-        self.assertEqual(type(self.import_kmz.get_kml_file()), kml.KML)
-        self.assertEqual(self.import_kmz.get_kml_file().to_string()[:10], '<kml xmlns')
+    def test_open_kml_file(self):
+        self.assertIn(b'<kml xmlns', self.import_kmz.open_kml_file().read())
 
     def test_mlp_import_placemarks(self):
         starting_record_count = Occurrence.objects.count()  # No occurrences in empty db
         self.assertEqual(starting_record_count, 0)
-        kml_file = self.import_kmz.get_kml_file()
-        level1_elements = list(kml_file.features())
-        self.assertEqual(len(level1_elements), 1)
-        self.assertEqual(type(level1_elements[0]), Document)
-        document = level1_elements[0]
-        level2_elements = list(document.features())
-        self.assertEqual(len(level2_elements), 6)
-        self.assertEqual(type(level2_elements[0]), Placemark)
-        placemark_list = level2_elements
+        placemark_list = list(self.import_kmz.stream_placemarks())  # the placemarks of the document
         self.assertEqual(len(placemark_list), 6)
+        self.assertEqual(type(placemark_list[0]), Placemark)
         self.setup_request(self.import_kmz.request)  # annotate the request with a message
         self.import_kmz.import_placemarks(placemark_list)
         self.assertEqual(Occurrence.objects.count(), 6)
         self.assertEqual(Occurrence.objects.filter(basis_of_record='HumanObservation').count(), 3)
 
+    def test_mlp_import_placemarks_in_batches(self):
+        self.setup_request(self.import_kmz.request)  # annotate the request with a message
+        self.import_kmz.batch_size = 4  # two batches for the six placemarks
+        counts = self.import_kmz.import_placemarks(self.import_kmz.stream_placemarks())
+        self.assertEqual(sum(counts.values()), 6)
+        self.assertEqual(Occurrence.objects.filter(last_import=True).count(), 6)
+        # every occurrence has its subtype row
+        self.assertEqual(Biology.objects.count() + Archaeology.objects.count() + Geology.objects.count(), 6)
+        self.assertEqual(Biology.objects.count(), counts[Biology])
+
+    def test_insert_batch_image_names(self):
+        # images are stored once in the upload directory of the image field, named after the occurrence id
+        archive = BytesIO()
+        with ZipFile(archive, 'w') as kmz_file:
+            kmz_file.writestr('doc.kml', '<kml xmlns="http://www.opengis.net/kml/2.2"/>')
+            kmz_file.writestr('374.jpg', b'image')
+        upload = SimpleUploadedFile('images.kmz', archive.getvalue())
+        self.import_kmz.request = self.factory.post('/django-admin/mlp/occurrence/import_kmz/',
+                                                    {'kmlfileUpload': upload})
+        occurrence = Archaeology(id=1, item_type="Artifactual", basis_of_record="Collection",
+                                 collecting_method="Surface Standard", field_number=datetime.now(pytz.utc),
+                                 geom="POINT (40.8352906016 11.5303732536)")
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            self.import_kmz.insert_batch([(occurrence, '374.jpg')])
+            self.assertEqual(Occurrence.objects.get(id=1).image.name, 'uploads/images/mlp/1_374.jpg')
+            self.assertEqual(Archaeology.objects.get(id=1).image.read(), b'image')
+
+
+class TaxonIndexTests(TestCase):
+    """
+    Test scientific name matching against the in memory taxonomy index
+    """
+    fixtures = [
+        'mlp/fixtures/mlp_taxonomy_test_data.json'
+    ]
+
+    def setUp(self):
+        TaxonIndex.clear()
+
+    def test_get_taxon_from_scientific_name(self):
+        names = ['Mammalia:Primates:Hominidae:Australopithecus afarensis',
+                 'Suidae:Kolpochoerus afarensis',
+                 'Australopithecus cf. afarensis',
+                 'Mammalia',
+                 '',
+                 'Nomen nudum']
+        with CaptureQueriesContext(connection) as queries:
+            taxa = [get_taxon_from_scientific_name(name) for name in names]
+        self.assertEqual(len(queries), 4)  # taxonomy version, taxa, ranks and id qualifiers, loaded once
+        self.assertEqual([taxon.pk for taxon in taxa[:3]], [107, 121, 107])
+        self.assertEqual(taxa[3].name, 'Mammalia')
+        self.assertEqual(taxa[4].name, 'Life')  # default taxon for an empty name
+        self.assertEqual(taxa[5].name, 'Life')  # and for an unknown name
+
+    def test_index_updated_on_save(self):
+        taxon_index = TaxonIndex.for_model(Taxon)
+        self.assertIsNone(taxon_index.get_species('Ledigia', 'mlpensis'))
+        genus = Taxon.objects.create(name='Ledigia', parent=taxon_index.get('Hominidae'),
+                                     rank=TaxonRank.objects.get(name='Genus'))
+        species = Taxon.objects.create(name='mlpensis', parent=genus, rank=TaxonRank.objects.get(name='Species'))
+        self.assertIs(TaxonIndex.for_model(Taxon), taxon_index)  # updated in place
+        self.assertEqual(taxon_index.get_species('Ledigia', 'mlpensis'), species)
+        self.assertEqual(taxon_index.match('Ledigia'), (True, 1, [genus]))
+        IdentificationQualifier.objects.create(name='aff. cf.')
+        self.assertTrue(TaxonIndex.for_model(Taxon).is_qualifier('aff. cf.'))  # reloaded
+
+    def test_index_dropped_on_rollback(self):
+        taxon_index = TaxonIndex.for_model(Taxon)
+        try:
+            with transaction.atomic():
+                Taxon.objects.create(name='Ledigia', parent=taxon_index.get('Hominidae'),
+                                     rank=TaxonRank.objects.get(name='Genus'))
+                self.assertEqual(len(TaxonIndex.for_model(Taxon).filter('Ledigia')), 1)
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        with mock.patch.object(TaxonIndex, 'version_check_interval', 0):
+            self.assertEqual(TaxonIndex.for_model(Taxon).filter('Ledigia'), [])  # version rolled back, reloaded
+
+
+class TaxonLineageTests(TestCase):
+    """
+    Test the lineage methods built on the materialized taxon path
+    """
+    fixtures = [
+        'mlp/fixtures/mlp_taxonomy_test_data.json'
+    ]
+
+    def setUp(self):
+        rebuild_paths(Taxon)  # fixtures are loaded without calling save
+
+    def test_full_lineage(self):
+        taxon = Taxon.objects.get(pk=107)  # Australopithecus afarensis
+        with CaptureQueriesContext(connection) as queries:
+            full_name = taxon.full_name()
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(full_name.startswith('Eukaryota, Animalia, Chordata, Mammalia, Primates, Hominidae'))
+        self.assertTrue(full_name.endswith('Australopithecus, afarensis'))
+        self.assertEqual(taxon.full_lineage()[-1], taxon)
+        self.assertEqual(taxon.get_higher_taxon(TaxonRank.objects.get(name='Order')).name, 'Primates')
+        self.assertIsNone(taxon.get_higher_taxon(TaxonRank.objects.get(name='Root')).parent)
+
+    def test_descendants_follow_parent_change(self):
+        primates = Taxon.objects.get(name='Primates')
+        self.assertIn(107, primates.get_descendants().values_list('pk', flat=True))
+        primates.parent = Taxon.objects.get(name='Reptilia')
+        primates.save()
+        reptilia = Taxon.objects.get(name='Reptilia')
+        self.assertIn(107, reptilia.get_descendants().values_list('pk', flat=True))
+        self.assertEqual(Taxon.objects.get(pk=107).full_lineage()[3].name, 'Reptilia')
+        self.assertEqual(rebuild_paths(Taxon), 0)  # saved paths match the rebuilt ones
+
+    def test_biology_counts(self):
+        for pk in [107, 107, 121]:  # Australopithecus afarensis twice, Kolpochoerus afarensis
+            Biology.objects.create(barcode=pk, basis_of_record="FossilSpecimen", item_type="Faunal",
+                                   field_number=datetime.now(pytz.utc), geom=Point(40.8, 11.5),
+                                   taxon=Taxon.objects.get(pk=pk))
+        with CaptureQueriesContext(connection) as queries:
+            taxa = Taxon.objects.with_biology_counts().with_subtree_biology_counts().filter(
+                name__in=['Hominidae', 'Suidae', 'Mammalia', 'Rodentia']).order_by('-subtree_biology_count')
+            counts = [(taxon.name, taxon.biology_count, taxon.subtree_biology_count) for taxon in taxa]
+        self.assertEqual(len(queries), 2)  # one grouped subtree count query, and the taxa sorted on their counts
+        self.assertEqual(counts, [('Mammalia', 0, 3), ('Hominidae', 0, 2), ('Suidae', 0, 1), ('Rodentia', 0, 0)])
+        self.assertEqual(Taxon.objects.get(pk=107).biology_usages(), 2)
+
+
+class MatchTests(TestCase):
+    """
+    Test the set based matching of spreadsheet rows with biology occurrences
+    """
+    fixtures = [
+        'mlp/fixtures/mlp_taxonomy_test_data.json'
+    ]
+
+    def setUp(self):
+        taxon = Taxon.objects.get(pk=107)
+        for pk, catalog_number, x in [(1, 'MLP-1', 40.8), (2, 'MLP-2', 40.9), (3, 'MLP-0', 41.0), (4, 'MLP-4', 41.0)]:
+            Biology.objects.create(id=pk, barcode=pk, catalog_number=catalog_number, basis_of_record="FossilSpecimen",
+                                   item_type="Faunal", geom=Point(x, 11.5), taxon=taxon)
+
+    def test_match(self):
+        rows = [
+            [1, 'MLP-001', '40.8', '11.5', '', '', '', 'FossilSpecimen'],  # same catalog number and point
+            [2, 'MLP-0999', '40.9', '11.500001', '', '', '', 'FossilSpecimen'],  # point within 1 metre
+            [3, 'MLP-x', '41.0', '11.5', '', '', '', 'HumanObservation'],  # the MLP-0 observation of two
+            [4, 'MLP-4', '42.0', '11.5', '', '', '', 'FossilSpecimen'],  # catalog number only
+        ]
+        with self.assertNumQueries(3):
+            full_match_list, coordinate_match_list, bad_match_list = OccurrenceMatcher(
+                Biology, catalog_prefix='MLP').match(rows)
+        self.assertEqual([(row[0], obj.pk) for row, obj in full_match_list], [(1, 1)])
+        self.assertEqual([(row[0], obj.pk) for row, obj in coordinate_match_list], [(2, 2), (3, 3)])
+        self.assertEqual([(row[0], obj) for row, obj in bad_match_list], [(4, None)])
+
+
+class SummaryTests(TestCase):
+    """
+    Test the occurrence summary counts and barcode warnings
+    """
+    def create_occurrence(self, model, pk, barcode, basis_of_record="FossilSpecimen"):
+        return model.objects.create(id=pk, barcode=barcode, item_type="Faunal", basis_of_record=basis_of_record,
+                                    collecting_method="Surface Standard", geom=Point(40.8352906016, 11.5303732536))
+
+    def setUp(self):
+        self.create_occurrence(Occurrence, 1, 1001, basis_of_record="HumanObservation")
+        self.create_occurrence(Archaeology, 2, 1002)
+        self.create_occurrence(Geology, 3, 1002)
+        self.create_occurrence(Archaeology, 4, None)
+
+    def test_counts(self):
+        summary = OccurrenceSummary(Occurrence)
+        with CaptureQueriesContext(connection) as queries:
+            counts = summary.counts()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(list(counts), ['No Fossils', 'Archaeology', 'Biology', 'Geology', 'Totals'])
+        self.assertEqual(counts['No Fossils'], {'FossilSpecimen': 0, 'HumanObservation': 1, 'total': 1})
+        self.assertEqual(counts['Archaeology'], {'FossilSpecimen': 2, 'HumanObservation': 0, 'total': 2})
+        self.assertEqual(counts['Totals']['total'], 4)
+
+    def test_barcode_warnings(self):
+        with CaptureQueriesContext(connection) as queries:
+            warnings = OccurrenceSummary(Occurrence).warnings()
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(warnings['warning_flag'])
+        self.assertEqual(warnings['duplicate_barcodes'], [1002])
+        self.assertEqual([o.pk for o in warnings['duplicate_barcode_objects'][0]['queryset']], [2, 3])
+        self.assertEqual([o.pk for o in warnings['missing_barcodes']], [4])
+        self.assertEqual(Occurrence.get_duplicate_barcodes(), [1002])
+
 
 class OccurrenceMethodsTests(TestCase):
     """
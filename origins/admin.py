@@ -1,6 +1,7 @@
 from django.contrib import admin
 from origins.models import *
 import origins.util
+from origins.countries import assign_countries
 from projects.admin import PaleoCoreLocalityAdminGoogle, TaxonomyAdmin
 from django.utils.html import format_html
 from django.contrib.gis.measure import Distance
@@ -157,15 +158,17 @@ class ContextAdmin(PaleoCoreLocalityAdminGoogle):
                     pass
             if new_site.verbatim_lat and new_site.verbatim_lng:
                 new_site.geom = Point(float(new_site.verbatim_lng), float(new_site.verbatim_lat))
-                new_site.country = origins.util.get_country_from_geom(new_site.geom)
             new_site.save()
             return new_site
 
         obj_count = 0
+        new_site_ids = []
         for obj in queryset:
             new_site=create_site(obj)  # create a new site based on the data in the context
             obj.site = new_site  # assign the newly created site to the context
+            new_site_ids.append(new_site.pk)
             obj_count += 1
+        assign_countries(Site.objects.filter(pk__in=new_site_ids))  # in one spatial query for all new sites
         if obj_count == 1:
             count_string = '1 record'
         if obj_count > 1:
@@ -0,0 +1,34 @@
+"""
+Country codes of points, from the WorldBorder polygons.
+
+assign_countries sets the country of a whole queryset in a single UPDATE, with a correlated spatial subquery
+using the index of WorldBorder.mpoly, e.g. after an import, see the assign_countries management command.
+"""
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import WorldBorder
+
+
+def country_subquery(geom_field='geom'):
+    """
+    ISO2 code of the country containing the geometry of the outer row
+    """
+    return Subquery(WorldBorder.objects.filter(mpoly__intersects=OuterRef(geom_field))
+                    .order_by('pk').values('iso2')[:1])
+
+
+def assign_countries(queryset, country_field='country', geom_field='geom', overwrite=False):
+    """
+    Set the country of the records of a queryset from their location, in a single statement
+    e.g. assign_countries(Fossil.objects.all())
+    :param overwrite: also replace the countries already set, by default only empty countries are assigned
+    :return: number of records assigned a country, records in no country are left unchanged
+    """
+    queryset = queryset.filter(**{'{}__isnull'.format(geom_field): False})
+    if not overwrite:
+        queryset = queryset.filter(Q(**{'{}__isnull'.format(country_field): True}) | Q(**{country_field: ''}))
+    # only the records in a country are updated and counted
+    located = queryset.annotate(located_country=country_subquery(geom_field))\
+        .filter(located_country__isnull=False).values('pk')
+    return queryset.model._default_manager.filter(pk__in=located)\
+        .update(**{country_field: country_subquery(geom_field)})
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from origins.countries import assign_countries
+from origins.models import Fossil, Site
+
+
+class Command(BaseCommand):
+    help = 'Set the country of fossils and sites from their location and the WorldBorder polygons, ' \
+           'in one statement per model.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='Also replace the countries already set')
+
+    def handle(self, *args, **options):
+        for model in (Fossil, Site):
+            count = assign_countries(model.objects.all(), overwrite=options['overwrite'])
+            self.stdout.write('{}: {} records updated'.format(model._meta.verbose_name_plural, count))
@@ -25,6 +25,7 @@ from taggit.models import TaggedItemBase
 from utils.models import RelatedLink, CarouselItem
 # Paleo Core imports
 import projects.models
+from projects.derived import DerivedField, register
 import publications.models
 from .ontologies import CONTINENT_CHOICES
 import publications.models
@@ -139,9 +140,10 @@ class Site(projects.models.PaleoCoreSiteBaseClass):
 
     @staticmethod
     def update_fossil_count():
-        for site in Site.objects.all():
-            site.fossil_count = site.fossil_usages()
-            site.save()
+        """
+        Recount the fossils of every site in a single update, see projects.derived
+        """
+        return site_fossil_count.refresh()
 
     def fossil_usages(self):
         return Fossil.objects.filter(site=self).count()
@@ -350,6 +352,9 @@ class Fossil(models.Model):
         return self.continent == 'Africa' and self.locality not in young_sites
 
 
+site_fossil_count = register(DerivedField(Site, 'fossil_count', Fossil, 'site', modified_field='modified'))
+
+
 class FossilElement(models.Model):
     # Records
     source = models.CharField(max_length=100, null=True, blank=True)
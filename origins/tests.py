@@ -29,3 +29,65 @@ class OriginsOntologiesTests(TestCase):
         self.assertEqual(type(ontologies.choices2list(ontologies.CONTINENT_CHOICES)), list)
 
 
+class SiteFossilCountTests(TestCase):
+    """
+    Test the derived fossil counts of sites
+    """
+
+    def test_update_fossil_count(self):
+        from origins.models import Site, Fossil, site_fossil_count
+        from projects.derived import registry
+        olduvai, hadar = Site.objects.create(name='Olduvai'), Site.objects.create(name='Hadar')
+        Fossil.objects.create(site=olduvai)
+        Fossil.objects.create(site=olduvai)
+        Fossil.objects.create()
+        with self.assertNumQueries(1):
+            self.assertEqual(Site.update_fossil_count(), 2)
+        self.assertEqual(dict(Site.objects.values_list('name', 'fossil_count')), {'Olduvai': 2, 'Hadar': 0})
+        self.assertEqual(site_fossil_count.refresh(), 0)  # up to date rows are not written
+
+        registry.refresh([site_fossil_count.name])
+        Fossil.objects.create(site=hadar)
+        self.assertEqual(registry.refresh([site_fossil_count.name]), [(site_fossil_count, 1, True)])
+        self.assertEqual(Site.objects.get(name='Hadar').fossil_count, 1)
+
+    def test_moved_and_deleted_fossils(self):
+        from origins.models import Site, Fossil
+        olduvai, hadar = Site.objects.create(name='Olduvai'), Site.objects.create(name='Hadar')
+        fossil = Fossil.objects.create(site=olduvai)
+        Fossil.objects.create(site=olduvai)
+        Site.update_fossil_count()
+        fossil.site = hadar
+        fossil.save()  # the previous site is recounted on save, the new one by the next incremental refresh
+        self.assertEqual(Site.objects.get(name='Olduvai').fossil_count, 1)
+        Site.update_fossil_count()
+        fossil.delete()
+        self.assertEqual(dict(Site.objects.values_list('name', 'fossil_count')), {'Olduvai': 1, 'Hadar': 0})
+
+
+class CountryTests(TestCase):
+    """
+    Test assigning countries from the world borders
+    """
+
+    def setUp(self):
+        from django.contrib.gis.geos import MultiPolygon, Polygon
+        from origins.models import WorldBorder
+        for name, iso2, bbox in (('Kenya', 'KE', (34, -4, 41, 4)), ('Ethiopia', 'ET', (33, 4, 47, 15))):
+            WorldBorder.objects.create(name=name, iso2=iso2, iso3=iso2 + 'X', fips=iso2, area=0, pop2005=0, un=0,
+                                       region=0, subregion=0, lon=0, lat=0,
+                                       mpoly=MultiPolygon(Polygon.from_bbox(bbox), srid=4326))
+
+    def test_assign_countries(self):
+        from django.contrib.gis.geos import Point
+        from origins.countries import assign_countries
+        from origins.models import Fossil
+        Fossil.objects.create(catalog_number='KNM-ER 1470', geom=Point(36.1, 3.9, srid=4326))
+        Fossil.objects.create(catalog_number='AL 288-1', geom=Point(40.5, 11.1, srid=4326))
+        Fossil.objects.create(catalog_number='OH 5', geom=Point(35.3, -2.9, srid=4326), country='TZ')
+        Fossil.objects.create(catalog_number='Unknown')
+        Fossil.objects.create(catalog_number='Offshore', geom=Point(60.0, -10.0, srid=4326))  # in no country
+        with self.assertNumQueries(1):
+            self.assertEqual(assign_countries(Fossil.objects.all()), 2)
+        self.assertEqual({fossil.catalog_number: fossil.country.code or '' for fossil in Fossil.objects.all()},
+                         {'KNM-ER 1470': 'KE', 'AL 288-1': 'ET', 'OH 5': 'TZ', 'Unknown': '', 'Offshore': ''})
@@ -1,5 +1,6 @@
 from django.conf.urls import url
 from origins.models import SitePage, WorldBorder
+from djgeojson.views import TiledGeoJSONLayerView
 from .views import MyGeoJSONLayerView
 
 urlpatterns = [
@@ -15,6 +16,17 @@ url(r'^countries.geojson$',
         MyGeoJSONLayerView.as_view(model=WorldBorder,
                                    crs=False,
                                    properties=['name', 'area', 'pop2005', 'fips'],
-                                   geometry_field='mpoly'),
+                                   geometry_field='mpoly',
+                                   streaming=True,
+                                   geojson_in_db=True),
         name='countries_geojson'),
+    # cached tiles of the country borders, ex. /origins/countries/4/8/7.geojson
+    url(r'^countries/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+).geojson$',
+        TiledGeoJSONLayerView.as_view(model=WorldBorder,
+                                      crs=False,
+                                      properties=['name', 'iso2'],
+                                      geometry_field='mpoly',
+                                      simplifications={0: 0.1, 4: 0.01, 8: 0.001},
+                                      cache_tiles=True),
+        name='countries_tiles'),
 ]
@@ -265,12 +265,11 @@ def main():
 
 
 def get_country_from_geom(geom):
-    try:
-        country_object = WorldBorder.objects.get(mpoly__intersects=geom)
-        country_code = country_object.iso2
-    except ObjectDoesNotExist:
-        country_code = None
-    return country_code
+    """
+    ISO2 code of the country containing a geometry, None if there is none.
+    To assign the countries of many records see origins.countries.assign_countries.
+    """
+    return WorldBorder.objects.filter(mpoly__intersects=geom).order_by('pk').values_list('iso2', flat=True).first()
 
 
 mpath = '/Users/reedd/Documents/projects/origins/makapansgat/makapansgat_hominins.txt'
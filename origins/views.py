@@ -3,8 +3,7 @@ from django.views import generic
 from .forms import UpdateSitesForm, UpdateSitesModelForm
 from .models import Fossil, Site
 from django.contrib import messages
-from djgeojson.views import GeoJSONLayerView, GeoJSONResponseMixin
-from djgeojson.serializers import Serializer as GeoJSONSerializer
+from djgeojson.views import GeoJSONLayerView
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 
@@ -36,26 +35,4 @@ class UpdateSites(generic.FormView):
 
 class MyGeoJSONLayerView(GeoJSONLayerView):
 
-    crs = False
-
-    def render_to_response(self, context, **response_kwargs):
-        """
-        Returns a JSON response, transforming 'context' to make the payload.
-        """
-        serializer = GeoJSONSerializer()
-        response = self.response_class(**response_kwargs)
-        queryset = self.get_queryset()
-
-        options = dict(properties=self.properties,
-                       precision=self.precision,
-                       simplify=self.simplify,
-                       srid=self.srid,
-                       geometry_field=self.geometry_field,
-                       force2d=self.force2d,
-                       bbox=self.bbox,
-                       bbox_auto=self.bbox_auto,
-                       use_natural_keys=self.use_natural_keys)
-        serializer.serialize(queryset, stream=response, ensure_ascii=False,
-                             crs=self.crs,  # in geoJSON crs is deprecated, raises error 36 in ol.source
-                             **options)
-        return response
+    crs = False  # in geoJSON crs is deprecated, raises error 36 in ol.source
@@ -328,3 +328,22 @@ BROKER_URL = 'redis://'
 
 CELERY_SEND_TASK_ERROR_EMAILS = True
 CELERYD_LOG_COLOR = False
+
+# GeoJSON tile cache, used by TiledGeoJSONLayerView with cache_tiles=True, e.g. the origins country tiles.
+# Tiles of the MODELS are evicted when records are saved or deleted, see djgeojson/cache.py. The world borders are
+# static, their tiles are dropped with seed_geojson_tiles origins.WorldBorder --clear after a reload.
+GEOJSON_TILE_CACHE = {
+    'BACKEND': 'djgeojson.cache.DjangoTileCache',
+    'LOCATION': 'default',
+    'TIMEOUT': None,
+    'MAX_ZOOM': 14,
+    'MAX_TILES': 256,
+    'MODELS': [],
+}
+
+# On disk cache of the PBDB and iDigBio taxon lookups, see projects/authorities.py
+TAXON_AUTHORITY_CACHE = {
+    'LOCATION': root('taxon_authorities.sqlite3'),
+    'TIMEOUT': 30 * 24 * 60 * 60,  # seconds before a cached lookup is fetched again
+    'MAX_CONNECTIONS': 8,
+}
@@ -1,25 +1,49 @@
-from django.contrib import admin
+import json
+from django.contrib import admin, messages
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models
+from django.db import transaction
 from django.forms import TextInput, Textarea  # import custom form widgets
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.urls import path, reverse, NoReverseMatch
+from django.utils.html import format_html
 from mapwidgets.widgets import GooglePointFieldWidget
-import csv
-from django.http import StreamingHttpResponse
 from import_export.admin import ImportExportActionModelAdmin
+from projects.models import ExportJob, QualityCheckResult
 
 
-class Echo(object):
+class ExportJobAdminMixin(object):
     """
-    From the django docs on streaming large csv files
-    https://docs.djangoproject.com/en/1.11/howto/outputting-csv/#streaming-csv-files
-    An object that implement just the write method of the file-like interface.
+    Run admin export actions in a background worker instead of streaming the response. Large exports
+    were timing out because querying the related tables takes longer than the server timeout.
+    The export is saved to a file, downloaded from the Export Job admin page.
     """
-    def write(self, value):
+
+    def start_export(self, request, queryset, exporter, filename, options=None):
         """
-        Wrtie the value by returning it, instead of storing in a buffer
-        :param value:
-        :return:
+        Create an ExportJob for the selected records and queue it
+        :param request:
+        :param queryset: the selected records
+        :param exporter: dotted path to a row builder, see projects.exports
+        :param filename: name of the csv file
+        :param options: keyword arguments passed to the exporter, must be JSON serializable
+        :return: redirect to the list of export jobs
         """
-        return value
+        from projects.tasks import run_export_job
+        object_ids = list(queryset.values_list('pk', flat=True))
+        job = ExportJob.objects.create(user=request.user,
+                                       content_type=ContentType.objects.get_for_model(queryset.model),
+                                       object_ids=json.dumps(object_ids),
+                                       exporter=exporter,
+                                       options=json.dumps(options or {}),
+                                       filename=filename,
+                                       row_count=len(object_ids))
+        # Queue the job once it is committed, so that the worker can read it
+        transaction.on_commit(lambda: run_export_job.delay(job.pk))
+        messages.add_message(request, messages.INFO,
+                             'Exporting {} records to {}. The file can be downloaded below once the export '
+                             'is finished.'.format(job.row_count, job.filename))
+        return HttpResponseRedirect(reverse('admin:projects_exportjob_changelist'))
 
 
 ####################################
@@ -166,7 +190,7 @@ class PaleoCoreOccurrenceAdmin(ImportExportActionModelAdmin):
         js = ['admin/js/list_filter_collapse.js']
 
 
-class PaleoCoreLocalityAdminGoogle(admin.ModelAdmin):
+class PaleoCoreLocalityAdminGoogle(ExportJobAdminMixin, admin.ModelAdmin):
     formfield_overrides = {
         models.CharField: {'widget': TextInput(attrs={'size': '25'})},
         models.TextField: {'widget': Textarea(attrs={'rows': 4, 'cols': 40})},
@@ -174,57 +198,36 @@ class PaleoCoreLocalityAdminGoogle(admin.ModelAdmin):
     }
 
     def export_csv(self, request, queryset):
-        mapping_dict = self.field_mapping
-        pseudo_buffer = Echo()
-        writer = csv.writer(pseudo_buffer)
-
-        def get_headers():
-            return mapping_dict.keys()
-
-        # Trick to get foreign key field values
-        # see https://stackoverflow.com/questions/20235807/how-to-get-foreign-key-values-with-getattr-from-models
-        def get_field_value(instance, field):
-            field_path = field.split('.')
-            attr = instance
-            for elem in field_path:
-                try:
-                    attr = getattr(attr, elem)
-                except AttributeError:
-                    return None
-            return attr
-
-        def get_row_data(o, md):
-            row_data = []
-            for key in md:
-                # for each item in the field mapping dict get the db value for that field
-                field_value = get_field_value(o, md[key])
-                if callable(field_value):  # method attribute
-                    row_data.append(field_value())
-                else:
-                    row_data.append(field_value)
-            # Return list without empty strings and Nulls.
-            return ['' if i in [None, False, 'None', 'False'] else i for i in row_data]
-
-        def get_rows(items):
-            yield writer.writerow(get_headers())
-            for item in items:
-                yield writer.writerow(get_row_data(item, mapping_dict))
-
-        response = StreamingHttpResponse(
-            streaming_content=(get_rows(queryset)),
-            content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="DwC_Export.csv"'
-        return response
+        return self.start_export(request, queryset, 'projects.exports.mapped_rows', 'DwC_Export.csv',
+                                 options={'mapping': self.field_mapping})
 
 
 class TaxonomyAdmin(admin.ModelAdmin):
-    list_display = ('label', 'rank', 'name', 'full_name', 'biology_usages')
-    readonly_fields = ['id', 'biology_usages']
+    list_display = ('label', 'rank', 'name', 'full_name', 'biology_usages', 'subtree_biology_usages')
+    readonly_fields = ['id', 'biology_usages', 'subtree_biology_usages']
     fields = ['id', 'name', 'parent', 'label', 'rank']
     search_fields = ['name', 'label']
     list_filter = ['rank']
     list_select_related = ['rank', 'parent']
 
+    def get_queryset(self, request):
+        # usage counts are annotated in the changelist query, see TaxonQuerySet.with_biology_counts
+        return super(TaxonomyAdmin, self).get_queryset(request).with_biology_counts().with_subtree_biology_counts()
+
+    def get_changelist_instance(self, request):
+        changelist = super(TaxonomyAdmin, self).get_changelist_instance(request)
+        self.model.prefetch_lineage(changelist.result_list)  # full_name of the page in one query
+        return changelist
+
+    def biology_usages(self, obj):
+        return obj.biology_count
+    biology_usages.admin_order_field = 'biology_count'
+
+    def subtree_biology_usages(self, obj):
+        return obj.subtree_biology_count
+    subtree_biology_usages.admin_order_field = 'subtree_biology_count'
+    subtree_biology_usages.short_description = 'Usages incl. subtaxa'
+
 
 class IDQAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'qualified']
@@ -238,3 +241,88 @@ class CollectionCodeAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'drainage_region']
     list_display_links = ['id']
     list_editable = ['name', 'drainage_region']
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'filename', 'content_type', 'user', 'status', 'progress_display', 'date_created',
+                    'date_finished', 'download_link']
+    list_display_links = ['id', 'filename']
+    list_filter = ['status', 'content_type']
+    readonly_fields = ['user', 'content_type', 'exporter', 'options', 'filename', 'status', 'row_count',
+                       'progress', 'error', 'date_created', 'date_finished', 'download_link']
+    exclude = ['object_ids', 'file']
+    list_select_related = ['content_type', 'user']
+
+    def get_queryset(self, request):
+        queryset = super(ExportJobAdmin, self).get_queryset(request).defer('object_ids')
+        if request.user.is_superuser:
+            return queryset
+        return queryset.filter(user=request.user)
+
+    def has_add_permission(self, request):
+        return False
+
+    def progress_display(self, obj):
+        return '{} / {}'.format(obj.progress, obj.row_count)
+    progress_display.short_description = 'Progress'
+
+    def download_link(self, obj):
+        if obj.status != ExportJob.FINISHED or not obj.file:
+            return ''
+        return format_html('<a href="{}">Download</a>', reverse('admin:projects_exportjob_download', args=[obj.pk]))
+    download_link.short_description = 'File'
+
+    def download(self, request, pk):
+        job = self.get_queryset(request).filter(pk=pk, status=ExportJob.FINISHED).first()
+        if job is None or not job.file:
+            raise Http404
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.filename)
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download), name='projects_exportjob_download'),
+        ] + super(ExportJobAdmin, self).get_urls()
+
+
+admin.site.register(ExportJob, ExportJobAdmin)
+
+
+class QualityCheckResultAdmin(admin.ModelAdmin):
+    list_display = ['name', 'app_label', 'content_type', 'description', 'failure_count', 'date_run', 'records_link']
+    list_filter = ['app_label', 'content_type']
+    search_fields = ['name', 'description']
+    readonly_fields = ['app_label', 'name', 'content_type', 'description', 'failure_count', 'duration', 'date_run',
+                       'records_link']
+    exclude = ['object_ids']
+    list_select_related = ['content_type']
+    actions = ['run_again']
+
+    def has_add_permission(self, request):
+        return False
+
+    def records_link(self, obj):
+        """
+        Link to the failing records in the admin of the checked model
+        """
+        object_ids = obj.get_object_ids()
+        if not object_ids:
+            return ''
+        model = obj.content_type.model_class()
+        try:
+            url = reverse('admin:{}_{}_changelist'.format(model._meta.app_label, model._meta.model_name))
+        except NoReverseMatch:
+            return ''
+        return format_html('<a href="{}?{}__in={}">{} records</a>', url, model._meta.pk.name,
+                           ','.join(str(pk) for pk in object_ids), len(object_ids))
+    records_link.short_description = 'Failing records'
+
+    def run_again(self, request, queryset):
+        from projects import quality
+        selected = set(queryset.values_list('app_label', 'name'))
+        checks = [check for check in quality.registry.get_checks() if (check.app_label, check.name) in selected]
+        quality.run_checks(checks)
+        messages.add_message(request, messages.INFO, 'Ran {} quality checks.'.format(len(checks)))
+    run_again.short_description = 'Run the selected checks again'
+
+
+admin.site.register(QualityCheckResult, QualityCheckResultAdmin)
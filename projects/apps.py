@@ -1,5 +1,53 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
+from django.db.models.signals import pre_save, post_save, post_delete
 
 
 class PcbaseConfig(AppConfig):
     name = 'projects'
+
+    def ready(self):
+        # Receivers are bound to each concrete model they handle, as signals cannot be bound to abstract models.
+        from djgeojson.cache import get_tile_cache
+        from projects import signals
+        from projects.derived import registry as derived_fields
+        from projects.models import PaleoCoreGeomBaseClass, ProjectStatistics
+        # Tile receivers are bound to the geometry models with cached tiles, other models keep Django's fast deletes
+        if get_tile_cache() is not None:
+            cached_models = get_tile_cache().models
+            for model in apps.get_models():
+                label = model._meta.label_lower
+                if not issubclass(model, PaleoCoreGeomBaseClass) or \
+                        (cached_models is not None and label not in cached_models):
+                    continue
+                pre_save.connect(signals.remember_previous_geom, sender=model,
+                                 dispatch_uid='projects_remember_previous_geom_' + label)
+                post_save.connect(signals.invalidate_tiles_on_save, sender=model,
+                                  dispatch_uid='projects_invalidate_tiles_on_save_' + label)
+                post_delete.connect(signals.invalidate_tiles_on_delete, sender=model,
+                                    dispatch_uid='projects_invalidate_tiles_on_delete_' + label)
+        for model in apps.get_models():
+            if signals.is_taxonomy_model(model):
+                label = model._meta.label_lower
+                post_save.connect(signals.update_taxon_index_on_save, sender=model,
+                                  dispatch_uid='projects_update_taxon_index_on_save_' + label)
+                post_delete.connect(signals.update_taxon_index_on_delete, sender=model,
+                                    dispatch_uid='projects_update_taxon_index_on_delete_' + label)
+        # Statistics receivers are bound to the counted models and their multi-table children
+        for model in apps.get_models():
+            label = model._meta.label_lower
+            if ProjectStatistics.get_model_fields(model):
+                post_save.connect(signals.update_statistics_on_save, sender=model,
+                                  dispatch_uid='projects_update_statistics_on_save_' + label)
+            if ProjectStatistics.get_model_fields(model, inherited=False):
+                post_delete.connect(signals.update_statistics_on_delete, sender=model,
+                                    dispatch_uid='projects_update_statistics_on_delete_' + label)
+        # Derived column receivers are bound to the source models, e.g. Fossil for origins.site.fossil_count
+        for model in apps.get_models():
+            if derived_fields.for_source_model(model):
+                label = model._meta.label_lower
+                pre_save.connect(signals.remember_previous_links, sender=model,
+                                 dispatch_uid='projects_remember_previous_links_' + label)
+                post_save.connect(signals.refresh_derived_fields_on_save, sender=model,
+                                  dispatch_uid='projects_refresh_derived_fields_on_save_' + label)
+                post_delete.connect(signals.refresh_derived_fields_on_delete, sender=model,
+                                    dispatch_uid='projects_refresh_derived_fields_on_delete_' + label)
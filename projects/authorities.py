@@ -0,0 +1,255 @@
+"""
+Taxon lookups in the Paleobiology Database (PBDB) and iDigBio, e.g. to validate the taxon fields of the EPPE fossils
+(see eppe.import_1998_2005.validate_taxon_field).
+
+Answers are kept in a SQLite file, keyed by authority, name and rank, and are fetched again once older than the
+cache timeout. Unknown names are cached as None, failed requests are not cached. The names missing from the cache
+are fetched concurrently, by an asyncio loop running the requests on a bounded pool of worker threads, each keeping
+its HTTP connections open between requests.
+
+    client = TaxonAuthorityClient(TaxonCache('/tmp/taxa.sqlite3'))
+    client.pbdb_taxa(['Gazella', 'Homo'])  # {'Gazella': {'taxon_name': 'Gazella', ...}, 'Homo': {...}}
+    client.idigbio_records([('Gazella', 'genus')])  # {('Gazella', 'genus'): {'itemCount': 1234, ...}}
+    client.network_calls  # 3, and 0 when the same names are looked up again
+
+The settings of the client returned by get_client are read from the TAXON_AUTHORITY_CACHE setting.
+"""
+import asyncio
+import csv
+import http.client
+import io
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+PBDB = 'pbdb'
+IDIGBIO = 'idigbio'
+
+
+class TaxonCache(object):
+    """
+    Lookup results stored in a SQLite file, as JSON
+    :param timeout: age in seconds after which a result is fetched again, None for results never expiring
+    """
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS taxon_lookup (authority TEXT NOT NULL, name TEXT NOT NULL, '
+                                'rank TEXT NOT NULL, result TEXT, fetched REAL NOT NULL, '
+                                'PRIMARY KEY (authority, name, rank))')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def get_many(self, authority, keys):
+        """
+        Fresh results of (name, rank) keys
+        :return: dictionary of the result by key, keys not cached or expired are left out
+        """
+        results = {}
+        oldest = time.time() - self.timeout if self.timeout is not None else None
+        keys = list(keys)
+        for start in range(0, len(keys), 400):  # below the SQLite limit of 999 parameters
+            batch = keys[start:start + 400]
+            conditions = ' OR '.join(['(name = ? AND rank = ?)'] * len(batch))
+            params = [value for name, rank in batch for value in (name, rank or '')]
+            cursor = self.connection.execute('SELECT name, rank, result, fetched FROM taxon_lookup '
+                                             'WHERE authority = ? AND ({})'.format(conditions), [authority] + params)
+            for name, rank, result, fetched in cursor:
+                if oldest is None or fetched >= oldest:
+                    results[(name, rank or None)] = json.loads(result)
+        return results
+
+    def set_many(self, authority, results):
+        """
+        Store the results of (name, rank) keys, replacing any previous result
+        """
+        fetched = time.time()
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO taxon_lookup VALUES (?, ?, ?, ?, ?)',
+                                        [(authority, name, rank or '', json.dumps(result), fetched)
+                                         for (name, rank), result in results.items()])
+
+    def clear(self, authority=None):
+        with self.connection:
+            if authority:
+                self.connection.execute('DELETE FROM taxon_lookup WHERE authority = ?', [authority])
+            else:
+                self.connection.execute('DELETE FROM taxon_lookup')
+
+
+class TaxonAuthorityClient(object):
+    """
+    Cached and concurrent lookups of taxon names in PBDB and iDigBio
+    :param cache: TaxonCache, None for a client caching nothing
+    :param max_connections: number of requests made at the same time
+    :param idigbio_limit: number of records returned by the iDigBio searches, validation only reads itemCount
+    """
+    pbdb_url = 'https://paleobiodb.org'
+    idigbio_url = 'https://search.idigbio.org'
+
+    def __init__(self, cache=None, max_connections=8, timeout=30, pbdb_url=None, idigbio_url=None,
+                 idigbio_limit=1):
+        self.cache = cache
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.pbdb_url = (pbdb_url or self.pbdb_url).rstrip('/')
+        self.idigbio_url = (idigbio_url or self.idigbio_url).rstrip('/')
+        self.idigbio_limit = idigbio_limit
+        self.network_calls = 0
+        self.errors = []  # (authority, key, error message) of the failed requests
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    # HTTP
+    def _connection(self, scheme, netloc):
+        """
+        Connection of the current worker thread to a host, opened on first use and kept open
+        """
+        connections = self._local.__dict__.setdefault('connections', {})
+        if (scheme, netloc) not in connections:
+            connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            connection = connection_class(netloc, timeout=self.timeout)
+            connections[(scheme, netloc)] = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connections[(scheme, netloc)]
+
+    def get(self, url):
+        """
+        GET a url on a kept open connection, retried once on a new connection when the server closed it
+        :return: status code and body
+        """
+        parts = urlsplit(url)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        with self._lock:
+            self.network_calls += 1
+        for attempt in range(2):
+            connection = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request('GET', path, headers={'Accept-Encoding': 'identity'})
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                connection.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        """
+        Close the connections of the worker threads
+        """
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+
+    # Authorities
+    def fetch_pbdb(self, name, rank=None):
+        """
+        PBDB record of a taxon name, as a dictionary of the columns of the single taxon service, None if unknown
+        """
+        status, body = self.get('{}/data1.2/taxa/single.txt?{}'.format(self.pbdb_url, urlencode({'name': name})))
+        if status != 200:
+            if 400 <= status < 500:
+                return None
+            raise IOError('PBDB returned status {}'.format(status))
+        rows = list(csv.reader(io.StringIO(body.decode('utf-8'))))
+        return dict(zip(rows[0], rows[1])) if len(rows) > 1 else None
+
+    def fetch_idigbio(self, name, rank):
+        """
+        iDigBio search of the records with a taxon name at a rank, e.g. ('Gazella', 'genus')
+        """
+        query = urlencode({'rq': json.dumps({rank: name}), 'limit': self.idigbio_limit})
+        status, body = self.get('{}/v2/search/records/?{}'.format(self.idigbio_url, query))
+        if status != 200:
+            if 400 <= status < 500:
+                return None
+            raise IOError('iDigBio returned status {}'.format(status))
+        return json.loads(body.decode('utf-8'))
+
+    # Lookups
+    async def _fetch_all(self, fetch, keys):
+        loop = asyncio.get_event_loop()
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            futures = [loop.run_in_executor(executor, fetch, name, rank) for name, rank in keys]
+            return await asyncio.gather(*futures, return_exceptions=True)
+
+    def fetch_many(self, authority, keys):
+        """
+        Fetch (name, rank) keys concurrently
+        :return: dictionary of the result by key, the failed requests are left out and recorded in errors
+        """
+        fetch = {PBDB: self.fetch_pbdb, IDIGBIO: self.fetch_idigbio}[authority]
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(self._fetch_all(fetch, keys))
+        finally:
+            loop.close()
+            self.close()
+        fetched = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                self.errors.append((authority, key, str(result)))
+            else:
+                fetched[key] = result
+        return fetched
+
+    def lookup(self, authority, keys):
+        """
+        Results of (name, rank) keys, from the cache or fetched and cached
+        :return: dictionary of the result by key, None for unknown names, failed lookups are left out
+        """
+        keys = list(dict.fromkeys(keys))
+        results = self.cache.get_many(authority, keys) if self.cache else {}
+        missing = [key for key in keys if key not in results]
+        if missing:
+            fetched = self.fetch_many(authority, missing)
+            if self.cache:
+                self.cache.set_many(authority, fetched)
+            results.update(fetched)
+        return results
+
+    def pbdb_taxa(self, names):
+        """
+        PBDB records of taxon names
+        :return: dictionary of the record by name
+        """
+        return {name: result for (name, rank), result in self.lookup(PBDB, [(name, None) for name in names]).items()}
+
+    def pbdb_taxon(self, name):
+        return self.pbdb_taxa([name]).get(name)
+
+    def idigbio_records(self, keys):
+        """
+        iDigBio searches of (name, rank) keys
+        :return: dictionary of the search result by key
+        """
+        return self.lookup(IDIGBIO, keys)
+
+    def idigbio_record(self, name, rank):
+        return self.idigbio_records([(name, rank)]).get((name, rank))
+
+
+_client = None
+
+
+def get_client():
+    """
+    Client configured by the TAXON_AUTHORITY_CACHE setting, with a cache when the setting has a LOCATION
+    """
+    global _client
+    if _client is None:
+        from django.conf import settings
+        config = getattr(settings, 'TAXON_AUTHORITY_CACHE', None) or {}
+        cache = TaxonCache(config['LOCATION'], config.get('TIMEOUT')) if config.get('LOCATION') else None
+        _client = TaxonAuthorityClient(cache, max_connections=config.get('MAX_CONNECTIONS', 8),
+                                       pbdb_url=config.get('PBDB_URL'), idigbio_url=config.get('IDIGBIO_URL'))
+    return _client
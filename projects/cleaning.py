@@ -0,0 +1,125 @@
+"""
+Set based cleaning of verbatim columns, e.g. the taxon columns of the EPPE fossils cleaned from their verbatim values
+(see eppe.import_1998_2005.update_taxon_fields).
+
+Cleaning functions are applied in Python once per distinct source value, not once per record, and the cleaned values
+are written with an UPDATE per target column, setting the column with a CASE over the source values. Only the rows
+whose value changes are updated, and each change is recorded in a CleaningLog.
+
+    log = CleaningLog()
+    log.extend(clean_column(Fossil.objects.all(), 'verbatim_genus', ['tgenus'],
+                            lambda value: {'tgenus': value.strip() if value else None}))
+    log.write_csv('/tmp/genus_changes.csv')
+"""
+import csv
+import re
+from collections import namedtuple, OrderedDict
+
+from django.db.models import Case, Count, OuterRef, Q, Subquery, Value, When
+
+#: A change of a target column, for the count rows with the source value and the old value of the target
+Change = namedtuple('Change', 'field source_field source_value old_value new_value count')
+
+
+class Replacements(object):
+    """
+    Replace multiple substrings at once, with a single regular expression compiled once.
+    Longer substrings are matched first, so that given the replacements {'ab': 'AB', 'abc': 'ABC'}
+    'hey abc' becomes 'hey ABC' and not 'hey ABc'.
+
+    replace = Replacements({'Anacus': 'Anancus', 'Cf.': 'cf.'})
+    replace('Cf. Anacus')  # 'cf. Anancus'
+    """
+    def __init__(self, replacements):
+        self.replacements = dict(replacements)
+        sub_strings = sorted(self.replacements, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(map(re.escape, sub_strings))) if sub_strings else None
+
+    def __call__(self, string):
+        if self.pattern is None:
+            return string
+        return self.pattern.sub(lambda match: self.replacements[match.group(0)], string)
+
+
+class CleaningLog(list):
+    """
+    The changes made by clean_column
+    """
+    header = ['field', 'source_field', 'source_value', 'old_value', 'new_value', 'count']
+
+    @property
+    def row_count(self):
+        return sum(change.count for change in self)
+
+    def summary(self):
+        """
+        Number of rows changed by field
+        """
+        counts = OrderedDict()
+        for change in self:
+            counts[change.field] = counts.get(change.field, 0) + change.count
+        return counts
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.header)
+            writer.writerows(self)
+
+
+def source_value_filter(field_name, values):
+    """
+    Q object matching the rows whose field is one of the values, including None
+    """
+    values = set(values)
+    condition = Q(**{'{}__in'.format(field_name): values - {None}})
+    if None in values:
+        condition |= Q(**{'{}__isnull'.format(field_name): True})
+    return condition
+
+
+def cleaned_value_expression(queryset, source, target, cleaned_values):
+    """
+    CASE expression of the cleaned value of a target column from the value of the source column
+    :param cleaned_values: dictionary of the cleaned value by source value
+    """
+    model = queryset.model
+    output_field = model._meta.get_field(target)
+    case = Case(*[When(**{source: source_value, 'then': Value(value, output_field=output_field)})
+                  for source_value, value in cleaned_values.items()], output_field=output_field)
+    source_model = model._meta.get_field(source).model
+    if source_model is model:
+        return case
+    # an UPDATE can only reference the columns of its table, read the source column of a parent model, e.g.
+    # Find.verbatim_genus for Fossil.tgenus, in a subquery
+    return Subquery(source_model._base_manager.filter(pk=OuterRef('pk')).annotate(cleaned_value=case)
+                    .values('cleaned_value')[:1], output_field=output_field)
+
+
+def clean_column(queryset, source, targets, function):
+    """
+    Clean target columns from a source column, e.g. tgenus from verbatim_genus
+    :param source: name of the source field
+    :param targets: names of the target fields
+    :param function: called once per distinct value of the source field, returns a dictionary of the cleaned values
+    of the target fields. Targets left out of the dictionary are not changed.
+    :return: CleaningLog of the changes
+    """
+    queryset = queryset.order_by()
+    groups = list(queryset.values_list(source, *targets).annotate(count=Count('pk')))
+    cleaned = {}
+    log = CleaningLog()
+    for group in groups:
+        source_value, old_values, count = group[0], group[1:-1], group[-1]
+        if source_value not in cleaned:
+            cleaned[source_value] = function(source_value)
+        for target, old_value in zip(targets, old_values):
+            if target in cleaned[source_value] and cleaned[source_value][target] != old_value:
+                log.append(Change(target, source, source_value, old_value, cleaned[source_value][target], count))
+    for target in targets:
+        changed_values = set(change.source_value for change in log if change.field == target)
+        if changed_values:
+            values = {source_value: cleaned[source_value][target] for source_value in changed_values}
+            queryset.filter(source_value_filter(source, changed_values))\
+                .update(**{target: cleaned_value_expression(queryset, source, target, values)})
+    return log
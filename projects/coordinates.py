@@ -0,0 +1,102 @@
+"""
+Batch coordinate columns for PaleoCoreGeomBaseClass records.
+
+PaleoCoreGeomBaseClass.longitude, latitude, easting and northing transform the point on every call, so a
+single exported row transforms the same point up to four times. coordinate_columns returns the four values
+for many records at once, with one transform per source coordinate system and one per UTM zone.
+"""
+import math
+from collections import defaultdict, namedtuple
+
+from django.contrib.gis.gdal import CoordTransform, SpatialReference, GDALException
+from django.contrib.gis.geos import MultiPoint, Point, GEOSException
+from django.db.models.query import QuerySet
+
+Coordinates = namedtuple('Coordinates', ['longitude', 'latitude', 'easting', 'northing'])
+EMPTY_COORDINATES = Coordinates(None, None, None, None)
+COORDINATE_FIELDS = Coordinates._fields
+
+
+def is_utm(srid):
+    """
+    EPSG 32701 = UTM Zone 1 South and 32760 = UTM Zone 60 South
+    EPSG 32601 = UTM Zone 1 North and 32660 = UTM Zone 60 North
+    """
+    return 32701 <= srid <= 32760 or 32601 <= srid <= 32660
+
+
+def utm_srid(lon, lat):
+    """
+    EPSG identifier of the WGS84 UTM zone containing a WGS84 geographic position
+    """
+    utm_zone = math.floor((((lon + 180) / 6) % 60) + 1)  # UTM Zone from lon
+    coordinate_system = 32600 + utm_zone  # epsg identifiers follow a pattern by zone
+    if lat < 0:
+        coordinate_system = coordinate_system + 100
+    return coordinate_system
+
+
+def transform_coords(coords, source_srid, target_srid):
+    """
+    Transform a list of (x, y) coordinates with a single GDAL transform of a multipoint.
+    If the batch fails, points are transformed one by one and the points that cannot be transformed are None.
+    :param coords: list of coordinate tuples
+    :param source_srid:
+    :param target_srid:
+    :return: list of coordinate tuples
+    """
+    if not coords or source_srid == target_srid:
+        return list(coords)
+    transform = CoordTransform(SpatialReference(source_srid), SpatialReference(target_srid))
+    try:
+        return list(MultiPoint([Point(c) for c in coords], srid=source_srid).transform(transform, clone=True).coords)
+    except (GDALException, GEOSException):
+        results = []
+        for c in coords:
+            try:
+                results.append(Point(c, srid=source_srid).transform(transform, clone=True).coords)
+            except (GDALException, GEOSException):
+                results.append(None)
+        return results
+
+
+def coordinate_columns(objects):
+    """
+    Longitude, latitude, easting and northing of many records, with the same results as the
+    PaleoCoreGeomBaseClass methods.
+    :param objects: queryset of a PaleoCoreGeomBaseClass subclass, or an iterable of instances
+    :return: dictionary mapping primary keys to Coordinates, with None values for records without a point
+    """
+    if isinstance(objects, QuerySet):
+        points = objects.values_list('pk', 'geom')
+    else:
+        points = [(o.pk, o.geom) for o in objects]
+
+    columns = {}
+    by_srid = defaultdict(list)  # point coordinates grouped by native coordinate system
+    for pk, geom in points:
+        columns[pk] = EMPTY_COORDINATES
+        if geom and geom.geom_type == 'Point' and geom.srid:
+            by_srid[geom.srid].append((pk, geom.coords))
+
+    gcs, utm = {}, {}
+    by_zone = defaultdict(list)  # wgs84 gcs coordinates grouped by UTM zone
+    for srid, items in by_srid.items():
+        pks, coords = zip(*items)
+        gcs.update(zip(pks, transform_coords(coords, srid, 4326)))
+        if is_utm(srid):  # If wgs84 utm just return value
+            utm.update(items)
+        elif srid == 4326:
+            for pk, c in items:
+                by_zone[utm_srid(c[0], c[1])].append((pk, c))
+        else:  # as in utm_coordinates, other coordinate systems return the gcs coordinates
+            utm.update((pk, gcs[pk]) for pk in pks)
+    for zone, items in by_zone.items():
+        pks, coords = zip(*items)
+        utm.update(zip(pks, transform_coords(coords, 4326, zone)))
+
+    for pk, lonlat in gcs.items():
+        en = utm.get(pk)
+        columns[pk] = Coordinates(lonlat[0] if lonlat else None, lonlat[1] if lonlat else None,
+                                  en[0] if en else None, en[1] if en else None)
+    return columns
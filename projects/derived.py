@@ -0,0 +1,149 @@
+"""
+Derived columns of the project models, e.g. Site.fossil_count, stored to be listed and sorted without counting
+the related rows on each request.
+
+A DerivedField is refreshed with a single UPDATE per model, setting the column from a correlated aggregate
+subquery over the source rows. Only rows whose value changed are written. Incremental refreshes only recompute
+the rows linked to source rows modified since the last refresh, see the refresh_derived_fields management command.
+The rows a source row is moved away from, or deleted from, are recomputed right away by the save and delete signals
+of the source model (see projects.signals). Bulk updates and deletes send no signals, they need a full refresh.
+
+    fossil_count = derived.register(DerivedField(Site, 'fossil_count', Fossil, 'site', modified_field='modified'))
+    fossil_count.refresh()
+"""
+from collections import OrderedDict
+
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class DerivedField(object):
+    """
+    A column computed from related rows
+    :param model: the model holding the column
+    :param field_name: the derived column, e.g. 'fossil_count'
+    :param source_model: the aggregated model, e.g. Fossil
+    :param link: the foreign key of the source model to the model, e.g. 'site'
+    :param aggregate: aggregate of the source rows, by default their count
+    :param condition: optional Q object limiting the source rows
+    :param modified_field: date field of the source model updated on save, used by incremental refreshes
+    :param default: value of rows without source rows, by default 0
+    """
+    def __init__(self, model, field_name, source_model, link, aggregate=None, condition=None, modified_field=None,
+                 default=0):
+        self.model = model
+        self.field_name = field_name
+        self.source_model = source_model
+        self.link = link
+        self.aggregate = aggregate or Count('pk')
+        self.condition = condition or Q()
+        self.modified_field = modified_field
+        self.default = default
+
+    def __repr__(self):
+        return '<DerivedField: {}>'.format(self.name)
+
+    @property
+    def name(self):
+        return '{}.{}'.format(self.model._meta.label_lower, self.field_name)
+
+    def get_target_field(self):
+        """
+        Field of the model referenced by the link, e.g. gdb Locality.locality_number
+        """
+        return self.source_model._meta.get_field(self.link).target_field
+
+    def get_link_attname(self):
+        """
+        Column of the source model holding the link, e.g. 'site_id'
+        """
+        return self.source_model._meta.get_field(self.link).attname
+
+    def get_expression(self):
+        """
+        Correlated subquery computing the column, grouped by the link
+        """
+        field = self.model._meta.get_field(self.field_name)
+        sources = self.source_model._default_manager.order_by().filter(self.condition)\
+            .filter(**{self.link: OuterRef(self.get_target_field().attname)})
+        value = Subquery(sources.values(self.link).annotate(derived_value=self.aggregate).values('derived_value'),
+                         output_field=field)
+        if self.default is None:
+            return value
+        return Coalesce(value, Value(self.default), output_field=field)
+
+    def linked_to(self, values):
+        """
+        Rows of the model referenced by link values, a list or a queryset of source rows values
+        """
+        return self.model._default_manager.filter(**{'{}__in'.format(self.get_target_field().attname): values})
+
+    def changed_since(self, since):
+        """
+        Rows of the model linked to source rows modified since a date
+        """
+        return self.linked_to(self.source_model._default_manager.order_by()
+                              .filter(**{'{}__gt'.format(self.modified_field): since}).values(self.link))
+
+    def update(self, queryset):
+        expression = self.get_expression()
+        # skip the rows already up to date, rewriting them would only bloat the table
+        return queryset.exclude(**{self.field_name: expression}).update(**{self.field_name: expression})
+
+    def refresh(self, since=None):
+        """
+        Recompute the column, of all the rows or of the rows with sources modified since a date
+        :return: the number of rows updated
+        """
+        if since is not None and self.modified_field is None:
+            raise ValueError('{} has no modified_field, it can only be refreshed in full'.format(self.name))
+        return self.update(self.changed_since(since) if since is not None else self.model._default_manager.all())
+
+    def refresh_linked(self, values):
+        """
+        Recompute the column of the rows referenced by link values, e.g. the previous site of a moved fossil
+        :return: the number of rows updated
+        """
+        values = [value for value in values if value is not None]
+        return self.update(self.linked_to(values)) if values else 0
+
+
+class DerivedFieldRegistry(OrderedDict):
+    """
+    The derived fields of the project apps, by name, e.g. 'origins.site.fossil_count'
+    """
+    def register(self, derived_field):
+        self[derived_field.name] = derived_field
+        return derived_field
+
+    def for_source_model(self, model):
+        """
+        The derived fields aggregating the rows of a model
+        """
+        return [derived_field for derived_field in self.values() if derived_field.source_model is model]
+
+    def refresh(self, names=None, full=False):
+        """
+        Refresh derived fields, incrementally when they have been refreshed before
+        :return: list of (derived field, number of rows updated, incremental) tuples
+        """
+        from projects.models import DerivedFieldRefresh
+        refreshes = DerivedFieldRefresh.objects.in_bulk(list(self), field_name='name')
+        results = []
+        for name, derived_field in self.items():
+            if names and name not in names:
+                continue
+            since = None
+            if not full and name in refreshes and derived_field.modified_field is not None:
+                since = refreshes[name].date_refreshed
+            started = timezone.now()
+            count = derived_field.refresh(since=since)
+            DerivedFieldRefresh.objects.update_or_create(name=name, defaults=dict(date_refreshed=started,
+                                                                                  row_count=count))
+            results.append((derived_field, count, since is not None))
+        return results
+
+
+registry = DerivedFieldRegistry()
+register = registry.register
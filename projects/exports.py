@@ -0,0 +1,163 @@
+"""
+Row builders for the data exports run in the background by ExportJob, see projects.tasks.run_export_job.
+
+An exporter is a function taking a queryset (and the job options as keyword arguments) and returning an
+iterable of rows, the first row being the column headers.
+"""
+import os
+
+from django.core.exceptions import ObjectDoesNotExist
+
+from projects.coordinates import COORDINATE_FIELDS, coordinate_columns
+from projects.models import PaleoCoreGeomBaseClass
+
+
+def clean_row(row_data):
+    """
+    Replace empty values and Nulls with empty strings
+    """
+    return ['' if i in [None, False, 'None', 'False'] else i for i in row_data]
+
+
+def get_fk_values(occurrence, fk):
+    """
+    Get the values associated with a foreign key relation
+    :param occurrence: a model instance
+    :param fk: the name of the relation field
+    :return: returns the value of the related object, related images or files are concatenated in a string.
+    """
+    try:
+        related = getattr(occurrence, fk)
+    except ObjectDoesNotExist:  # missing reverse one to one relation, e.g. a biology occurrence has no archaeology
+        return ''
+    try:
+        qs = [obj for obj in related.all()]  # if fk is one to many get all objects, served from the prefetch cache
+    except AttributeError:
+        return str(related)  # if one2one or many2one get single related value
+
+    return_string = ''
+    if qs:
+        try:
+            # Getting the name of related objects requires calling the file or image object.
+            # This solution may break if relation is neither file nor image.
+            return_string = '|'.join([str(os.path.basename(p.image.name)) for p in qs])
+        except AttributeError:
+            return_string = '|'.join([str(os.path.basename(p.file.name)) for p in qs])
+
+    return return_string
+
+
+def plan_queryset(queryset, relations):
+    """
+    Join or prefetch every relation exported by model_rows, so that building a row does not hit the database.
+    To one relations are joined with select_related, to many relations and generic foreign keys are prefetched.
+    :param queryset:
+    :param relations: list of relation field objects
+    :return: queryset
+    """
+    select, prefetch = [], []
+    for field in relations:
+        if field.many_to_many or field.one_to_many or not (field.concrete or field.one_to_one):
+            prefetch.append(field.name)
+        else:
+            select.append(field.name)
+    return queryset.select_related(*select).prefetch_related(*prefetch)
+
+
+def share_parent_relations(instance, parent_links):
+    """
+    Multi-table inheritance parents are built from the child's values when accessed, without the related
+    objects already joined for the child. Copy them to the parent, so that e.g. the parent's __str__ does not
+    query them again.
+    :param instance: a model instance
+    :param parent_links: list of parent link fields, e.g. occurrence_ptr
+    """
+    for link in parent_links:
+        parent = getattr(instance, link.name)
+        for field in parent._meta.concrete_fields:
+            if field.is_relation and field.is_cached(instance):
+                field.set_cached_value(parent, field.get_cached_value(instance))
+
+
+def iter_chunks(queryset, chunk_size):
+    """
+    Iterate over a queryset in lists of records, in primary key order. QuerySet.iterator() ignores
+    prefetch_related, evaluating chunks keeps the number of queries constant per chunk without loading all
+    records at once.
+    """
+    last_pk = None
+    queryset = queryset.order_by('pk')
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def model_rows(queryset, chunk_size=2000):
+    """
+    Export every concrete field, method field (see method_fields_to_export) and relation of the model.
+    The field lists are read once and relations are fetched with a single planned query per chunk of records,
+    see plan_queryset. Coordinate method fields (longitude, latitude, easting, northing) are computed for the
+    whole chunk, see projects.coordinates.coordinate_columns.
+    :param queryset: queryset of a PaleoCoreBaseClass subclass
+    :param chunk_size: number of records fetched at a time
+    :return: generator of rows
+    """
+    # Fetch model field names. We need to account for data originating from tables, relations and methods.
+    instance = queryset.model()  # create an empty instance to read the field lists
+    concrete_field_names = instance.get_concrete_field_names()  # fetch a list of concrete field names
+    method_field_names = instance.method_fields_to_export()  # fetch a list for method field names
+    fk_fields = [f for f in instance._meta.get_fields() if f.is_relation]  # get a list of field objects
+    fk_field_names = [f.name for f in fk_fields]  # fetch a list of foreign key field names
+    parent_links = [f for f in fk_fields if f.concrete and getattr(f.remote_field, 'parent_link', False)]
+    batch_coordinates = isinstance(instance, PaleoCoreGeomBaseClass) and \
+        any(method in COORDINATE_FIELDS for method in method_field_names)
+
+    yield concrete_field_names + method_field_names + fk_field_names
+    for chunk in iter_chunks(plan_queryset(queryset, fk_fields), chunk_size):
+        columns = coordinate_columns(chunk) if batch_coordinates else {}
+        for o in chunk:
+            share_parent_relations(o, parent_links)
+            concrete_values = [getattr(o, field) for field in concrete_field_names]
+            method_values = [getattr(columns[o.pk], method) if o.pk in columns and method in COORDINATE_FIELDS
+                             else getattr(o, method)() for method in method_field_names]
+            fk_values = [get_fk_values(o, fk) for fk in fk_field_names]
+            yield clean_row(concrete_values + method_values + fk_values)
+
+
+def get_field_value(instance, field):
+    """
+    Trick to get foreign key field values, field can be a dotted path, e.g. 'context.name'
+    see https://stackoverflow.com/questions/20235807/how-to-get-foreign-key-values-with-getattr-from-models
+    """
+    field_path = field.split('.')
+    attr = instance
+    for elem in field_path:
+        try:
+            attr = getattr(attr, elem)
+        except AttributeError:
+            return None
+    return attr
+
+
+def mapped_rows(queryset, mapping):
+    """
+    Export the columns of a mapping
+    :param queryset:
+    :param mapping: dictionary mapping output csv column names (keys) to field paths or methods (values)
+    :return: generator of rows
+    """
+    yield list(mapping.keys())
+    for o in queryset.iterator():
+        row_data = []
+        for key in mapping:
+            # for each item in the field mapping dict get the db value for that field
+            field_value = get_field_value(o, mapping[key])
+            if callable(field_value):  # method attribute
+                row_data.append(field_value())
+            else:
+                row_data.append(field_value)
+        yield clean_row(row_data)
@@ -0,0 +1,481 @@
+"""
+Import engines of the project apps.
+
+KMLImportMixin is shared by the KML/KMZ upload views (mlp, lgrp, psr, omo_mursi). The uploaded archive is opened
+once and its members indexed by name, placemarks are streamed one at a time from the kml document
+(see fastkml.kml.KML.iter_placemarks) and the occurrences, their subtype rows and images are inserted in batches
+inside a single transaction.
+
+LegacySQLiteImporter migrates the legacy SQLite databases of the projects, e.g. the HRP Paleobase export (see
+hrp.import_hrp_occurrences). The source rows are read in chunks from a single query, cleaned and validated in worker
+processes (see parallel_map) and each chunk is bulk inserted by the main process.
+"""
+import sqlite3
+import time
+from collections import defaultdict, deque, Counter
+from concurrent.futures import ProcessPoolExecutor
+from zipfile import ZipFile
+
+import django
+from django.apps import apps
+from django.contrib import messages
+from django.core.files.base import ContentFile
+from django.db import connections, router, transaction
+from fastkml import kml, Placemark
+from lxml import etree
+
+from djgeojson.cache import invalidate_geometry
+from projects.models import ProjectStatistics
+
+
+def insert_subtype_rows(model, objs, using):
+    """
+    Insert the rows of the own table of multi-table subtype instances, e.g. Biology, whose parent rows exist.
+    This is the one use of the private QuerySet._insert, the insert behind bulk_create, with the (objs, fields,
+    using) arguments it takes from Django 1.10 to 4.x. On other versions the rows are saved one by one with a raw
+    save_base, which also inserts the own table only.
+    :param objs: instances with the primary key set to the id of their parent row
+    """
+    fields = model._meta.local_concrete_fields
+    if (1, 10) <= django.VERSION[:2] < (5, 0):
+        size = max(connections[using].ops.bulk_batch_size(fields, objs), 1)
+        for start in range(0, len(objs), size):
+            model._base_manager._insert(objs[start:start + size], fields=fields, using=using)
+    else:
+        for obj in objs:
+            obj.save_base(raw=True, force_insert=True, using=using)
+
+
+def bulk_create_occurrences(parent_model, objs, using=None):
+    """
+    Insert unsaved occurrences, and instances of their subtypes, e.g. Biology, in bulk.
+    bulk_create does not support multi-table inheritance: the occurrence rows are bulk created first, then
+    the subtype rows are inserted with the primary keys of their occurrence, see insert_subtype_rows.
+    :param parent_model: the concrete occurrence model, parent of the subtypes
+    :return: the occurrences, with their primary keys, in the order of objs
+    """
+    db = using or router.db_for_write(parent_model)
+    parents = []
+    for occurrence in objs:
+        if type(occurrence) is parent_model:
+            parents.append(occurrence)
+        else:
+            parents.append(parent_model(**{f.attname: getattr(occurrence, f.attname)
+                                           for f in parent_model._meta.concrete_fields}))
+    parent_model.objects.using(db).bulk_create(parents)
+
+    subtypes = defaultdict(list)
+    geometries = defaultdict(list)
+    for occurrence, parent in zip(objs, parents):
+        geometries[type(occurrence)].append(occurrence.geom)
+        if occurrence is parent:
+            continue
+        setattr(occurrence, parent_model._meta.pk.attname, parent.pk)
+        setattr(occurrence, type(occurrence)._meta.get_ancestor_link(parent_model).attname, parent.pk)
+        occurrence._state.adding = False
+        occurrence._state.db = db
+        subtypes[type(occurrence)].append(occurrence)
+    for model, subtype_objs in subtypes.items():
+        insert_subtype_rows(model, subtype_objs, db)
+
+    # Bulk inserts do not send post_save, evict the cached map tiles here
+    for model, geoms in geometries.items():
+        invalidate_geometry(model, *[geom for geom in geoms if geom])
+    return parents
+
+
+class KMLImportMixin(object):
+    """
+    Form view mixin importing the placemarks of an uploaded KML or KMZ file.
+
+    Views define occurrence_model, the concrete occurrence model (parent of the subtypes), and build_occurrence,
+    which returns an unsaved occurrence, or subtype instance, for a placemark.
+    """
+    occurrence_model = None
+    batch_size = 500
+    attributes_xpath = "//text()|//img"
+    reset_last_import = True  # toggle off the last_import flag of previously imported occurrences
+
+    def get_import_file(self):
+        return self.request.FILES['kmlfileUpload']  # get a handle on the file
+
+    def get_import_file_extension(self):
+        import_file = self.get_import_file()
+        import_file_name = import_file.name
+        return import_file_name[import_file_name.rfind('.') + 1:]  # get the file extension
+
+    def get_kmz_file(self):
+        """
+        Open the uploaded kmz archive, once per request
+        """
+        if getattr(self, '_kmz_file', None) is None:
+            self._kmz_file = ZipFile(self.get_import_file(), 'r')
+        return self._kmz_file
+
+    def get_kmz_members(self):
+        """
+        Members of the kmz archive indexed by file name
+        :return: dictionary mapping file names to ZipInfo objects
+        """
+        if getattr(self, '_kmz_members', None) is None:
+            self._kmz_members = {info.orig_filename: info for info in self.get_kmz_file().filelist}
+        return self._kmz_members
+
+    def is_kmz(self):
+        return self.get_import_file_extension().lower() == 'kmz'
+
+    def open_kml_file(self):
+        """
+        Open the kml document of the upload for reading, the doc.kml member of a kmz archive is read from the
+        zip stream without extracting it
+        """
+        if self.is_kmz():
+            return self.get_kmz_file().open('doc.kml')
+        import_file = self.get_import_file()
+        import_file.seek(0)
+        return import_file
+
+    def stream_placemarks(self):
+        """
+        Read the placemarks of the uploaded file one at a time, without building the whole kml document
+        """
+        kml_document = self.open_kml_file()
+        try:
+            for placemark in kml.KML().iter_placemarks(kml_document):
+                yield placemark
+        finally:
+            if self.is_kmz():
+                kml_document.close()
+
+    def clean_description(self, description):
+        return description
+
+    def get_attributes(self, table):
+        """
+        Get all text values and image tags from the placemark description table
+        """
+        return table.xpath(self.attributes_xpath)
+
+    def get_attributes_dict(self, attributes):
+        """
+        Create a dictionary from the attribute list. The list has key value pairs as alternating
+        elements in the list, the line below takes the first and every other elements and adds them
+        as keys, then the second and every other element and adds them as values.
+        e.g.
+        attributes[0::2] = ["Basis of Record", "Time", "Item Type" ...]
+        attributes[1::2] = ["Collection", "May 27, 2017, 10:12 AM", "Faunal" ...]
+        zip creates a list of tuples  = [("Basis of Record", "Collection), ...]
+        which is converted to a dictionary.
+        """
+        return dict(zip(attributes[0::2], attributes[1::2]))
+
+    def get_image_name(self, table):
+        """
+        Name of the placemark image in the kmz archive.
+        Future: add functionality to import multiple images
+        """
+        image_names = table.xpath("//img/@src")
+        if image_names and len(image_names) == 1:
+            return image_names[0]
+        return None
+
+    def build_occurrence(self, placemark, table, attributes, attributes_dict):
+        raise NotImplementedError
+
+    def lookup(self, model, **kwargs):
+        """
+        get_or_create, cached for the duration of the import
+        """
+        if not hasattr(self, '_lookups'):
+            self._lookups = {}
+        key = (model, tuple(sorted(kwargs.items())))
+        if key not in self._lookups:
+            self._lookups[key], created = model.objects.get_or_create(**kwargs)
+        return self._lookups[key]
+
+    def insert_batch(self, batch):
+        """
+        Insert a batch of occurrences, with their subtype rows and images.
+        :param batch: list of (occurrence, image name) tuples
+        """
+        parent_model = self.occurrence_model
+        db = router.db_for_write(parent_model)
+        parents = bulk_create_occurrences(parent_model, [occurrence for occurrence, image_name in batch], using=db)
+
+        # Save images in the upload directory of the image field, the file names include the occurrence id
+        if self.is_kmz():
+            kmz_file, members = self.get_kmz_file(), self.get_kmz_members()
+            with_images = []
+            for (occurrence, image_name), parent in zip(batch, parents):
+                if image_name in members:
+                    # e.g. /uploads/images/lgrp/14775_188.jpg
+                    parent.image.save('{}_{}'.format(parent.pk, image_name),
+                                      ContentFile(kmz_file.read(members[image_name])), save=False)
+                    occurrence.image = parent.image.name
+                    with_images.append(parent)
+            if with_images:
+                parent_model.objects.using(db).bulk_update(with_images, ['image'])
+
+    def import_placemarks(self, kml_placemark_list):
+        """
+        A procedure that reads KML placemarks and saves the data into the django database
+        :param kml_placemark_list: iterable of placemarks, see stream_placemarks
+        :return: Counter of the imported occurrences by model
+        """
+        counts = Counter()
+        batch = []
+        with transaction.atomic():
+            if self.reset_last_import:
+                self.occurrence_model.objects.all().update(last_import=False)  # Toggle off all last imports
+            for placemark in kml_placemark_list:
+                # Check to make sure that the object is a Placemark, filter out folder objects
+                if type(placemark) is not Placemark:
+                    raise IOError("KML File is badly formatted")
+                # parse the xml and copy placemark attributes to a dictionary
+                table = etree.fromstring(self.clean_description(placemark.description))
+                attributes = self.get_attributes(table)
+                occurrence = self.build_occurrence(placemark, table, attributes, self.get_attributes_dict(attributes))
+                counts[type(occurrence)] += 1
+                batch.append((occurrence, self.get_image_name(table)))
+                if len(batch) >= self.batch_size:
+                    self.insert_batch(batch)
+                    batch = []
+            if batch:
+                self.insert_batch(batch)
+            # Bulk inserts do not send post_save, recount the project records
+            ProjectStatistics.refresh(self.occurrence_model._meta.app_label)
+        occurrence_count = sum(counts.values())
+        if occurrence_count == 1:
+            message_string = '1 occurrence'
+        else:
+            message_string = '{} occurrences'.format(occurrence_count)
+        messages.add_message(self.request, messages.INFO, 'Successfully imported {}'.format(message_string))
+        return counts
+
+    def form_valid(self, form):
+        # This method is called when valid form data has been POSTed.
+        # It should return an HttpResponse.
+        self.import_placemarks(self.stream_placemarks())
+        return super(KMLImportMixin, self).form_valid(form)
+
+
+def _setup_worker():
+    # worker processes started with spawn, rather than fork, import the project apps before unpickling their tasks
+    if not apps.ready:
+        django.setup()
+
+
+def _map_chunk(function, rows):
+    return [function(row) for row in rows]
+
+
+def parallel_map(function, chunks, workers):
+    """
+    Apply a function to each row of an iterable of chunks of rows, sharding the chunks over a pool of worker processes.
+    The results are yielded in the order of the chunks, as soon as the chunk and the chunks before it are done, so
+    that reading, cleaning and writing overlap. At most two chunks per worker are read ahead.
+    The function, and the rows and their results, must be picklable, e.g. a module function or a classmethod, and the
+    function must not use the database connection.
+    :param workers: number of worker processes, rows are mapped in the current process when 1 or less
+    :return: iterator of (rows, results) tuples, one per chunk
+    """
+    if workers <= 1:
+        for rows in chunks:
+            yield rows, _map_chunk(function, rows)
+        return
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as executor:
+        for rows in chunks:
+            pending.append((rows, executor.submit(_map_chunk, function, rows)))
+            if len(pending) >= 2 * workers:
+                rows, future = pending.popleft()
+                yield rows, future.result()
+        while pending:
+            rows, future = pending.popleft()
+            yield rows, future.result()
+
+
+class ImportStatistics(object):
+    """
+    Counts and throughput of an import
+    """
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.row_count = 0
+        self.rejected_count = 0
+        self.chunk_count = 0
+        self.counts = Counter()  # imported records by model
+
+    @property
+    def imported_count(self):
+        return sum(self.counts.values())
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.row_count / self.elapsed if self.elapsed else 0
+
+    def summary(self):
+        lines = ['Read {} rows in {} chunks, {:.1f} seconds, {:.0f} rows per second'.format(
+            self.row_count, self.chunk_count, self.elapsed, self.rows_per_second),
+            '{} records imported, {} rows rejected'.format(self.imported_count, self.rejected_count)]
+        lines += ['{}: {}'.format(model._meta.label, count) for model, count in sorted(
+            self.counts.items(), key=lambda item: item[0]._meta.label)]
+        return lines
+
+
+class LegacySQLiteImporter(object):
+    """
+    Import the records of a legacy SQLite database, e.g. a project Paleobase export.
+
+    The rows of the source query, one per record, are read in chunks of chunk_size rows from a single cursor.
+    Subclasses define occurrence_model, get_query, and build, which returns an unsaved occurrence or subtype
+    instance for a row, or None to reject it. The CPU bound conversion and validation of the rows that does not need
+    the database goes in the clean classmethod, run by parallel_map in worker processes, and build receives its
+    result. Lookup tables are loaded once in prepare, or per chunk in prepare_chunk, and each chunk is bulk inserted,
+    see bulk_create_occurrences. The import runs in a single transaction, rolled back in dry runs.
+
+    statistics = HRPOccurrenceImporter('/data/HRP_Paleobase4_2016.sqlite', dry_run=True).run()
+    """
+    occurrence_model = None
+    chunk_size = 2000
+
+    def __init__(self, path, chunk_size=None, limit=None, dry_run=False, progress=None, workers=1):
+        """
+        :param limit: maximum number of source rows read
+        :param progress: optional callable, called with the statistics after each chunk
+        :param workers: number of processes cleaning the rows, see parallel_map
+        """
+        self.path = path
+        self.chunk_size = chunk_size or self.chunk_size
+        self.workers = workers
+        self.limit = limit
+        self.dry_run = dry_run
+        self.progress = progress
+        self.statistics = ImportStatistics()
+        self._unique_values = {}
+
+    def connect(self):
+        return sqlite3.connect(self.path)
+
+    def get_query(self):
+        """
+        The source query and its parameters, one row per record
+        :return: (sql, params)
+        """
+        raise NotImplementedError
+
+    def get_limited_query(self):
+        sql, params = self.get_query()
+        if self.limit is not None:
+            sql, params = '{} LIMIT ?'.format(sql), list(params) + [self.limit]
+        return sql, params
+
+    def count(self, connection):
+        """
+        Number of source rows, counted by the database
+        """
+        sql, params = self.get_limited_query()
+        return connection.execute('SELECT COUNT(*) FROM ({})'.format(sql), params).fetchone()[0]
+
+    def read_chunks(self, connection):
+        """
+        Stream the source rows in lists of chunk_size rows
+        """
+        sql, params = self.get_limited_query()
+        cursor = connection.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def prepare(self):
+        """
+        Called once before the first chunk, e.g. to load lookup tables
+        """
+
+    def prepare_chunk(self, cleaned_rows):
+        """
+        Called with the cleaned rows of each chunk before they are built, e.g. to fetch the related objects of
+        the chunk
+        """
+
+    @classmethod
+    def clean(cls, row):
+        """
+        Convert and validate a source row without the database, e.g. parse its dates, in a worker process
+        :return: the cleaned row, passed to build
+        """
+        return row
+
+    def build(self, cleaned_row):
+        raise NotImplementedError
+
+    def unique_values(self, field_name):
+        """
+        Set of the values of a unique field of the occurrence model, read from the database in one query on first
+        use. Importers add the values of the records they build, see is_unique.
+        """
+        values = self._unique_values.get(field_name)
+        if values is None:
+            values = self._unique_values[field_name] = set(
+                self.occurrence_model._default_manager.values_list(field_name, flat=True))
+        return values
+
+    def is_unique(self, field_name, value):
+        """
+        True the first time a value of a unique field of the occurrence model is seen
+        """
+        values = self.unique_values(field_name)
+        if value in values:
+            return False
+        values.add(value)
+        return True
+
+    def insert(self, objs):
+        bulk_create_occurrences(self.occurrence_model, objs)
+
+    def run(self):
+        """
+        Import all the source rows
+        :return: ImportStatistics
+        """
+        statistics = self.statistics
+        connection = self.connect()
+        try:
+            with transaction.atomic():
+                self.prepare()
+                for rows, cleaned_rows in parallel_map(self.clean, self.read_chunks(connection), self.workers):
+                    self.prepare_chunk(cleaned_rows)
+                    objs = []
+                    for cleaned_row in cleaned_rows:
+                        obj = self.build(cleaned_row)
+                        if obj is None:
+                            statistics.rejected_count += 1
+                        else:
+                            objs.append(obj)
+                            statistics.counts[type(obj)] += 1
+                    if objs and not self.dry_run:
+                        self.insert(objs)
+                    statistics.row_count += len(rows)
+                    statistics.chunk_count += 1
+                    if self.progress is not None:
+                        self.progress(statistics)
+                if self.dry_run:
+                    # also undo the lookup records created while building, e.g. new localities
+                    transaction.set_rollback(True)
+                else:
+                    # Bulk inserts do not send post_save, recount the project records
+                    ProjectStatistics.refresh(self.occurrence_model._meta.app_label)
+        finally:
+            connection.close()
+        statistics.finished = time.time()
+        return statistics
@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.apps import apps
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from djgeojson.cache import tiles_for_extent
+from djgeojson.views import TiledGeoJSONLayerView, MVTLayerView
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size and server time of GeoJSON and vector (MVT) tiles on synthetic points. ' \
+           'The synthetic points are added to the table of a geometry model in a transaction that is rolled back.'
+    name_prefix = 'benchmark point'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=500000)
+        parser.add_argument('--min-zoom', type=int, default=8)
+        parser.add_argument('--max-zoom', type=int, default=14)
+        parser.add_argument('--tiles-per-zoom', type=int, default=10)
+        parser.add_argument('--extent', default='40.4,11.0,40.7,11.3',
+                            help='xmin,ymin,xmax,ymax of the synthetic points, WGS84')
+        parser.add_argument('--model', default='origins.site',
+                            help='Model storing the synthetic points, with name and geom fields, e.g. hrp.locality')
+
+    def handle(self, *args, **options):
+        extent = [float(v) for v in options['extent'].split(',')]
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+        with transaction.atomic():
+            self.populate(model, options['points'], extent)
+            queryset = model.objects.filter(name__startswith=self.name_prefix)
+            self.stdout.write('{:>4} {:>6} {:>14} {:>12} {:>14} {:>12}'.format(
+                'zoom', 'tiles', 'geojson bytes', 'geojson ms', 'mvt bytes', 'mvt ms'))
+            for z in range(options['min_zoom'], options['max_zoom'] + 1):
+                tiles = sorted(tiles_for_extent(extent, z))
+                random.shuffle(tiles)
+                tiles = tiles[:options['tiles_per_zoom']]
+                geojson_size, geojson_time = self.render(TiledGeoJSONLayerView, queryset, z, tiles)
+                mvt_size, mvt_time = self.render(MVTLayerView, queryset, z, tiles)
+                self.stdout.write('{:>4} {:>6} {:>14} {:>12.1f} {:>14} {:>12.1f}'.format(
+                    z, len(tiles), geojson_size, geojson_time, mvt_size, mvt_time))
+            transaction.set_rollback(True)
+
+    def populate(self, model, count, extent):
+        xmin, ymin, xmax, ymax = extent
+        started = time.time()
+        batch_size = 10000
+        for start in range(0, count, batch_size):
+            model.objects.bulk_create(
+                model(name='{} {}'.format(self.name_prefix, i),
+                      geom=Point(random.uniform(xmin, xmax), random.uniform(ymin, ymax), srid=4326))
+                for i in range(start, min(start + batch_size, count)))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {}'.format(connection.ops.quote_name(model._meta.db_table)))
+        self.stdout.write('{} points created in {:.1f} s'.format(count, time.time() - started))
+
+    def render(self, view_class, queryset, z, tiles):
+        """
+        Total payload size (bytes, before gzip) and server time (ms) to render the tiles of the synthetic points
+        with a view class
+        """
+        size = 0
+        started = time.perf_counter()
+        for x, y in tiles:
+            view = view_class(queryset=queryset, properties=['name'])
+            view.args = []
+            view.kwargs = {'z': z, 'x': x, 'y': y}
+            size += len(view.render_to_response(context={}).content)
+        return size, (time.perf_counter() - started) * 1000
@@ -0,0 +1,25 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.models import Taxon
+from projects.taxonomy import rebuild_paths
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the lineage paths of the taxa of every project app, or of the given apps.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('app_label', nargs='*', help='Only rebuild the taxa of these apps')
+
+    def handle(self, *args, **options):
+        taxon_models = [model for model in apps.get_models() if issubclass(model, Taxon)]
+        if options['app_label']:
+            taxon_models = [model for model in taxon_models if model._meta.app_label in options['app_label']]
+            if not taxon_models:
+                raise CommandError('No taxon model in {}'.format(', '.join(options['app_label'])))
+        for model in taxon_models:
+            try:
+                changed = rebuild_paths(model)
+            except ValueError as error:
+                raise CommandError(error)
+            self.stdout.write('{}: {} paths updated'.format(model._meta.label, changed))
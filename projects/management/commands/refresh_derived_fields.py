@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.derived import registry
+
+
+class Command(BaseCommand):
+    help = 'Recompute the derived columns of the project models, e.g. origins.site.fossil_count. Columns refreshed ' \
+           'before are only recomputed for the rows with sources modified since, unless --full is given.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='*', help='Only refresh these columns, e.g. origins.site.fossil_count')
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute every row, e.g. after bulk updates or deletes')
+
+    def handle(self, *args, **options):
+        unknown = set(options['name']) - set(registry)
+        if unknown:
+            raise CommandError('Unknown derived fields {}, choose from {}'.format(', '.join(sorted(unknown)),
+                                                                                  ', '.join(registry)))
+        for derived_field, count, incremental in registry.refresh(options['name'], full=options['full']):
+            self.stdout.write('{}: {} rows updated{}'.format(derived_field.name, count,
+                                                              ' (incremental)' if incremental else ''))
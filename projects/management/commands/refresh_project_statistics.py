@@ -0,0 +1,21 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from projects.models import ProjectStatistics
+
+
+class Command(BaseCommand):
+    help = 'Recount the records of every project app, or of the given apps, for the project pages. ' \
+           'Run periodically, bulk inserts and updates do not send the signals keeping the counts current.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('app_label', nargs='*', help='Only refresh the statistics of these apps')
+
+    def handle(self, *args, **options):
+        app_labels = options['app_label'] or [app_config.label for app_config in apps.get_app_configs()
+                                              if ProjectStatistics.get_counted_models(app_config.label)]
+        for app_label in app_labels:
+            statistics = ProjectStatistics.refresh(app_label)
+            self.stdout.write('{}: {} records, {} archaeology, {} biology, {} geology'.format(
+                app_label, statistics.record_count, statistics.archaeology_count, statistics.biology_count,
+                statistics.geology_count))
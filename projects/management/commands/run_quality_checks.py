@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects import quality
+from projects.models import QualityCheckResult
+
+
+class Command(BaseCommand):
+    help = 'Run the data quality checks of every project app, or of the given apps, and store the results ' \
+           'listed in the Quality Check Results admin. See projects.quality.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('app_label', nargs='*', help='Only run the checks of these apps')
+        parser.add_argument('--check', action='append', dest='names', help='Only run the checks with this name')
+        parser.add_argument('--sample-size', type=int, default=100,
+                            help='Number of failing record keys stored per check')
+        parser.add_argument('--list', action='store_true', help='List the checks without running them')
+
+    def handle(self, *args, **options):
+        checks = []
+        for app_label in options['app_label'] or [None]:
+            app_checks = quality.registry.get_checks(app_label, options['names'])
+            if app_label and not app_checks:
+                raise CommandError('No quality checks for {}'.format(app_label))
+            checks.extend(app_checks)
+        if options['list']:
+            for check in checks:
+                self.stdout.write('{}.{}: {}'.format(check.app_label, check.name, check.description))
+            return
+        results = quality.run_checks(checks, sample_size=options['sample_size'])
+        if not options['names']:
+            # drop the results of checks that are not registered anymore
+            registered = set((check.app_label, check.name) for check in quality.registry.get_checks())
+            obsolete = [result.pk for result in QualityCheckResult.objects.only('app_label', 'name')
+                        if (result.app_label, result.name) not in registered]
+            QualityCheckResult.objects.filter(pk__in=obsolete).delete()
+        for result in results:
+            self.stdout.write('{}: {} failing ({:.2f}s)'.format(result, result.failure_count, result.duration))
@@ -0,0 +1,116 @@
+"""
+Reconciliation of imported spreadsheet rows with existing occurrences, by catalog number and by coordinates.
+
+All the rows are matched with set based queries: one query for the catalog numbers, and one spatial join per
+batch of rows for the coordinates, joining a VALUES list of the row points to the occurrence table
+(PostGIS, see OccurrenceMatcher.coordinate_matches). Used by mlp.utilities.match and psr.utilities.match.
+"""
+from collections import defaultdict
+
+from django.db import connection
+
+
+class OccurrenceMatcher(object):
+    """
+    Match rows of the form [id, catalog number, longitude, latitude, ..., basis of record (index 7), ...]
+    against the objects of an occurrence model, e.g. Biology.
+
+    matcher = OccurrenceMatcher(Biology, catalog_prefix='MLP')
+    full_match_list, coordinate_match_list, bad_match_list = matcher.match(data_list)
+    :param distance: maximum distance between matching points, in metres
+    """
+    catalog_number_index = 1
+    longitude_index = 2
+    latitude_index = 3
+    basis_of_record_index = 7
+    batch_size = 5000
+
+    def __init__(self, model, catalog_prefix, distance=1, geom_field='geom'):
+        self.model = model
+        self.catalog_prefix = catalog_prefix
+        self.distance = distance
+        self.geom_field = geom_field
+
+    def clean_catalog_number(self, catalog_number_string):
+        """
+        Catalog number in the form MLP-1 from a catalog number string like MLP-001, None if it has no number
+        """
+        try:
+            return '{}-{}'.format(self.catalog_prefix, int(catalog_number_string.split('-')[1]))
+        except (IndexError, ValueError):
+            return None
+
+    def catalog_matches(self, catalog_number_strings):
+        """
+        Objects matching catalog numbers, in a single query
+        :return: dictionary of the object by catalog number string, only for catalog numbers matching one object
+        """
+        cleaned = {string: self.clean_catalog_number(string) for string in set(catalog_number_strings)}
+        objects = defaultdict(list)
+        for obj in self.model.objects.filter(catalog_number__in=set(cleaned.values()) - {None}):
+            objects[obj.catalog_number].append(obj)
+        return {string: objects[catalog_number][0] for string, catalog_number in cleaned.items()
+                if len(objects.get(catalog_number, [])) == 1}
+
+    def coordinate_matches(self, points):
+        """
+        Primary keys of the objects within distance of points, with a spatial join per batch of points
+        :param points: list of (longitude, latitude)
+        :return: list of sets of primary keys, in the order of the points
+        """
+        field = self.model._meta.get_field(self.geom_field)
+        table = field.model._meta  # the model holding the geometry column, e.g. Occurrence for Biology
+        quote = connection.ops.quote_name
+        # 0.0001 degree is more than 1 metre below 84 degrees of latitude, the bounding box uses the spatial index
+        expand = self.distance * 0.0001
+        matches = [set() for point in points]
+        for start in range(0, len(points), self.batch_size):
+            batch = points[start:start + self.batch_size]
+            values = ', '.join(['(%s, %s, %s)'] * len(batch))
+            params = [value for index, (longitude, latitude) in enumerate(batch, start)
+                      for value in (index, float(longitude), float(latitude))]
+            sql = 'SELECT v.row_index, o.{pk} FROM (VALUES {values}) AS v(row_index, lon, lat) ' \
+                  'JOIN {table} o ON o.{geom} && ST_Expand(ST_SetSRID(ST_MakePoint(v.lon, v.lat), {srid}), %s) ' \
+                  'AND ST_DistanceSphere(o.{geom}, ST_SetSRID(ST_MakePoint(v.lon, v.lat), {srid})) <= %s'.format(
+                      pk=quote(table.pk.column), values=values, table=quote(table.db_table),
+                      geom=quote(field.column), srid=int(field.srid))
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params + [expand, self.distance])
+                for row_index, pk in cursor.fetchall():
+                    matches[row_index].add(pk)
+        return matches
+
+    def match(self, data_list):
+        """
+        Match rows by catalog number and coordinates
+        :return: full_match_list, coordinate_match_list, bad_match_list, lists of (row, matched object) tuples
+        """
+        catalog_matches = self.catalog_matches([row[self.catalog_number_index] for row in data_list])
+        coordinate_pks = self.coordinate_matches([(row[self.longitude_index], row[self.latitude_index])
+                                                  for row in data_list])
+        # the objects matched by coordinates, other occurrence subtypes sharing the table are left out
+        objects = self.model.objects.in_bulk(set(pk for pks in coordinate_pks for pk in pks))
+        full_match_list = []
+        coordinate_match_list = []
+        bad_match_list = []
+        for row, pks in zip(data_list, coordinate_pks):
+            cat_match = catalog_matches.get(row[self.catalog_number_index])
+            coord_matches = [objects[pk] for pk in sorted(pks) if pk in objects]
+            # catalog match == coordinate match (only one object)
+            if cat_match and len(coord_matches) == 1 and cat_match == coord_matches[0]:
+                full_match_list.append((row, cat_match))
+            # coordinate match != catalog match, e.g. because there is an old or erroneous catalog number
+            elif len(coord_matches) == 1 and not cat_match:
+                coordinate_match_list.append((row, coord_matches[0]))
+            # catalog match in coordinate match list (more than one coordinate match)
+            elif cat_match and len(coord_matches) >= 2:
+                if cat_match in coord_matches:
+                    coordinate_match_list.append((row, cat_match))
+            # No cat match and multiple coord matches, see if one is human observation
+            elif not cat_match and len(coord_matches) != 1 and row[self.basis_of_record_index] == 'HumanObservation':
+                observations = [obj for obj in coord_matches if obj.catalog_number == self.catalog_prefix + '-0']
+                if len(coord_matches) >= 2 and len(observations) == 1:
+                    coordinate_match_list.append((row, observations[0]))
+            else:
+                bad_match_list.append((row, None))
+        return full_match_list, coordinate_match_list, bad_match_list
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('projects', '0008_auto_20200807_1752'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_ids', models.TextField(default='[]', help_text='JSON list of the primary keys of the exported records.')),
+                ('exporter', models.CharField(help_text='Dotted path to the row builder, see projects.exports', max_length=255)),
+                ('options', models.TextField(default='{}', help_text='JSON keyword arguments passed to the exporter.')),
+                ('filename', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('finished', 'Finished'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('row_count', models.IntegerField(default=0)),
+                ('progress', models.IntegerField(default=0, help_text='Number of rows written.')),
+                ('file', models.FileField(blank=True, null=True, upload_to='exports')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created')),
+                ('date_finished', models.DateTimeField(blank=True, null=True, verbose_name='Finished')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Export Job',
+                'ordering': ['-date_created'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStatistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('app_label', models.CharField(max_length=100, unique=True)),
+                ('record_count', models.IntegerField(default=0)),
+                ('archaeology_count', models.IntegerField(default=0)),
+                ('biology_count', models.IntegerField(default=0)),
+                ('geology_count', models.IntegerField(default=0)),
+                ('date_refreshed', models.DateTimeField(blank=True, null=True, verbose_name='Refreshed')),
+            ],
+            options={
+                'verbose_name': 'Project Statistics',
+                'verbose_name_plural': 'Project Statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('projects', '0010_projectstatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QualityCheckResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('app_label', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('failure_count', models.IntegerField(default=0)),
+                ('object_ids', models.TextField(default='[]', help_text='JSON list of the primary keys of failing records.')),
+                ('duration', models.FloatField(default=0, help_text='Seconds taken by the checks of the model.')),
+                ('date_run', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Run')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+            options={
+                'verbose_name': 'Quality Check Result',
+                'verbose_name_plural': 'Quality Check Results',
+                'ordering': ['app_label', 'name'],
+                'unique_together': {('app_label', 'name')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_qualitycheckresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DerivedFieldRefresh',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('date_refreshed', models.DateTimeField(verbose_name='Refreshed')),
+                ('row_count', models.IntegerField(default=0, help_text='Number of rows updated by the last refresh.')),
+            ],
+            options={
+                'verbose_name': 'Derived Field Refresh',
+                'verbose_name_plural': 'Derived Field Refreshes',
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0012_derivedfieldrefresh'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxonIndexVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('app_label', models.CharField(max_length=100, unique=True)),
+                ('version', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
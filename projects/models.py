@@ -1,14 +1,21 @@
 # Python imports
 import os
-import math
+from collections import Counter
+import csv
+import json
+import tempfile
 # Django imports
-from django.db.models import Manager as GeoManager
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Manager as GeoManager, F, Value, OuterRef, Subquery, IntegerField, Count, Case, When
+from django.db.models.functions import Concat, Substr
 from django.contrib.gis.db import models
 from django.contrib.contenttypes.models import ContentType
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.apps import apps
 from django.apps.config import AppConfig
 from django.utils import timezone
+from django.utils.module_loading import import_string
 from django.contrib.gis.geos import Point
 from django_countries.fields import CountryField
 from django.utils.html import format_html
@@ -29,6 +36,68 @@ from taggit.models import TaggedItemBase
 from utils.models import RelatedLink, CarouselItem
 from ckeditor.fields import RichTextField as CKRichTextField
 from projects.ontologies import PERIOD_CHOICES, EPOCH_CHOICES, AGE_CHOICES
+from projects.coordinates import is_utm, utm_srid
+
+
+class SubqueryCount(Subquery):
+    """
+    Number of rows of a correlated subquery
+    """
+    template = "(SELECT COUNT(*) FROM (%(subquery)s) _count)"
+    output_field = IntegerField()
+
+
+class TaxonQuerySet(models.QuerySet):
+    def get_biology_model(self):
+        """
+        The Biology model of the taxon app, None if the app has no Biology model
+        """
+        try:
+            return apps.get_model(self.model._meta.app_label, 'Biology')
+        except LookupError:
+            return None
+
+    def with_biology_counts(self):
+        """
+        Annotate each taxon with the number of Biology objects pointing to it (biology_count), None when the app
+        has no Biology model. Counts including the taxa below are annotated by with_subtree_biology_counts.
+        """
+        biology_model = self.get_biology_model()
+        if biology_model is None:
+            return self.annotate(biology_count=Value(None, output_field=IntegerField()))
+        biologies = biology_model.objects.order_by().values('pk')
+        return self.annotate(biology_count=SubqueryCount(biologies.filter(taxon=OuterRef('pk'))))
+
+    def subtree_biology_counts(self):
+        """
+        Number of Biology objects pointing to each taxon or to any taxon below it, from a single query grouping
+        the biology objects by the lineage path of their taxon
+        :return: Counter of the counts by taxon pk, None when the app has no Biology model
+        """
+        biology_model = self.get_biology_model()
+        if biology_model is None:
+            return None
+        counts = Counter()
+        for path, count in biology_model.objects.order_by().values_list('taxon__path').annotate(count=Count('pk')):
+            for pk in (path or '').strip('/').split('/'):
+                if pk:
+                    counts[int(pk)] += count
+        return counts
+
+    def with_subtree_biology_counts(self):
+        """
+        Annotate each taxon with the number of Biology objects pointing to it or to any taxon below it
+        (subtree_biology_count), so that the taxa can be sorted on it. The counts of subtree_biology_counts are
+        written into the query as a CASE over the taxa with biology objects. Counts are None for the taxa whose
+        lineage path is not built yet, and when the app has no Biology model.
+        """
+        unknown = Value(None, output_field=IntegerField())
+        counts = self.subtree_biology_counts()
+        if counts is None:
+            return self.annotate(subtree_biology_count=unknown)
+        cases = [When(pk=pk, then=Value(count)) for pk, count in counts.items()]
+        return self.annotate(subtree_biology_count=Case(When(path='', then=unknown), *cases, default=Value(0),
+                                                        output_field=IntegerField()))
 
 
 # MODELS
@@ -162,10 +231,64 @@ class Taxon(PaleoCoreBaseClass):
     label_help_text = """For a species, the name field contains the specific epithet and the label contains the full
     scientific name, e.g. Homo sapiens, name = sapiens, label = Homo sapiens"""
     label = models.CharField(max_length=244, null=True, blank=True, help_text=label_help_text)
+    # Materialized lineage, the ids of the taxon ancestors and its own id from the root down, e.g. /1/2/3/6/
+    # Updated on save, rebuilt with the rebuild_taxon_paths management command.
+    path = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
+
+    objects = TaxonQuerySet.as_manager()
 
     def __str__(self):
         return str(self.label)
 
+    def save(self, *args, **kwargs):
+        super(Taxon, self).save(*args, **kwargs)
+        self.update_path()
+
+    def build_path(self):
+        """
+        Compute the lineage path of the taxon from the path of its parent
+        """
+        if self.parent_id is None:
+            return '/{}/'.format(self.pk)
+        return '{}{}/'.format(self.parent.path or self.parent.build_path(), self.pk)
+
+    def update_path(self):
+        """
+        Store the lineage path of the taxon, and move its descendants when the taxon changed parent.
+        """
+        path = self.build_path()
+        if path == self.path:
+            return
+        old_path = self.path
+        model = type(self)
+        model.objects.filter(pk=self.pk).update(path=path)
+        if old_path:
+            moved = model.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr('path', len(old_path) + 1)))
+            if moved:
+                # the indexed descendants have their old paths
+                from projects.taxonomy import taxonomy_changed
+                taxonomy_changed(model)
+        self.path = path
+        self.__dict__.pop('_lineage', None)
+
+    def path_ids(self):
+        """
+        Ids of the taxon ancestors and of the taxon itself, from the root down
+        """
+        return [int(pk) for pk in self.path.strip('/').split('/')] if self.path else []
+
+    @classmethod
+    def prefetch_lineage(cls, taxa):
+        """
+        Fetch the lineages of a list of taxa in a single query, used by full_lineage and full_name.
+        """
+        taxa = [taxon for taxon in taxa if taxon.path]
+        ancestors = cls.objects.in_bulk({pk for taxon in taxa for pk in taxon.path_ids()})
+        for taxon in taxa:
+            taxon._lineage = [ancestors[pk] for pk in taxon.path_ids() if pk in ancestors]
+        return taxa
+
     def update_label(self):
         """
         Update the values in the label field to match the name field.
@@ -191,40 +314,50 @@ class Taxon(PaleoCoreBaseClass):
             return self.parent.name
 
     def full_name(self):
-        if self.parent is None:
-            return self.name
-        elif self.parent.parent is None:
-            return self.name
-        else:
-            return self.parent.full_name() + ", " + self.name
+        return ", ".join(taxon.name for taxon in self.full_lineage())
+
+    def get_lineage(self):
+        """
+        The taxon ancestors and the taxon itself from the root down, in a single query on the lineage path
+        """
+        if not hasattr(self, '_lineage'):
+            if not self.path:  # path not built yet, walk the parents
+                return (self.parent.get_lineage() if self.parent else []) + [self]
+            type(self).prefetch_lineage([self])
+        return [taxon if taxon.pk != self.pk else self for taxon in self._lineage]
 
     def full_lineage(self):
         """
-        Get a list of taxon object representing the full lineage hierarchy
+        Get a list of taxon object representing the full lineage hierarchy, the root taxon excepted
         :return: list of taxon objects ordered highest rank to lowest
         """
-        if self.parent is None:
-            return [self]
-        if self.parent.parent is None:
-            return [self]
-        else:
-            return self.parent.full_lineage() + [self]
+        lineage = self.get_lineage()
+        return lineage[1:] if len(lineage) > 1 else lineage
+
+    def get_ancestors(self):
+        """
+        Queryset of the taxon ancestors, looked up by id from the lineage path
+        """
+        return type(self).objects.filter(pk__in=self.path_ids()[:-1])
+
+    def get_descendants(self):
+        """
+        Queryset of all the taxa below the taxon, a prefix lookup on the indexed lineage path
+        """
+        return type(self).objects.filter(path__startswith=self.path).exclude(pk=self.pk)
 
     def biology_usages(self):
         """
-        Method to get a count of the number of Biology objects pointing to the taxon instance. This method usese
-        the content type system to find the containing app and model.
+        Method to get a count of the number of Biology objects pointing to the taxon instance. Uses the
+        biology_count annotation when the taxon comes from TaxonQuerySet.with_biology_counts.
         :return: Returns and integer count of the number of biology instances in the app that point to the taxon.
         """
-        result = None
-        app = self._meta.app_label
-        try:
-            content_type = ContentType.objects.get(app_label=app, model='biology')  # assumes the model is named Biology
-            this_biology = content_type.model_class()
-            result = this_biology.objects.filter(taxon=self).count()
-        except ContentType.DoesNotExist:
-            pass  # If no matching content type then we'll pass here and return None
-        return result
+        if hasattr(self, 'biology_count'):
+            return self.biology_count
+        biology_model = type(self).objects.get_biology_model()  # assumes the model is named Biology
+        if biology_model is None:
+            return None  # If no Biology model in the app return None
+        return biology_model.objects.filter(taxon=self).count()
 
     def get_higher_taxon(self, rank):
         """
@@ -234,17 +367,9 @@ class Taxon(PaleoCoreBaseClass):
         Returns None for lower taxonomic rank.
 
         """
-        if self.taxon.rank == rank:  # if current taxon rank equals target return current
-            current_taxon = self.taxon  # set current taxon
-        elif self.taxon.rank.ordinal < rank:
-            current_taxon = None
-        else:
-            while current_taxon.rank > rank:  # iterate through taxon hierarchy until rank equals target
-                current_taxon = current_taxon.parent
-        return current_taxon  # return the appropriate higher taxon object
-
-        # if taxon_rank_object.ordinal >= self.rank:  # trying to bet lower rank
-        #     raise: ObjectDoesNotExist
+        if self.rank_id == rank.pk:  # if current taxon rank equals target return current
+            return self
+        return self.get_ancestors().filter(rank=rank).first()
 
     def get_children(self):
         """
@@ -328,17 +453,11 @@ class PaleoCoreGeomBaseClass(PaleoCoreBaseClass):
 
         result = None
         if self.geom and self.geom.geom_type == 'Point':
-            # EPSG 32701 = UTM Zone 1 South and 32760 = UTM Zone 60 South
-            # EPSG 32601 = UTM Zone 1 North and 32660 = UTM Zone 60 North
-            if 32701 <= self.geom.srid <= 32760 or 32601 <= self.geom.srid <= 32660:  # If wgs84 utm just return value
+            if is_utm(self.geom.srid):  # If wgs84 utm just return value
                 pt = self.geom
             # if wgs84 gcs find zone and convert to utm
             elif self.geom.srid == 4326:  # if pt is in WGS84 geographic then get EPSG for WGS84 UTM
-                utm_zone = math.floor((((self.geom.x + 180) / 6) % 60) + 1)  # UTM Zone from lon
-                coordinate_system = 32600 + utm_zone  # epsg identifiers follow a pattern by zone
-                if self.geom.y < 0:
-                    coordinate_system = coordinate_system + 100
-                pt = self.geom.transform(coordinate_system, clone=True)
+                pt = self.geom.transform(utm_srid(self.geom.x, self.geom.y), clone=True)
             else:
                 try:
                     pt = self.geom.transform(4326, clone=True)
@@ -501,6 +620,288 @@ class PaleoCoreStratigraphicUnitBaseClass(PaleoCoreBaseClass):
         abstract = True
 
 
+# Taxonomy index
+class TaxonIndexVersion(models.Model):
+    """
+    Version of the taxonomy of a project app, bumped when a taxon, rank or identification qualifier changes.
+    The in memory taxon indexes of all processes compare it with their own version, see projects.taxonomy.
+    """
+    app_label = models.CharField(max_length=100, unique=True)
+    version = models.IntegerField(default=0)
+
+    def __str__(self):
+        return '{} {}'.format(self.app_label, self.version)
+
+    @classmethod
+    def get_version(cls, app_label):
+        return cls.objects.filter(app_label=app_label).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, app_label):
+        """
+        Increment the version of an app, in the current transaction
+        :return: the new version
+        """
+        if not cls.objects.filter(app_label=app_label).update(version=F('version') + 1):
+            cls.objects.get_or_create(app_label=app_label)
+            cls.objects.filter(app_label=app_label).update(version=F('version') + 1)
+        return cls.get_version(app_label)
+
+
+# Background jobs
+class ExportJob(models.Model):
+    """
+    A data export run in a background worker (see projects.tasks.run_export_job), started from an admin action
+    with ExportJobAdminMixin.start_export. The resulting csv file is downloaded from the ExportJob admin.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FINISHED, 'Finished'),
+        (FAILED, 'Failed'),
+    )
+    #: number of rows written between two progress updates
+    progress_step = 500
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_ids = models.TextField(default='[]', help_text='JSON list of the primary keys of the exported records.')
+    exporter = models.CharField(max_length=255, help_text='Dotted path to the row builder, see projects.exports')
+    options = models.TextField(default='{}', help_text='JSON keyword arguments passed to the exporter.')
+    filename = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    row_count = models.IntegerField(default=0)
+    progress = models.IntegerField(default=0, help_text='Number of rows written.')
+    file = models.FileField(upload_to='exports', null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    date_created = models.DateTimeField('Created', default=timezone.now)
+    date_finished = models.DateTimeField('Finished', null=True, blank=True)
+
+    def __str__(self):
+        return '[{}] {}'.format(self.id, self.filename)
+
+    def get_object_ids(self):
+        return json.loads(self.object_ids)
+
+    def get_queryset(self):
+        model = self.content_type.model_class()
+        return model.objects.filter(pk__in=self.get_object_ids()).order_by('pk')
+
+    def set_progress(self, **values):
+        """
+        Update the job row without saving the whole instance, so that progress is visible while the job runs
+        """
+        for key, value in values.items():
+            setattr(self, key, value)
+        ExportJob.objects.filter(pk=self.pk).update(**values)
+
+    def run(self):
+        """
+        Write the export to a csv file and attach it to the job
+        """
+        self.set_progress(status=self.RUNNING, progress=0, error=None)
+        try:
+            exporter = import_string(self.exporter)
+            with tempfile.TemporaryFile(mode='w+', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                rows = exporter(self.get_queryset(), **json.loads(self.options))
+                writer.writerow(next(rows))  # headers
+                count = 0
+                for count, row in enumerate(rows, 1):
+                    writer.writerow(row)
+                    if count % self.progress_step == 0:
+                        self.set_progress(progress=count)
+                csv_file.seek(0)
+                self.file.save(self.filename, File(csv_file), save=False)
+        except Exception as e:
+            self.set_progress(status=self.FAILED, error=str(e), date_finished=timezone.now())
+            raise
+        self.set_progress(file=self.file.name, status=self.FINISHED, progress=count, date_finished=timezone.now())
+
+    class Meta:
+        ordering = ['-date_created']
+        verbose_name = 'Export Job'
+
+
+# Statistics
+class ProjectStatistics(models.Model):
+    """
+    Occurrence counts of a project app, read by the project pages instead of counting the app tables on each render.
+    Counts are updated by the save and delete signals of the counted models (see projects.signals) and recomputed
+    with the refresh_project_statistics management command, e.g. after bulk imports.
+    """
+    COUNT_FIELDS = ('record_count', 'archaeology_count', 'biology_count', 'geology_count')
+    #: counted model names by app, the first name found in the app is used
+    COUNTED_MODELS = {
+        'cc': {'record_count': ['context'], 'archaeology_count': ['lithic']},
+        'fc': {'record_count': ['context'], 'archaeology_count': ['lithic']},
+        'eppe': {'record_count': ['find'], 'biology_count': ['fossil']},
+        None: {'record_count': ['occurrence'], 'archaeology_count': ['archaeology'], 'biology_count': ['biology'],
+               'geology_count': ['geology', 'rock']},  # all other apps
+    }
+    _model_fields = {}  # statistics fields by counted model and signal, see get_model_fields
+
+    app_label = models.CharField(max_length=100, unique=True)
+    record_count = models.IntegerField(default=0)
+    archaeology_count = models.IntegerField(default=0)
+    biology_count = models.IntegerField(default=0)
+    geology_count = models.IntegerField(default=0)
+    date_refreshed = models.DateTimeField('Refreshed', null=True, blank=True)
+
+    def __str__(self):
+        return self.app_label
+
+    @classmethod
+    def get_counted_models(cls, app_label):
+        """
+        The models counted for a project app
+        :return: dictionary of models by statistics field name, empty if the app is not installed
+        """
+        try:
+            app_config = apps.get_app_config(app_label)
+        except LookupError:
+            return {}
+        counted_models = {}
+        for field, model_names in cls.COUNTED_MODELS.get(app_label, cls.COUNTED_MODELS[None]).items():
+            model_name = next((name for name in model_names if name in app_config.models), None)
+            if model_name:
+                counted_models[field] = app_config.get_model(model_name)
+        return counted_models
+
+    @classmethod
+    def get_model_fields(cls, model, inherited=True):
+        """
+        The (app label, statistics field) pairs counting a model. With inherited, also the pairs counting its
+        multi-table parents, e.g. a new Biology is also a new Occurrence record.
+        """
+        key = (model, inherited)
+        if key not in cls._model_fields:
+            pairs = []
+            for app_config in apps.get_app_configs():
+                for field, counted_model in cls.get_counted_models(app_config.label).items():
+                    if counted_model is model or (inherited and issubclass(model, counted_model)):
+                        pairs.append((app_config.label, field))
+            cls._model_fields[key] = pairs
+        return cls._model_fields[key]
+
+    @classmethod
+    def record_change(cls, model, delta, inherited=True):
+        """
+        Add delta to the counts of a model, in a single update per app. The statistics of an app not counted yet
+        are computed from its tables instead.
+        """
+        fields_by_app = {}
+        for app_label, field in cls.get_model_fields(model, inherited):
+            fields_by_app.setdefault(app_label, []).append(field)
+        for app_label, fields in fields_by_app.items():
+            if not cls.objects.filter(app_label=app_label).update(**{field: F(field) + delta for field in fields}):
+                cls.refresh(app_label)
+
+    @classmethod
+    def refresh(cls, app_label):
+        """
+        Recount the records of a project app
+        """
+        counts = {field: model.objects.count() for field, model in cls.get_counted_models(app_label).items()}
+        counts.update({field: 0 for field in cls.COUNT_FIELDS if field not in counts})
+        statistics, created = cls.objects.update_or_create(app_label=app_label,
+                                                           defaults=dict(counts, date_refreshed=timezone.now()))
+        return statistics
+
+    @classmethod
+    def for_apps(cls, app_labels):
+        """
+        Statistics of several project apps, in a single read-only query. The statistics are written by the signals
+        and the refresh_project_statistics command only.
+        :return: dictionary of ProjectStatistics by app label, None for apps not counted yet or not installed
+        """
+        app_labels = set(label for label in app_labels if label)
+        statistics = cls.objects.in_bulk(app_labels, field_name='app_label')
+        for app_label in app_labels - set(statistics):
+            statistics[app_label] = None
+        return statistics
+
+    @classmethod
+    def attach(cls, project_pages):
+        """
+        Fetch the statistics of a list of project pages at once, see ProjectPage.get_statistics
+        """
+        project_pages = list(project_pages)
+        statistics = cls.for_apps([label for page in project_pages for label in (page.slug, page.app_label)])
+        for page in project_pages:
+            page._statistics = statistics
+        return project_pages
+
+    class Meta:
+        verbose_name = 'Project Statistics'
+        verbose_name_plural = 'Project Statistics'
+
+
+class DerivedFieldRefresh(models.Model):
+    """
+    Last refresh of a derived column, e.g. origins.site.fossil_count, see projects.derived.
+    Incremental refreshes recompute the rows with sources modified since date_refreshed.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    date_refreshed = models.DateTimeField('Refreshed')
+    row_count = models.IntegerField(default=0, help_text='Number of rows updated by the last refresh.')
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Derived Field Refresh'
+        verbose_name_plural = 'Derived Field Refreshes'
+
+
+# Data quality
+class QualityCheckResult(models.Model):
+    """
+    Last result of a data quality check of a project app, see projects.quality and the run_quality_checks
+    management command. Only the keys of the first failing records are kept, failure_count is the total.
+    """
+    app_label = models.CharField(max_length=100)
+    name = models.CharField(max_length=255)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    description = models.TextField(blank=True)
+    failure_count = models.IntegerField(default=0)
+    object_ids = models.TextField(default='[]', help_text='JSON list of the primary keys of failing records.')
+    duration = models.FloatField(default=0, help_text='Seconds taken by the checks of the model.')
+    date_run = models.DateTimeField('Run', default=timezone.now)
+
+    def __str__(self):
+        return '{}.{}'.format(self.app_label, self.name)
+
+    @classmethod
+    def store(cls, check, failure_count, object_ids, duration):
+        """
+        Save the result of a check, replacing its previous result
+        """
+        result, created = cls.objects.update_or_create(
+            app_label=check.app_label, name=check.name,
+            defaults=dict(content_type=ContentType.objects.get_for_model(check.model, for_concrete_model=False),
+                          description=check.description, failure_count=failure_count,
+                          object_ids=json.dumps(object_ids), duration=duration, date_run=timezone.now()))
+        return result
+
+    def get_object_ids(self):
+        return json.loads(self.object_ids)
+
+    def get_queryset(self):
+        model = self.content_type.model_class()
+        return model.objects.filter(pk__in=self.get_object_ids()).order_by('pk')
+
+    class Meta:
+        verbose_name = 'Quality Check Result'
+        verbose_name_plural = 'Quality Check Results'
+        unique_together = ('app_label', 'name')
+        ordering = ['app_label', 'name']
+
+
 # Wagtail models
 # class ProjectsIndexPage(Page):
 #     intro = RichTextField(blank=True)
@@ -536,10 +937,8 @@ class ProjectsIndexPage(Page):
         """
         Function to tally the total number of occurrence records across all projects
         """
-        total_record_count = 0
-        for project in self.projects:
-            total_record_count += project.record_count()
-        return total_record_count
+        projects = ProjectStatistics.attach(self.projects)  # one query for the counts of all projects
+        return sum(project.record_count() for project in projects)
 
     @property
     def total_site_count(self):
@@ -564,6 +963,8 @@ class ProjectsIndexPage(Page):
         except EmptyPage:
             projects = paginator.page(paginator.num_pages)
 
+        ProjectStatistics.attach(projects.object_list)  # counts shown in the project cards
+
         # Update template context
         context = super(ProjectsIndexPage, self).get_context(request)
         context['projects'] = projects
@@ -700,6 +1101,18 @@ class ProjectPage(Page):
             result = any(tests)
         return result
 
+    def get_statistics(self, app_label):
+        """
+        Return the precomputed occurrence counts of a project app.
+
+        Statistics are fetched for all the pages of a project index at once with ProjectStatistics.attach.
+
+        :return: ProjectStatistics, or None if the app is not installed or not counted yet
+        """
+        if app_label and app_label not in getattr(self, '_statistics', {}):
+            ProjectStatistics.attach([self])
+        return getattr(self, '_statistics', {}).get(app_label)
+
     def record_count(self) -> int:
         """
         Return the total number of occurrences in the page's associated app.
@@ -711,21 +1124,8 @@ class ProjectPage(Page):
 
         :return: int
         """
-        result = 0
-        if apps.is_installed(self.slug):  # check if slug matches an installed app name
-            if self.slug in ('cc', 'fc'):  # cc and fc use context as basic record
-                content_type = ContentType.objects.get(app_label=self.slug, model='context')
-            elif self.slug == 'eppe':  # eppe uses find as basic record
-                content_type = ContentType.objects.get(app_label=self.slug, model='find')
-            else:  # all others use occurrence
-                try:
-                    content_type = ContentType.objects.get(app_label=self.slug, model='occurrence')
-                except ContentType.DoesNotExist:
-                    content_type = None
-            if content_type:
-                model_class = content_type.model_class()
-                result = model_class.objects.all().count()
-        return result
+        statistics = self.get_statistics(self.slug)  # precomputed, see ProjectStatistics
+        return statistics.record_count if statistics else 0
 
     def archaeology_count(self) -> int:
         """
@@ -733,21 +1133,8 @@ class ProjectPage(Page):
 
         :return: int
         """
-        result = 0
-        if apps.is_installed(self.app_label):  # check if app_label matches an installed app name
-            if self.app_label in ('cc', 'fc'):  # cc and fc use lithic to record archaeology occurrences
-                content_type = ContentType.objects.get(app_label=self.app_label, model='lithic')
-            elif self.app_label == 'eppe':
-                content_type = None  # eppe has no archaeology
-            else:  # all others use archaeology
-                try:
-                    content_type = ContentType.objects.get(app_label=self.app_label, model='archaeology')
-                except ContentType.DoesNotExist:
-                    content_type = None
-            if content_type:
-                model_class = content_type.model_class()
-                result = model_class.objects.all().count()
-        return result
+        statistics = self.get_statistics(self.app_label)
+        return statistics.archaeology_count if statistics else 0
 
     def biology_count(self) -> int:
         """
@@ -755,25 +1142,8 @@ class ProjectPage(Page):
 
         :return: int
         """
-        # Initialize biology_count variable
-        biology_count = 0
-        if apps.is_installed(self.app_label):  # check if app_label matches an installed app name
-            # eppe has not biology(fossil) model. Return None
-            if self.app_label in ('cc', 'fc'):
-                content_type = None  # cc and fc have no fossil occurrences
-            # use the Fossil model for eppe
-            elif self.app_label == 'eppe':
-                content_type = ContentType.objects.get(app_label=self.app_label, model='fossil')
-            # all others use Biology model
-            else:
-                try:
-                    content_type = ContentType.objects.get(app_label=self.app_label, model='biology')
-                except ContentType.DoesNotExist:
-                    content_type = None
-            if content_type:
-                model_class = content_type.model_class()
-                biology_count = model_class.objects.all().count()
-        return biology_count
+        statistics = self.get_statistics(self.app_label)
+        return statistics.biology_count if statistics else 0
 
     def geology_count(self) -> int:
         """
@@ -781,25 +1151,8 @@ class ProjectPage(Page):
 
         :return: int
         """
-        # Initialize geology_count variable
-        geology_count = 0
-        # check if app_label matches an installed app name
-        if apps.is_installed(self.app_label):
-            # test if it has geology
-            if self.has_geology():
-                # get the app, check for the model and count records
-                app_config = self.get_related_app()
-                # get the name of the geology model, intersect possible names with list of app models.
-                geo_model = set(['geology', 'rock']).intersection(set(app_config.models))
-                content_type = ContentType.objects.get(app_label=self.app_label, model=geo_model)
-                model_class = content_type.model_class()
-                geology_count = model_class.objects.count()
-            else:
-                pass  # leave default count
-        else:
-            pass
-
-        return geology_count
+        statistics = self.get_statistics(self.app_label)
+        return statistics.geology_count if statistics else 0
 
     def summary_counts(self) -> dict:
         """
@@ -0,0 +1,275 @@
+"""
+Data quality checks of the project apps: duplicate keys, missing values, values not in the choice lists,
+occurrences missing their subtype row, and points outside the project area.
+
+Each check is a filter on the records failing it. The checks of a model are counted together, with conditional
+aggregation in a single query over the model table, and the keys of the failing records are then read for the
+failing checks only. Results are stored as QualityCheckResult rows and listed in the admin,
+see the run_quality_checks management command.
+
+Default checks are built for every project app (see default_checks). App specific checks are registered from a
+quality module of the app, e.g. mlp/quality.py:
+
+    from projects import quality
+    quality.register(quality.DuplicateValues(Occurrence, 'catalog_number'))
+"""
+import time
+from collections import OrderedDict
+
+from django.apps import apps
+from django.db.models import Count, Q, Subquery
+from django.utils.module_loading import autodiscover_modules
+
+
+class QualityCheck(object):
+    """
+    A check on the records of a model. Subclasses return the filter of the failing records from get_filter.
+    :param model: the checked model
+    :param condition: optional Q object limiting the checked records, e.g. Q(item_type='Faunal')
+    :param name: name of the check, unique in the app
+    :param description: description shown in the admin
+    """
+    kind = None
+
+    def __init__(self, model, condition=None, name=None, description=None):
+        self.model = model
+        self.condition = condition or Q()
+        self.name = name or self.get_default_name()
+        self.description = description or self.get_default_description()
+
+    def __repr__(self):
+        return '<{}: {}.{}>'.format(self.__class__.__name__, self.app_label, self.name)
+
+    @property
+    def app_label(self):
+        return self.model._meta.app_label
+
+    def get_default_name(self):
+        return '{}_{}'.format(self.model._meta.model_name, self.kind)
+
+    def get_default_description(self):
+        return ''
+
+    def get_base_queryset(self):
+        return self.model._default_manager.order_by().filter(self.condition)
+
+    def get_filter(self):
+        """
+        Q object matching the records failing the check
+        """
+        raise NotImplementedError
+
+    def get_queryset(self):
+        """
+        Records failing the check
+        """
+        return self.get_base_queryset().filter(self.get_filter())
+
+
+class FieldCheck(QualityCheck):
+    """
+    A check on the values of a field
+    :param empty_values: values counted as missing besides null and the empty text, e.g. [0] for barcodes
+    """
+    def __init__(self, model, field_name, empty_values=(), **kwargs):
+        self.field_name = field_name
+        self.empty_values = list(empty_values)
+        super(FieldCheck, self).__init__(model, **kwargs)
+
+    def get_default_name(self):
+        return '{}_{}_{}'.format(self.model._meta.model_name, self.kind, self.field_name)
+
+    def get_field(self):
+        return self.model._meta.get_field(self.field_name)
+
+    def missing_filter(self):
+        missing = Q(**{'{}__isnull'.format(self.field_name): True})
+        if self.get_field().get_internal_type() in ('CharField', 'TextField'):
+            missing |= Q(**{self.field_name: ''})
+        for value in self.empty_values:
+            missing |= Q(**{self.field_name: value})
+        return missing
+
+
+class DuplicateValues(FieldCheck):
+    """
+    Records sharing a value that should be unique, e.g. a barcode
+    """
+    kind = 'duplicate'
+
+    def get_default_description(self):
+        return '{} records sharing a {}'.format(self.model._meta.object_name, self.get_field().verbose_name)
+
+    def duplicates(self):
+        """
+        Queryset of the duplicated values, grouped with a single GROUP BY / HAVING query
+        """
+        return self.get_base_queryset().exclude(self.missing_filter()).values(self.field_name)\
+            .annotate(duplicate_count=Count('pk')).filter(duplicate_count__gt=1).values_list(self.field_name, flat=True)
+
+    def get_filter(self):
+        return Q(**{'{}__in'.format(self.field_name): Subquery(self.duplicates())})
+
+
+class MissingValues(FieldCheck):
+    """
+    Records without a value for a required field, e.g. coordinates
+    """
+    kind = 'missing'
+
+    def get_default_description(self):
+        return '{} records without {}'.format(self.model._meta.object_name, self.get_field().verbose_name)
+
+    def get_filter(self):
+        return self.missing_filter()
+
+
+class ValueNotInChoices(FieldCheck):
+    """
+    Records with a value that is not in the choice list of the field. Missing values are not reported.
+    :param choices: the valid values, by default the values of the field choices
+    """
+    kind = 'not_in_choices'
+
+    def __init__(self, model, field_name, choices=None, **kwargs):
+        super(ValueNotInChoices, self).__init__(model, field_name, **kwargs)
+        if choices is None:
+            choices = [value for value, label in self.get_field().flatchoices]
+        self.choices = list(choices)
+
+    def get_default_description(self):
+        return '{} records whose {} is not in the choice list'.format(self.model._meta.object_name,
+                                                                   self.get_field().verbose_name)
+
+    def get_filter(self):
+        return ~Q(**{'{}__in'.format(self.field_name): self.choices}) & ~self.missing_filter()
+
+    def unmatched_values(self):
+        """
+        The distinct values not in the choice list
+        """
+        return self.get_queryset().values_list(self.field_name, flat=True).distinct().order_by(self.field_name)
+
+
+class OrphanedSubtype(QualityCheck):
+    """
+    Records missing their multi-table subtype row, e.g. a faunal Occurrence that is not a Biology
+    """
+    kind = 'orphaned'
+
+    def __init__(self, model, subtype_model, **kwargs):
+        self.subtype_model = subtype_model
+        super(OrphanedSubtype, self).__init__(model, **kwargs)
+
+    def get_default_name(self):
+        return '{}_{}_{}'.format(self.model._meta.model_name, self.kind, self.subtype_model._meta.model_name)
+
+    def get_default_description(self):
+        return '{} records that are not {} records'.format(self.model._meta.object_name,
+                                                          self.subtype_model._meta.object_name)
+
+    def get_filter(self):
+        lookup = self.subtype_model._meta.get_ancestor_link(self.model).related_query_name()
+        return Q(**{'{}__isnull'.format(lookup): True})
+
+
+class PointOutsideBounds(FieldCheck):
+    """
+    Records with a point outside the expected bounding box of the project
+    :param bbox: (xmin, ymin, xmax, ymax) in the srid of the field
+    """
+    kind = 'outside_bounds'
+
+    def __init__(self, model, bbox, field_name='geom', **kwargs):
+        self.bbox = tuple(bbox)
+        super(PointOutsideBounds, self).__init__(model, field_name, **kwargs)
+
+    def get_default_description(self):
+        return '{} records with a {} outside {}'.format(self.model._meta.object_name,
+                                                        self.get_field().verbose_name, self.bbox)
+
+    def get_filter(self):
+        from django.contrib.gis.geos import Polygon
+        polygon = Polygon.from_bbox(self.bbox)
+        polygon.srid = self.get_field().srid
+        return Q(**{'{}__isnull'.format(self.field_name): False}) & \
+            ~Q(**{'{}__coveredby'.format(self.field_name): polygon})
+
+
+class CheckRegistry(object):
+    """
+    The registered checks, by app label and name. Default checks are added for every project app
+    """
+    def __init__(self):
+        self._checks = OrderedDict()
+        self._discovered = False
+
+    def register(self, *checks):
+        for check in checks:
+            self._checks[(check.app_label, check.name)] = check
+
+    def unregister(self, app_label, name):
+        self._checks.pop((app_label, name), None)
+
+    def autodiscover(self):
+        if not self._discovered:
+            self._discovered = True
+            for app_config in apps.get_app_configs():
+                self.register(*default_checks(app_config))
+            autodiscover_modules('quality')
+
+    def get_checks(self, app_label=None, names=None):
+        self.autodiscover()
+        return [check for (check_app_label, name), check in self._checks.items()
+                if (app_label is None or check_app_label == app_label) and (not names or name in names)]
+
+
+registry = CheckRegistry()
+register = registry.register
+
+
+def default_checks(app_config):
+    """
+    Checks of every project app: duplicate barcodes and missing coordinates of the occurrences,
+    and values not in the choice lists of the project models
+    """
+    from projects.models import PaleoCoreBaseClass, PaleoCoreOccurrenceBaseClass
+    checks = []
+    for model in app_config.get_models():
+        if not issubclass(model, PaleoCoreBaseClass):
+            continue
+        if issubclass(model, PaleoCoreOccurrenceBaseClass) and not model._meta.parents:
+            checks.append(DuplicateValues(model, 'barcode'))
+            checks.append(MissingValues(model, 'geom'))
+        for field in model._meta.local_concrete_fields:
+            if field.choices and not field.is_relation:
+                checks.append(ValueNotInChoices(model, field.name))
+    return checks
+
+
+def run_checks(checks, sample_size=100):
+    """
+    Run checks, counting the failing records of each model in a single query
+    :param checks: list of QualityCheck
+    :param sample_size: number of failing record keys stored per check
+    :return: list of saved QualityCheckResult
+    """
+    from projects.models import QualityCheckResult
+    checks_by_model = OrderedDict()
+    for check in checks:
+        checks_by_model.setdefault(check.model, []).append(check)
+    results = []
+    for model, model_checks in checks_by_model.items():
+        start = time.time()
+        counts = model._default_manager.order_by().aggregate(**{
+            'check_{}'.format(index): Count('pk', filter=check.condition & check.get_filter())
+            for index, check in enumerate(model_checks)
+        })
+        duration = time.time() - start  # of the counting query, shared by the checks of the model
+        for index, check in enumerate(model_checks):
+            failure_count = counts['check_{}'.format(index)]
+            object_ids = []
+            if failure_count:
+                object_ids = list(check.get_queryset().order_by('pk').values_list('pk', flat=True)[:sample_size])
+            results.append(QualityCheckResult.store(check, failure_count, object_ids, duration))
+    return results
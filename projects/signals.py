@@ -0,0 +1,91 @@
+from djgeojson.cache import get_tile_cache, invalidate_geometry
+from projects.derived import registry as derived_fields
+from projects.models import PaleoCoreGeomBaseClass, Taxon, TaxonRank, IdentificationQualifier, ProjectStatistics
+from projects.taxonomy import taxonomy_changed
+
+
+def is_geom_model(sender):
+    return isinstance(sender, type) and issubclass(sender, PaleoCoreGeomBaseClass)
+
+
+def remember_previous_geom(sender, instance, raw=False, **kwargs):
+    """
+    Keep the stored geometry of an edited record, its old tiles are evicted along with the new ones.
+    """
+    if raw or not is_geom_model(sender) or instance.pk is None or get_tile_cache() is None:
+        return
+    instance._previous_geom = sender.objects.filter(pk=instance.pk).values_list('geom', flat=True).first()
+
+
+def invalidate_tiles_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Evict the cached map tiles containing the saved record, see djgeojson.cache
+    """
+    if raw or not is_geom_model(sender):
+        return
+    geometries = [instance.geom, getattr(instance, '_previous_geom', None)]
+    invalidate_geometry(sender, *[geom for geom in geometries if geom is not None])
+
+
+def invalidate_tiles_on_delete(sender, instance, **kwargs):
+    if not is_geom_model(sender) or instance.geom is None:
+        return
+    invalidate_geometry(sender, instance.geom)
+
+
+def is_taxonomy_model(sender):
+    return isinstance(sender, type) and issubclass(sender, (Taxon, TaxonRank, IdentificationQualifier))
+
+
+def update_taxon_index_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Keep the shared taxon indexes in line with the taxonomy tables, see projects.taxonomy
+    """
+    if not is_taxonomy_model(sender):
+        return
+    taxonomy_changed(sender, instance if issubclass(sender, Taxon) and not raw else None)
+
+
+def update_taxon_index_on_delete(sender, instance, **kwargs):
+    if not is_taxonomy_model(sender):
+        return
+    taxonomy_changed(sender)
+
+
+def update_statistics_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Count a new record in the project statistics, see ProjectStatistics
+    """
+    if created and not raw:
+        ProjectStatistics.record_change(sender, 1)
+
+
+def update_statistics_on_delete(sender, instance, **kwargs):
+    # Deleting a multi-table child also sends post_delete for its parent rows, count each model on its own
+    ProjectStatistics.record_change(sender, -1, inherited=False)
+
+
+def remember_previous_links(sender, instance, raw=False, **kwargs):
+    """
+    Keep the stored links of an edited source row of derived fields, the rows it moves away from are recomputed.
+    """
+    links = [derived_field.get_link_attname() for derived_field in derived_fields.for_source_model(sender)]
+    if raw or instance.pk is None or not links:
+        return
+    instance._previous_links = sender._default_manager.filter(pk=instance.pk).values(*links).first() or {}
+
+
+def refresh_derived_fields_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Recompute the derived columns of the rows a source row moved away from, see projects.derived
+    """
+    previous_links = getattr(instance, '_previous_links', {})
+    for derived_field in derived_fields.for_source_model(sender):
+        link = derived_field.get_link_attname()
+        if link in previous_links and previous_links[link] != getattr(instance, link):
+            derived_field.refresh_linked([previous_links[link]])
+
+
+def refresh_derived_fields_on_delete(sender, instance, **kwargs):
+    for derived_field in derived_fields.for_source_model(sender):
+        derived_field.refresh_linked([getattr(instance, derived_field.get_link_attname())])
@@ -0,0 +1,134 @@
+"""
+Occurrence summaries of the project apps: counts by subtype and basis of record, and barcode checks.
+
+Counts are computed with conditional aggregation in a single query over the occurrence table, joined to its
+multi-table subtypes (Archaeology, Biology, Geology ...). Barcode checks are the duplicate and missing value checks
+of projects.quality.
+"""
+from collections import OrderedDict
+
+from django.apps import apps
+from django.db.models import Count, Q
+
+from projects import quality
+
+
+class OccurrenceSummary(object):
+    """
+    Summary of the occurrences of a project app.
+
+    summary = OccurrenceSummary(Occurrence)
+    summary.counts()['Biology']['FossilSpecimen']
+    summary.duplicate_barcodes()
+    """
+    #: basis of record columns of the count table, with their labels
+    bases_of_record = (('FossilSpecimen', 'Collected'), ('HumanObservation', 'Observed'))
+    no_subtype_label = 'No Fossils'
+    totals_label = 'Totals'
+
+    def __init__(self, occurrence_model, subtype_models=None, barcode_field='barcode'):
+        self.occurrence_model = occurrence_model
+        if subtype_models is None:
+            # multi-table children of the occurrence model, e.g. Archaeology, Biology, Geology
+            subtype_models = sorted([model for model in apps.get_models()
+                                     if occurrence_model in model._meta.parents],
+                                    key=lambda model: model.__name__)
+        self.subtype_models = subtype_models
+        self.barcode_field = barcode_field
+
+    def get_queryset(self):
+        return self.occurrence_model.objects.order_by()
+
+    def subtype_lookup(self, model):
+        """
+        Query name of the subtype from the occurrence model, e.g. 'biology'
+        """
+        return model._meta.get_ancestor_link(self.occurrence_model).related_query_name()
+
+    def no_subtype_filter(self):
+        return Q(**{'{}__isnull'.format(self.subtype_lookup(model)): True for model in self.subtype_models})
+
+    def counts(self):
+        """
+        Occurrence counts by subtype and basis of record, in a single query
+        :return: ordered dictionary of rows by label, each row a dictionary of counts by basis of record and 'total'
+        e.g. {'Archaeology': {'FossilSpecimen': 10, 'HumanObservation': 2, 'total': 12}, ... 'Totals': {...}}
+        """
+        rows = [(model._meta.object_name, Q(**{'{}__isnull'.format(self.subtype_lookup(model)): False}))
+                for model in self.subtype_models]
+        rows = [(self.no_subtype_label, self.no_subtype_filter())] + rows + [(self.totals_label, Q())]
+        aggregates = {}
+        for index, (label, row_filter) in enumerate(rows):
+            aggregates['{}_total'.format(index)] = Count('pk', filter=row_filter)
+            for column, (basis, column_label) in enumerate(self.bases_of_record):
+                aggregates['{}_{}'.format(index, column)] = Count('pk', filter=row_filter & Q(basis_of_record=basis))
+        values = self.get_queryset().aggregate(**aggregates)
+        counts = OrderedDict()
+        for index, (label, row_filter) in enumerate(rows):
+            counts[label] = OrderedDict((basis, values['{}_{}'.format(index, column)])
+                                        for column, (basis, column_label) in enumerate(self.bases_of_record))
+            counts[label]['total'] = values['{}_total'.format(index)]
+        return counts
+
+    def no_subtype_occurrences(self):
+        """
+        Occurrences that are not subclassed, e.g. an Occurrence that is not a Biology
+        """
+        return self.get_queryset().filter(self.no_subtype_filter())
+
+    def get_barcode_empty_values(self):
+        # a barcode of 0 is a missing barcode
+        field = self.occurrence_model._meta.get_field(self.barcode_field)
+        return [] if field.get_internal_type() in ('CharField', 'TextField') else [0]
+
+    def duplicate_barcode_check(self):
+        return quality.DuplicateValues(self.occurrence_model, self.barcode_field,
+                                       empty_values=self.get_barcode_empty_values())
+
+    def missing_barcode_check(self):
+        return quality.MissingValues(self.occurrence_model, self.barcode_field,
+                                     condition=Q(basis_of_record='FossilSpecimen'),
+                                     empty_values=self.get_barcode_empty_values())
+
+    def duplicate_barcodes(self):
+        """
+        Barcodes shared by several occurrences, in a single GROUP BY / HAVING query
+        :return: list of barcodes, e.g. [1999, 2001]
+        """
+        return list(self.duplicate_barcode_check().duplicates().order_by(self.barcode_field))
+
+    def duplicate_barcode_objects(self, barcodes=None):
+        """
+        Occurrences sharing a barcode, grouped by barcode
+        :return: list of dictionaries, e.g. [{'barcode': 1999, 'queryset': [<Occurrence: MLP-1946>, ...]}]
+        """
+        if barcodes is None:
+            barcodes = self.duplicate_barcodes()
+        groups = OrderedDict((barcode, []) for barcode in barcodes)
+        duplicates = self.get_queryset().filter(**{'{}__in'.format(self.barcode_field): barcodes})
+        for occurrence in duplicates.order_by(self.barcode_field, 'pk'):
+            groups[getattr(occurrence, self.barcode_field)].append(occurrence)
+        return [{'barcode': barcode, 'queryset': objects} for barcode, objects in groups.items()]
+
+    def missing_barcode_objects(self):
+        """
+        Collected occurrences that should have barcodes but do not
+        """
+        return self.missing_barcode_check().get_queryset()
+
+    def warnings(self):
+        """
+        Barcode problems of the project
+        :return: dictionary with a warning_flag, and the duplicate and missing barcodes when there are any
+        """
+        result = {'warning_flag': False}
+        duplicate_barcodes = self.duplicate_barcodes()
+        if duplicate_barcodes:
+            result['warning_flag'] = True
+            result['duplicate_barcodes'] = duplicate_barcodes
+            result['duplicate_barcode_objects'] = self.duplicate_barcode_objects(duplicate_barcodes)
+        missing_barcodes = list(self.missing_barcode_objects())
+        if missing_barcodes:
+            result['warning_flag'] = True
+            result['missing_barcodes'] = missing_barcodes
+        return result
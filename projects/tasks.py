@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from projects.models import ExportJob
+
+
+@shared_task
+def run_export_job(job_id):
+    """
+    Run a data export in the background, see ExportJob and projects.admin.ExportJobAdminMixin
+    """
+    ExportJob.objects.get(pk=job_id).run()
+    return job_id
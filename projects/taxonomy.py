@@ -0,0 +1,249 @@
+"""
+In memory index of a project taxonomy, used to match scientific names during imports.
+
+The Taxon, TaxonRank and IdentificationQualifier tables of a project app are read once, names, ranks, qualifiers
+and genus + species pairs are then resolved from dictionaries, without a query per imported row.
+Indexes returned by TaxonIndex.for_model are kept per process, and are updated when a taxon is saved in the same
+process. Changes made elsewhere are picked up through the version number of the app taxonomy stored in the database
+(projects.models.TaxonIndexVersion), read at most every version_check_interval seconds. An index loaded or changed
+inside a transaction is dropped when that transaction does not commit.
+"""
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import connection, transaction
+
+
+class TaxonIndex(object):
+    """
+    Taxa of a project indexed by name, by rank and by parent.
+
+    taxon_index = TaxonIndex.for_model(Taxon)
+    taxon_index.get('Mammalia')
+    taxon_index.get_species('Homo', 'sapiens')
+    """
+    _indexes = {}  # shared indexes, by taxon model
+    version_check_interval = 5  # seconds
+
+    def __init__(self, taxon_model, rank_model=None, qualifier_model=None):
+        self.taxon_model = taxon_model
+        self.rank_model = rank_model or taxon_model._meta.get_field('rank').related_model
+        if qualifier_model is None:
+            try:
+                qualifier_model = apps.get_model(taxon_model._meta.app_label, 'IdentificationQualifier')
+            except LookupError:
+                pass  # the app has no identification qualifiers
+        self.qualifier_model = qualifier_model
+        self.version = get_version(taxon_model._meta.app_label)
+        self.checked = time.monotonic()
+        self.pending = False
+        self.mark_pending()
+        self.load()
+
+    @classmethod
+    def for_model(cls, taxon_model):
+        """
+        Shared index of a taxon model, loaded on first use and reloaded when the taxonomy changed
+        """
+        index = cls._indexes.get(taxon_model)
+        if index is not None and not index.is_current():
+            index = None
+        if index is None:
+            index = cls._indexes[taxon_model] = cls(taxon_model)
+        return index
+
+    def is_current(self):
+        if self.pending and not connection.in_atomic_block:
+            return False  # loaded or changed in a transaction that was rolled back
+        if time.monotonic() - self.checked > self.version_check_interval:
+            if self.version != get_version(self.taxon_model._meta.app_label):
+                return False
+            self.checked = time.monotonic()
+        return True
+
+    def mark_pending(self):
+        """
+        Flag an index loaded or changed inside a transaction until the transaction commits
+        """
+        if connection.in_atomic_block:
+            self.pending = True
+            transaction.on_commit(self.confirm)
+
+    def confirm(self):
+        self.pending = False
+
+    @classmethod
+    def clear(cls, app_label=None):
+        """
+        Drop the shared indexes of an app, or of all apps
+        """
+        for taxon_model in list(cls._indexes):
+            if app_label is None or taxon_model._meta.app_label == app_label:
+                del cls._indexes[taxon_model]
+
+    def load(self):
+        self.ranks = {rank.pk: rank for rank in self.rank_model.objects.all()}
+        self.qualifiers = {}
+        if self.qualifier_model is not None:
+            self.qualifiers = {qualifier.name: qualifier for qualifier in self.qualifier_model.objects.all()}
+        self.taxa = {}
+        self.by_name = defaultdict(list)
+        self.by_parent = defaultdict(list)
+        for taxon in self.taxon_model.objects.all():
+            self.add(taxon)
+        # set the parent and rank of the indexed taxa, label and lineage methods can then be used without queries
+        parent_field = self.taxon_model._meta.get_field('parent')
+        rank_field = self.taxon_model._meta.get_field('rank')
+        for taxon in self.taxa.values():
+            parent_field.set_cached_value(taxon, self.taxa.get(taxon.parent_id))
+            rank_field.set_cached_value(taxon, self.ranks.get(taxon.rank_id))
+
+    def add(self, taxon):
+        """
+        Add a saved taxon to the index, or re-index an edited one
+        """
+        self.discard(taxon.pk)
+        self.taxa[taxon.pk] = taxon
+        self.by_name[taxon.name].append(taxon)
+        self.by_parent[(taxon.parent_id, taxon.name)].append(taxon)
+
+    def discard(self, pk):
+        taxon = self.taxa.pop(pk, None)
+        if taxon is not None:
+            self.by_name[taxon.name].remove(taxon)
+            self.by_parent[(taxon.parent_id, taxon.name)].remove(taxon)
+
+    def rank_name(self, taxon):
+        rank = self.ranks.get(taxon.rank_id)
+        return rank.name if rank else None
+
+    def filter(self, name, rank_name=None, parent=None):
+        """
+        List of taxa matching a name, and optionally a rank name and a parent taxon
+        """
+        if parent is not None:
+            taxa = self.by_parent.get((parent.pk, name), [])
+        else:
+            taxa = self.by_name.get(name, [])
+        if rank_name is not None:
+            taxa = [taxon for taxon in taxa if self.rank_name(taxon) == rank_name]
+        return list(taxa)
+
+    def get(self, name, rank_name=None, parent=None):
+        """
+        Single taxon matching a name, raises DoesNotExist or MultipleObjectsReturned like Taxon.objects.get
+        """
+        taxa = self.filter(name, rank_name=rank_name, parent=parent)
+        if not taxa:
+            raise self.taxon_model.DoesNotExist("No taxon found to match {}".format(name))
+        if len(taxa) > 1:
+            raise self.taxon_model.MultipleObjectsReturned("{} taxa match {}".format(len(taxa), name))
+        return taxa[0]
+
+    def match(self, name):
+        """
+        find taxon objects from a scientific name
+        Return: (True/False, match_count, match_list)
+        """
+        match_list = self.filter(name)
+        return len(match_list) == 1, len(match_list), match_list
+
+    def get_species(self, genus_name, species_name):
+        """
+        Species taxon from a genus name and a specific epithet, None if there is no single match
+        """
+        species = [taxon for genus in self.by_name.get(genus_name, [])
+                   for taxon in self.by_parent.get((genus.pk, species_name), [])]
+        if len(species) == 1:
+            return species[0]
+        return None
+
+    def is_qualifier(self, name):
+        return name in self.qualifiers
+
+    def get_qualifier(self, name):
+        """
+        Identification qualifier by name, raises DoesNotExist like IdentificationQualifier.objects.get
+        """
+        try:
+            return self.qualifiers[name]
+        except KeyError:
+            raise self.qualifier_model.DoesNotExist("No identification qualifier named {}".format(name))
+
+    def from_name_list(self, taxon_name_list, default='Life'):
+        """
+        Taxon matching the last name of a taxonomic name list, e.g. ['Rodentia', 'Muridae', 'Golunda', 'gurai'].
+        When several taxa have that name, the first name up the list that is not an identification qualifier
+        is used to pick the taxon with the right parent.
+        :return: the matching taxon, the default taxon when the list is empty, None when no taxon matches
+        """
+        if not taxon_name_list:
+            return self.get(default)
+        taxon_string = taxon_name_list[-1]
+        taxa = self.filter(taxon_string)
+        if len(taxa) > 1:
+            index = -2
+            parent_name = taxon_name_list[index]
+            while self.is_qualifier(parent_name):  # skip id qualifiers, e.g. Homo cf. sapiens
+                index -= 1
+                parent_name = taxon_name_list[index]
+            taxa = self.filter(taxon_string, parent=self.get(parent_name))
+        return taxa[0] if taxa else None
+
+
+def get_version(app_label):
+    from projects.models import TaxonIndexVersion
+    return TaxonIndexVersion.get_version(app_label)
+
+
+def taxonomy_changed(sender, instance=None):
+    """
+    Update the shared index of the app after a taxon, rank or identification qualifier was saved or deleted.
+    A saved taxon is re-indexed in place when the index is up to date, other changes reload the index on next use.
+    The version is bumped in the current transaction, and rolled back with it.
+    """
+    from projects.models import TaxonIndexVersion
+    app_label = sender._meta.app_label
+    version = TaxonIndexVersion.bump(app_label)
+    index = TaxonIndex._indexes.get(sender)
+    if instance is not None and index is not None and index.version == version - 1:
+        index.add(instance)
+        index.version = version
+        index.mark_pending()
+    else:
+        TaxonIndex.clear(app_label)
+
+
+def rebuild_paths(taxon_model, batch_size=1000):
+    """
+    Recompute the lineage paths of all the taxa of a model from their parents, see projects.models.Taxon.path
+    Also used by the data migrations adding the path column, with historical models.
+    :return: the number of taxa whose path changed
+    """
+    manager = taxon_model._default_manager
+    rows = list(manager.values_list('pk', 'parent_id', 'path'))
+    parents = {pk: parent_id for pk, parent_id, path in rows}
+    paths = {}
+
+    def build_path(pk):
+        lineage = []
+        while pk is not None and pk not in paths:
+            if pk in lineage:
+                raise ValueError("{} {} is its own ancestor".format(taxon_model._meta.label, pk))
+            lineage.append(pk)
+            pk = parents.get(pk)
+        path = paths[pk] if pk is not None else '/'
+        for ancestor in reversed(lineage):
+            path = paths[ancestor] = '{}{}/'.format(path, ancestor)
+        return path
+
+    changed = []
+    for pk, parent_id, path in rows:
+        new_path = build_path(pk)
+        if new_path != path:
+            changed.append(taxon_model(pk=pk, path=new_path))
+    manager.bulk_update(changed, ['path'], batch_size=batch_size)
+    if changed:
+        TaxonIndex.clear(taxon_model._meta.app_label)  # the indexed taxa have their old paths
+    return len(changed)
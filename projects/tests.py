@@ -1,7 +1,27 @@
 # Subclassing the django TestCase with Test Case for Abstract Models
 # from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
 from projects.test_abstract_classes import ModelMixinTestCase
-from projects.models import PaleoCoreBaseClass, PaleoCoreGeomBaseClass
+from projects.models import PaleoCoreBaseClass, PaleoCoreGeomBaseClass, ExportJob, ProjectStatistics, \
+    QualityCheckResult
+from projects.coordinates import coordinate_columns, EMPTY_COORDINATES
+from projects.imports import LegacySQLiteImporter
+from projects.authorities import TaxonAuthorityClient, TaxonCache
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlsplit
+import os
+import threading
+import time
+from datetime import datetime
+import csv
+import json
+import shutil
+import tempfile
 from sys import path
 import environ
 from django.contrib.gis.geos import Point, Polygon
@@ -71,6 +91,20 @@ class PaleoCoreGeomBaseClassMethodsTests(ModelMixinTestCase):
         self.assertAlmostEqual(self.utmpoint.utm_coordinates('east'), 500000, 3)
         self.assertAlmostEqual(self.utmpoint.utm_coordinates('north'), 100000, 3)
 
+    def test_coordinate_columns(self):
+        # batch coordinates match the coordinate methods
+        columns = coordinate_columns([self.gcspoint, self.utmpoint, self.gcspointnone])
+        for point in [self.gcspoint, self.utmpoint]:
+            self.assertAlmostEqual(columns[point.pk].longitude, point.longitude(), 6)
+            self.assertAlmostEqual(columns[point.pk].latitude, point.latitude(), 6)
+            self.assertAlmostEqual(columns[point.pk].easting, point.easting(), 3)
+            self.assertAlmostEqual(columns[point.pk].northing, point.northing(), 3)
+        self.assertEqual(columns[self.gcspointnone.pk], EMPTY_COORDINATES)
+        # querysets read the points from the database, in wgs84 gcs
+        columns = coordinate_columns(self.model.objects.filter(pk=self.gcspoint.pk))
+        self.assertAlmostEqual(columns[self.gcspoint.pk].easting, 690874.796037099, 2)
+        self.assertAlmostEqual(columns[self.gcspoint.pk].northing, 1271846.8732660324, 2)
+
     def test_pcbase_get_app_label_method(self):
         self.assertEqual(self.gcspoint.get_app_label(), 'projects')
 
@@ -98,3 +132,419 @@ class TaxonTests(ModelMixinTestCase):
         'projects/fixtures/identification_qualifier_test_data.json'
     ]
     pass
+
+
+class ExportJobTests(TestCase):
+    """
+    Test the background csv export of the admin actions
+    """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.content_type = ContentType.objects.get_for_model(ContentType)
+
+    def create_job(self, mapping):
+        ids = list(ContentType.objects.filter(app_label='projects').values_list('pk', flat=True))
+        return ExportJob.objects.create(content_type=self.content_type,
+                                        object_ids=json.dumps(ids),
+                                        exporter='projects.exports.mapped_rows',
+                                        options=json.dumps({'mapping': mapping}),
+                                        filename='export.csv',
+                                        row_count=len(ids))
+
+    def test_run_writes_csv(self):
+        job = self.create_job({'app': 'app_label', 'model': 'model'})
+        with override_settings(MEDIA_ROOT=self.media_root):
+            job.run()
+            job.refresh_from_db()
+            self.assertEqual(job.status, ExportJob.FINISHED)
+            self.assertEqual(job.progress, job.row_count)
+            self.assertIsNotNone(job.date_finished)
+            with job.file.open('r') as csv_file:
+                rows = list(csv.reader(csv_file))
+        self.assertEqual(rows[0], ['app', 'model'])
+        self.assertEqual(len(rows), job.row_count + 1)
+        self.assertIn(['projects', 'exportjob'], rows[1:])
+
+    def test_failed_run_records_error(self):
+        job = self.create_job({'app': 'app_label'})
+        job.exporter = 'projects.exports.model_rows'  # ContentType has no get_concrete_field_names
+        job.save()
+        with override_settings(MEDIA_ROOT=self.media_root):
+            self.assertRaises(AttributeError, job.run)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.FAILED)
+        self.assertTrue(job.error)
+
+    def test_bad_exporter_records_error(self):
+        job = self.create_job({'app': 'app_label'})
+        job.exporter = 'projects.exports.no_such_exporter'
+        job.save()
+        self.assertRaises(ImportError, job.run)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.FAILED)
+        self.assertIn('no_such_exporter', job.error)
+
+
+class ProjectStatisticsTests(TestCase):
+    """
+    Test the precomputed project counts
+    """
+    def create_occurrence(self, model, pk):
+        return model.objects.create(id=pk, item_type="Artifactual", basis_of_record="HumanObservation",
+                                    collecting_method="Surface Standard", field_number=datetime.now(),
+                                    geom="POINT (40.8352906016 11.5303732536)")
+
+    def test_counted_models(self):
+        from mlp.models import Occurrence, Archaeology, Biology, Geology
+        self.assertEqual(ProjectStatistics.get_counted_models('mlp'), {'record_count': Occurrence,
+                                                                       'archaeology_count': Archaeology,
+                                                                       'biology_count': Biology,
+                                                                       'geology_count': Geology})
+        self.assertEqual(ProjectStatistics.get_counted_models('not_an_app'), {})
+
+    def test_counts_follow_saves_and_deletes(self):
+        from mlp.models import Occurrence, Archaeology
+        self.assertEqual(ProjectStatistics.refresh('mlp').record_count, 0)
+        self.create_occurrence(Occurrence, 1)
+        archaeology = self.create_occurrence(Archaeology, 2)
+        statistics = ProjectStatistics.objects.get(app_label='mlp')
+        self.assertEqual((statistics.record_count, statistics.archaeology_count), (2, 1))
+        archaeology.delete()
+        statistics.refresh_from_db()
+        self.assertEqual((statistics.record_count, statistics.archaeology_count), (1, 0))
+        self.assertEqual(ProjectStatistics.refresh('mlp').record_count, 1)
+
+    def test_for_apps(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(ProjectStatistics.for_apps(['mlp'])['mlp'])  # read-only, not refreshed
+        self.assertFalse(ProjectStatistics.objects.exists())
+        ProjectStatistics.refresh('mlp')
+        with self.assertNumQueries(1):
+            statistics = ProjectStatistics.for_apps(['mlp'])
+        self.assertEqual(statistics['mlp'].record_count, 0)
+        self.assertIsNone(ProjectStatistics.for_apps(['not_an_app'])['not_an_app'])
+
+    def test_first_change_counts_app(self):
+        from mlp.models import Occurrence
+        self.create_occurrence(Occurrence, 1)
+        self.assertEqual(ProjectStatistics.objects.get(app_label='mlp').record_count, 1)
+
+
+class QualityCheckTests(TestCase):
+    """
+    Test the data quality checks
+    """
+    def create_occurrence(self, model, pk, barcode, item_type="Faunal", geom="POINT (40.8352906016 11.5303732536)"):
+        return model.objects.create(id=pk, barcode=barcode, item_type=item_type, basis_of_record="FossilSpecimen",
+                                    collecting_method="Surface Standard", geom=geom)
+
+    def setUp(self):
+        from mlp.models import Occurrence, Biology
+        self.create_occurrence(Occurrence, 1, 1001)
+        self.create_occurrence(Occurrence, 2, 1001, item_type="Not a type", geom=None)
+        self.create_occurrence(Biology, 3, 1002)
+
+    def test_checks(self):
+        from mlp.models import Occurrence, Biology
+        from projects import quality
+        self.assertEqual(list(quality.DuplicateValues(Occurrence, 'barcode').get_queryset().values_list('pk', flat=True)
+                              .order_by('pk')), [1, 2])
+        self.assertEqual(list(quality.MissingValues(Occurrence, 'geom').get_queryset().values_list('pk', flat=True)), [2])
+        self.assertEqual(list(quality.ValueNotInChoices(Occurrence, 'item_type').unmatched_values()), ['Not a type'])
+        self.assertEqual(list(quality.OrphanedSubtype(Occurrence, Biology, condition=Q(item_type='Faunal'))
+                              .get_queryset().values_list('pk', flat=True)), [1])
+
+    def test_run_checks(self):
+        from mlp.models import Occurrence, Biology
+        from projects import quality
+        checks = [quality.DuplicateValues(Occurrence, 'barcode'), quality.MissingValues(Occurrence, 'geom'),
+                  quality.OrphanedSubtype(Occurrence, Biology, condition=Q(item_type='Faunal')),
+                  quality.MissingValues(Occurrence, 'barcode')]
+        with CaptureQueriesContext(connection) as queries:
+            results = quality.run_checks(checks)
+        # the checks of a model are counted in a single query
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('SELECT COUNT(')]), 1)
+        self.assertEqual([result.failure_count for result in results], [2, 1, 1, 0])
+        self.assertEqual(results[0].get_object_ids(), [1, 2])
+        self.assertEqual(list(results[1].get_queryset()), [Occurrence.objects.get(pk=2)])
+        quality.run_checks(checks[:1])
+        self.assertEqual(QualityCheckResult.objects.count(), 4)
+
+    def test_registered_checks(self):
+        from projects import quality
+        names = [check.name for check in quality.registry.get_checks('mlp')]
+        self.assertIn('occurrence_duplicate_barcode', names)
+        self.assertIn('occurrence_orphaned_biology', names)
+        self.assertEqual(len(names), len(set(names)))
+
+
+class LegacyImporter(LegacySQLiteImporter):
+    """
+    Importer of the legacy database of LegacySQLiteImporterTests, defined here so that its rows can be cleaned in
+    worker processes
+    """
+    chunk_size = 8
+
+    def __init__(self, *args, **kwargs):
+        from mlp.models import Occurrence
+        self.occurrence_model = Occurrence
+        super(LegacyImporter, self).__init__(*args, **kwargs)
+
+    def get_query(self):
+        return 'SELECT id, ItemType, Barcode FROM Occurrence', []
+
+    @classmethod
+    def clean(cls, row):
+        return {'id': row[0], 'barcode': row[2], 'item_type': row[1]}
+
+    def build(self, cleaned_row):
+        from mlp.models import Archaeology, Biology
+        if not self.is_unique('barcode', cleaned_row['barcode']):
+            return None
+        model = Archaeology if cleaned_row['item_type'] == 'Artifactual' else Biology
+        return model(basis_of_record="FossilSpecimen", collecting_method="Surface Standard",
+                     geom="POINT (40.8352906016 11.5303732536)", **cleaned_row)
+
+
+class LegacySQLiteImporterTests(TestCase):
+    """
+    Test the chunked import of legacy sqlite databases
+    """
+    def setUp(self):
+        import sqlite3
+        from mlp.models import Occurrence
+        self.directory = tempfile.mkdtemp()
+        self.path = self.directory + '/legacy.sqlite'
+        source = sqlite3.connect(self.path)
+        source.execute('CREATE TABLE Occurrence (id INTEGER, ItemType TEXT, Barcode INTEGER)')
+        source.executemany('INSERT INTO Occurrence VALUES (?, ?, ?)',
+                           [(pk, 'Artifactual' if pk % 2 else 'Faunal', pk % 7) for pk in range(1, 51)])
+        source.commit()
+        source.close()
+        Occurrence.objects.create(id=100, barcode=3, item_type="Faunal", basis_of_record="FossilSpecimen",
+                                  collecting_method="Surface Standard", geom="POINT (40.8352906016 11.5303732536)")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_importer(self, **kwargs):
+        return LegacyImporter(self.path, **kwargs)
+
+    def test_dry_run(self):
+        from mlp.models import Occurrence
+        statistics = self.get_importer(dry_run=True).run()
+        self.assertEqual((statistics.row_count, statistics.chunk_count), (50, 7))
+        self.assertEqual(statistics.imported_count, 6)
+        self.assertEqual(Occurrence.objects.count(), 1)
+
+    def test_run(self):
+        from mlp.models import Occurrence, Archaeology, Biology
+        statistics = self.get_importer().run()
+        # barcodes 0 to 6, less the barcode 3 already in the database
+        self.assertEqual((statistics.imported_count, statistics.rejected_count), (6, 44))
+        self.assertEqual(Occurrence.objects.count(), 7)
+        self.assertEqual(sorted(Biology.objects.values_list('id', flat=True)), [2, 4, 6])
+        self.assertEqual(sorted(Archaeology.objects.values_list('id', flat=True)), [1, 5, 7])
+        self.assertEqual(self.get_importer(limit=5).count(self.get_importer().connect()), 5)
+
+    def test_parallel_map(self):
+        from projects.imports import parallel_map
+        chunks = [[1, 2, 3], [4], [5, 6]]
+        self.assertEqual(list(parallel_map(abs, iter(chunks), workers=1)), [(rows, rows) for rows in chunks])
+        self.assertEqual(list(parallel_map(str, iter(chunks), workers=2)),
+                         [(rows, [str(row) for row in rows]) for rows in chunks])
+
+    def test_run_in_workers(self):
+        from mlp.models import Biology
+        statistics = self.get_importer(workers=2).run()
+        self.assertEqual(statistics.imported_count, 6)
+        self.assertEqual(sorted(Biology.objects.values_list('id', flat=True)), [2, 4, 6])
+
+
+class WorkbookTests(TestCase):
+    """
+    Test the conversion of the rows of Excel sheets
+    """
+    class Sheet(object):
+        def __init__(self, rows, types):
+            self.rows, self.types, self.nrows = rows, types, len(rows)
+
+        def row_values(self, index):
+            return self.rows[index]
+
+        def row_types(self, index):
+            return self.types[index]
+
+    def test_get_columns(self):
+        from projects.workbooks import get_columns
+        lookup_dict = {'Tray': 'verbatim_tray', 'tray': 'verbatim_tray', 'Code': 'code', 'Other': 'verbatim_other'}
+        self.assertEqual(get_columns(['Code', 'Tray', 'Other', 'tray'], lookup_dict, fields={'code', 'verbatim_tray'}),
+                         [('code', 0), ('verbatim_tray', 3)])
+        with self.assertRaises(ValueError):
+            get_columns(['Code', 'Unknown'], lookup_dict)
+
+    def test_read_sheet(self):
+        import xlrd
+        from projects.workbooks import read_sheet
+        text, number, date, empty = xlrd.XL_CELL_TEXT, xlrd.XL_CELL_NUMBER, xlrd.XL_CELL_DATE, xlrd.XL_CELL_EMPTY
+        sheet = self.Sheet([['Specimen', 'Date', 'Tray'],
+                            ['EP 1/98', '02/07/98', 3.0],
+                            ['', '', ''],
+                            ['EP 2/98', 36000.0, '']],
+                           [[text, text, text], [text, text, number], [empty, empty, empty], [text, date, empty]])
+        rows, skipped_count = read_sheet(sheet, 0, [('number', 0), ('date', 1), ('tray', 2)], date_fields=['date'],
+                                         required_field='number')
+        self.assertEqual(skipped_count, 1)
+        self.assertEqual(rows, [('EP 1/98', datetime(1998, 7, 2), 3.0), ('EP 2/98', datetime(1998, 7, 24), '')])
+
+    def test_load(self):
+        from unittest import mock
+        from mlp.models import Occurrence, Archaeology
+        from projects.workbooks import WorkbookLoader, WorkbookRows
+        extra = dict(basis_of_record="FossilSpecimen", collecting_method="Surface Standard",
+                     field_number=datetime.now(), geom="POINT (40.8352906016 11.5303732536)")
+        workbooks = [('/data/mlp_2014.xls', dict(extra, item_type='Artifactual')), ('/data/mlp_2015.xls', extra)]
+        rows = [WorkbookRows('/data/mlp_2014.xls', ['barcode', 'find_type'], [(1, 'flake'), (2, 'core')], 1, 0.5,
+                             None),
+                WorkbookRows('/data/mlp_2015.xls', [], [], 0, 0.1, 'Invalid header list, unknown columns Tray')]
+        loader = WorkbookLoader(Archaeology, {})
+        with mock.patch.object(loader, 'read', return_value=iter(rows)):
+            results = list(loader.load(workbooks))
+        self.assertEqual([(result.created_count, result.skipped_count, result.row_count) for result in results],
+                         [(2, 1, 3), (0, 0, 0)])
+        self.assertEqual(results[1].error, 'Invalid header list, unknown columns Tray')
+        # multi-table objects get their occurrence row, with the values of the workbook
+        self.assertEqual(sorted(Archaeology.objects.values_list('barcode', 'find_type', 'item_type')),
+                         [(1, 'flake', 'Artifactual'), (2, 'core', 'Artifactual')])
+        self.assertEqual(Occurrence.objects.count(), 2)
+
+
+class CleaningTests(TestCase):
+    """
+    Test the set based cleaning of verbatim columns
+    """
+    def setUp(self):
+        from mlp.models import Biology
+        for pk, name in enumerate(['Anacus', 'cf. Anacus', None, 'Gazella', 'Anacus'], start=1):
+            Biology.objects.create(id=pk, item_scientific_name=name, type_status='Gazella' if name else 'old',
+                                   basis_of_record="FossilSpecimen", collecting_method="Surface Standard")
+
+    def test_replacements(self):
+        from projects.cleaning import Replacements
+        replace = Replacements({'ab': 'AB', 'abc': 'ABC', 'Cf.': 'cf.'})
+        self.assertEqual(replace('hey abc Cf.'), 'hey ABC cf.')
+        self.assertEqual(Replacements({})('abc'), 'abc')
+
+    def test_clean_column(self):
+        from mlp.models import Biology
+        from projects.cleaning import Replacements, clean_column
+        replace = Replacements({'Anacus': 'Anancus', 'cf. ': ''})
+
+        def clean(name):
+            if name is None:
+                return {'type_status': None}
+            cleaned = {'type_status': replace(name)}
+            if name.startswith('cf.'):
+                cleaned['sex'] = 'cf.'
+            return cleaned
+        with CaptureQueriesContext(connection) as queries:
+            log = clean_column(Biology.objects.all(), 'item_scientific_name', ['type_status', 'sex'], clean)
+        # one query reading the distinct values, one update per changed column
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 2)
+        self.assertEqual(log.summary(), {'type_status': 4, 'sex': 1})
+        self.assertEqual(list(Biology.objects.order_by('pk').values_list('type_status', 'sex')),
+                         [('Anancus', None), ('Anancus', 'cf.'), (None, None), ('Gazella', None), ('Anancus', None)])
+        self.assertEqual(clean_column(Biology.objects.all(), 'item_scientific_name', ['type_status', 'sex'], clean), [])
+
+
+class StubAuthorityHandler(BaseHTTPRequestHandler):
+    """
+    Stub of the PBDB and iDigBio services, knowing the genera Gazella and Homo
+    """
+    protocol_version = 'HTTP/1.1'  # keep the connections open
+    known = {'Gazella': 25, 'Homo': 12}
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        if parts.path == '/data1.2/taxa/single.txt':
+            name = query['name'][0]
+            status = 200 if name in self.known else 404
+            body = '"taxon_name","taxon_rank","n_occs"\r\n"{}","genus","{}"\r\n'.format(
+                name, self.known.get(name)) if status == 200 else 'Unknown taxon'
+        elif parts.path == '/v2/search/records/':
+            name = list(json.loads(query['rq'][0]).values())[0]
+            status = 500 if name == 'Broken' else 200
+            body = json.dumps({'itemCount': self.known.get(name, 0), 'items': []})
+        else:
+            status, body = 404, ''
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubAuthorityServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TaxonAuthorityTests(SimpleTestCase):
+    """
+    Test the cached taxon authority client against a local stub server
+    """
+    def setUp(self):
+        self.server = StubAuthorityServer(('127.0.0.1', 0), StubAuthorityHandler)
+        self.server.paths = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.directory = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.directory, 'taxa.sqlite3')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def make_client(self, timeout=None):
+        return TaxonAuthorityClient(TaxonCache(self.cache_path, timeout), max_connections=4, pbdb_url=self.url,
+                                    idigbio_url=self.url)
+
+    def test_pbdb_taxa(self):
+        client = self.make_client()
+        taxa = client.pbdb_taxa(['Gazella', 'Homo', 'Anacus', 'Gazella'])
+        self.assertEqual(taxa, {'Gazella': {'taxon_name': 'Gazella', 'taxon_rank': 'genus', 'n_occs': '25'},
+                                'Homo': {'taxon_name': 'Homo', 'taxon_rank': 'genus', 'n_occs': '12'},
+                                'Anacus': None})
+        self.assertEqual(client.network_calls, 3)
+
+    def test_warm_run(self):
+        keys = [('Gazella', 'genus'), ('Homo', 'genus'), ('Anacus', 'genus')]
+        cold = self.make_client().idigbio_records(keys)
+        self.assertEqual(len(self.server.paths), 3)
+        # a new client reads the same cache file, without any request
+        client = self.make_client()
+        self.assertEqual(client.idigbio_records(keys), cold)
+        self.assertEqual(client.network_calls, 0)
+        self.assertEqual(len(self.server.paths), 3)
+        self.assertEqual(cold[('Anacus', 'genus')]['itemCount'], 0)
+
+    def test_timeout(self):
+        self.make_client().pbdb_taxa(['Gazella'])
+        time.sleep(0.1)
+        client = self.make_client(timeout=0.05)
+        client.pbdb_taxa(['Gazella'])
+        self.assertEqual(client.network_calls, 1)
+
+    def test_failed_lookups_not_cached(self):
+        client = self.make_client()
+        self.assertEqual(client.idigbio_records([('Broken', 'genus'), ('Homo', 'genus')]),
+                         {('Homo', 'genus'): {'itemCount': 12, 'items': []}})
+        self.assertEqual([key for authority, key, error in client.errors], [('Broken', 'genus')])
+        client.idigbio_records([('Broken', 'genus'), ('Homo', 'genus')])
+        self.assertEqual(client.network_calls, 3)
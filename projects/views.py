@@ -1,3 +1,21 @@
 from django.shortcuts import render
 
-# Create your views here.
+from projects.summary import OccurrenceSummary
+
+
+class OccurrenceSummaryMixin(object):
+    """
+    Context of the project summary pages: occurrence counts by subtype and basis of record, and barcode warnings.
+    The view model is the occurrence model of the project app, see projects.summary.OccurrenceSummary
+    """
+    summary_class = OccurrenceSummary
+
+    def get_summary(self):
+        return self.summary_class(self.model)
+
+    def get_context_data(self, **kwargs):
+        context = super(OccurrenceSummaryMixin, self).get_context_data(**kwargs)
+        summary = self.get_summary()
+        context['occurrence_counts'] = summary.counts()
+        context['warnings'] = summary.warnings()
+        return context
@@ -0,0 +1,252 @@
+"""
+Loading of Excel workbooks into project models, e.g. the EPPE CSHO catalog workbooks (see eppe.import_1998_2005).
+
+The workbooks are read in parallel by worker processes. Each worker opens its workbook on demand, so that only the
+sheets read are loaded, and converts the rows of the largest sheet into tuples of field values. The main process
+inserts the rows of each workbook with bulk_create, in one transaction per workbook, while the other workbooks are
+still being read.
+
+    loader = WorkbookLoader(Fossil, lookup_dict, date_fields=['verbatim_date_discovered'],
+                            required_field='verbatim_specimen_number')
+    for result in loader.load([(path, {'verbatim_workbook_year': 1998})]):
+        print(result)
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+import xlrd
+from django.db import transaction
+
+
+def open_book(folder, file, on_demand=False):
+    """
+    Open an Excel workbook
+    :param folder: string representing folder path with starting and ending slashes,
+    e.g. '/Users/dnr266/Documents/PaleoCore/projects/Laetoli/csho_versions/'
+    :param file: string representation of the file name, with no slashes, e.g. 'laetoli_csho_1998.xls'
+    :param on_demand: only load the sheets when they are first read
+    :return: Returns an xlrd workbook object
+    """
+    return xlrd.open_workbook(folder+file, on_demand=on_demand)
+
+
+def get_max_sheet(book):
+    """
+    Get the sheet in the workbook with the most rows of data
+    :param book: An xlrd book object, the other sheets of books opened on demand are unloaded
+    :return: Returns an xlrd sheet object
+    """
+    row_counts = []  # list of row counts for each sheet
+    for index in range(book.nsheets):
+        row_counts.append(book.sheet_by_index(index).nrows)
+        if book.on_demand:
+            book.unload_sheet(index)
+    max_sheet_index = row_counts.index(max(row_counts))  # find list index for largest sheet
+    return book.sheet_by_index(max_sheet_index)  # return the sheet with the greatest number of rows
+
+
+def get_header_list(sheet):
+    """
+    Get a list of header row cell values.
+    :param sheet:
+    :return: Returns a list of values from the first row in the sheet.
+    """
+    return sheet.row_values(0)
+
+
+def convert_date_value(cell_type, value, date_mode):
+    """
+    Convert a date cell value, the spreadsheet date columns have mixed values, some are strings and others are dates
+    expressed as integers in Excel date format.
+    :return: Returns a python datetime object, with default time, or None for other cell types.
+    """
+    if cell_type == xlrd.XL_CELL_TEXT:
+        try:
+            return datetime.strptime(value, '%d/%m/%y')
+        except ValueError:
+            return datetime.strptime(value, '%d/%m/%Y')
+    elif cell_type == xlrd.XL_CELL_DATE:
+        return xlrd.xldate_as_datetime(value, date_mode)
+    return None
+
+
+def convert_date(date_cell, date_mode):
+    """
+    Convert the dates in the excel spreadsheets into python datetime objects, see convert_date_value
+    :param date_cell:
+    :param date_mode:
+    :return: Returns a python datetime object, with default time.
+    """
+    return convert_date_value(date_cell.ctype, date_cell.value, date_mode)
+
+
+def get_columns(header_list, lookup_dict, fields=None):
+    """
+    Map the columns of a sheet to model fields with a dictionary of column names.
+    When several columns map to the same field, e.g. 'Tray' and 'tray', the last one is used.
+    :param fields: names of the model fields, columns mapped to other fields are left out
+    :return: list of (field name, column index) tuples
+    """
+    unknown = [column for column in header_list if column not in lookup_dict]
+    if unknown:
+        raise ValueError('Invalid header list, unknown columns {}'.format(', '.join(map(str, unknown))))
+    columns = {}
+    for index, column in enumerate(header_list):
+        field = lookup_dict[column]
+        if fields is None or field in fields:
+            columns[field] = index
+    return sorted(columns.items(), key=lambda item: item[1])
+
+
+def read_sheet(sheet, date_mode, columns, date_fields=(), required_field=None, header_row=True):
+    """
+    Read the rows of a sheet as tuples of field values, in the order of columns
+    :param columns: list of (field name, column index) tuples, see get_columns
+    :param date_fields: fields converted with convert_date_value
+    :param required_field: rows without a value in this field, e.g. blank rows, are skipped
+    :return: list of row tuples and number of rows skipped
+    """
+    indexes = [index for field, index in columns]
+    date_indexes = set(index for field, index in columns if field in date_fields)
+    required_position = [field for field, index in columns].index(required_field) if required_field else None
+    rows = []
+    skipped_count = 0
+    for row_index in range(1 if header_row else 0, sheet.nrows):
+        values = sheet.row_values(row_index)
+        if date_indexes:
+            types = sheet.row_types(row_index)
+            row = tuple(convert_date_value(types[index], values[index], date_mode) if index in date_indexes
+                        else values[index] for index in indexes)
+        else:
+            row = tuple(values[index] for index in indexes)
+        if required_position is not None and not row[required_position]:
+            skipped_count += 1
+        else:
+            rows.append(row)
+    return rows, skipped_count
+
+
+WorkbookRows = namedtuple('WorkbookRows', 'path fields rows skipped_count read_time error')
+
+
+def read_workbook(path, lookup_dict, fields=None, date_fields=(), required_field=None):
+    """
+    Read the largest sheet of a workbook, run in the worker processes of WorkbookLoader
+    :return: WorkbookRows, with the error message of invalid headers
+    """
+    started = time.time()
+    book = xlrd.open_workbook(path, on_demand=True)
+    try:
+        sheet = get_max_sheet(book)
+        try:
+            columns = get_columns(get_header_list(sheet), lookup_dict, fields)
+        except ValueError as error:
+            return WorkbookRows(path, [], [], 0, time.time() - started, str(error))
+        if required_field and required_field not in dict(columns):
+            return WorkbookRows(path, [], [], 0, time.time() - started, 'No column for {}'.format(required_field))
+        rows, skipped_count = read_sheet(sheet, book.datemode, columns, date_fields, required_field)
+    finally:
+        book.release_resources()
+    return WorkbookRows(path, [field for field, index in columns], rows, skipped_count, time.time() - started, None)
+
+
+class WorkbookLoadResult(object):
+    """
+    Counts and timing of the load of a workbook
+    """
+    def __init__(self, workbook_rows, created_count=0, write_time=0):
+        self.path = workbook_rows.path
+        self.error = workbook_rows.error
+        self.created_count = created_count
+        self.skipped_count = workbook_rows.skipped_count
+        self.read_time = workbook_rows.read_time
+        self.write_time = write_time
+
+    @property
+    def row_count(self):
+        return self.created_count + self.skipped_count
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.read_time + self.write_time
+        return self.row_count / elapsed if elapsed else 0
+
+    def __str__(self):
+        if self.error:
+            return '{}: {}'.format(os.path.basename(self.path), self.error)
+        return '{}: {} rows, {} created, {} skipped, read in {:.1f}s, written in {:.1f}s, {:.0f} rows per second'\
+            .format(os.path.basename(self.path), self.row_count, self.created_count, self.skipped_count,
+                    self.read_time, self.write_time, self.rows_per_second)
+
+
+class WorkbookLoader(object):
+    """
+    Load the rows of Excel workbooks into a model, one object per row of the largest sheet of each workbook.
+    :param lookup_dict: dictionary mapping column names to model field names, columns mapped to names that are not
+    fields of the model are not loaded
+    :param date_fields: fields of the date columns, see convert_date_value
+    :param required_field: field of the rows to load, rows without a value in this field are skipped
+    :param workers: number of processes reading the workbooks, by default one per workbook up to the number of CPUs
+    """
+    def __init__(self, model, lookup_dict, date_fields=(), required_field=None, workers=None):
+        self.model = model
+        self.lookup_dict = lookup_dict
+        self.date_fields = date_fields
+        self.required_field = required_field
+        self.workers = workers
+        self.fields = set(field.name for field in model._meta.concrete_fields)
+
+    def read(self, paths):
+        """
+        Read workbooks in worker processes
+        :return: iterator of WorkbookRows, in the order of paths
+        """
+        workers = min(self.workers or os.cpu_count() or 1, len(paths))
+        arguments = (paths, repeat(self.lookup_dict), repeat(self.fields), repeat(self.date_fields),
+                     repeat(self.required_field))
+        if workers <= 1:
+            for workbook_rows in map(read_workbook, *arguments):
+                yield workbook_rows
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for workbook_rows in executor.map(read_workbook, *arguments):
+                yield workbook_rows
+
+    def build(self, values, extra):
+        """
+        An unsaved object from the field values of a row
+        :param values: dictionary of the row values by field name
+        :param extra: dictionary of field values of the workbook, see load
+        """
+        return self.model(**dict(values, **extra))
+
+    def insert(self, objs):
+        parents = self.model._meta.parents
+        if parents:
+            # multi-table inheritance, e.g. eppe Fossil, see bulk_create_occurrences
+            from projects.imports import bulk_create_occurrences
+            bulk_create_occurrences(next(iter(parents)), objs)
+        else:
+            self.model._default_manager.bulk_create(objs)
+
+    def load(self, workbooks):
+        """
+        Load workbooks, the rows of each workbook are inserted in one transaction
+        :param workbooks: list of (path, dictionary of field values set on all the objects of the workbook) tuples
+        :return: iterator of WorkbookLoadResult, in the order of workbooks
+        """
+        extras = dict(workbooks)
+        for workbook_rows in self.read([path for path, extra in workbooks]):
+            if workbook_rows.error:
+                yield WorkbookLoadResult(workbook_rows)
+                continue
+            started = time.time()
+            extra = extras[workbook_rows.path]
+            objs = [self.build(dict(zip(workbook_rows.fields, row)), extra) for row in workbook_rows.rows]
+            with transaction.atomic():
+                self.insert(objs)
+            yield WorkbookLoadResult(workbook_rows, len(objs), time.time() - started)
@@ -1,5 +1,6 @@
 from django.contrib.gis.db import models
 import projects.models
+from projects.taxonomy import TaxonIndex
 from django.db.models import Manager as GeoManager
 
 app_label = "psr"
@@ -253,6 +254,13 @@ class Biology(Occurrence):
     def __str__(self):
         return str(self.taxon.__str__())
 
+    def match_taxon(self):
+        """
+        find taxon objects from item_scientific_name
+        Return: (True/False, match_count, match_list)
+        """
+        return TaxonIndex.for_model(Taxon).match(self.item_scientific_name)
+
     class Meta:
         verbose_name = f"{app_label.upper()} Biology"
         verbose_name_plural = f"{app_label.upper()} Biology"
@@ -2,6 +2,9 @@ __author__ = 'reedd'
 
 from .models import Occurrence, Archaeology, Biology, Geology, Taxon, IdentificationQualifier
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
+from projects.matching import OccurrenceMatcher
+from projects.summary import OccurrenceSummary
+from projects.taxonomy import TaxonIndex
 import collections
 
 import re
@@ -123,14 +126,15 @@ def get_identification_qualifier_from_string(id_qual_string):
     :param id_qual_string:
     :return:
     """
+    taxon_index = TaxonIndex.for_model(Taxon)
     if id_qual_string in ['', ' ', None]:
         return None
     elif id_qual_string in ['cf.', 'cf', 'c.f.']:
-        return IdentificationQualifier.objects.get(name='cf.')  # some fault tolerance for punctuation
+        return taxon_index.get_qualifier('cf.')  # some fault tolerance for punctuation
     elif id_qual_string in ['aff.', 'aff', 'a.f.f.']:
-        return IdentificationQualifier.objects.get(name='aff.')
+        return taxon_index.get_qualifier('aff.')
     else:
-        return IdentificationQualifier.objects.get(name=id_qual_string)  # last change to match novel idq
+        return taxon_index.get_qualifier(id_qual_string)  # last change to match novel idq
     # If no match is found ObjectDoesNotExist error is raised.
 
 
@@ -141,27 +145,14 @@ def get_taxon_from_scientific_name(scientific_name):
     :return: returns a taxon object.
     """
     clean_name, taxon_name_list = split_scientific_name(scientific_name)
-    taxon_name_list_length = len(taxon_name_list)
-    taxon = Taxon.objects.get(name__exact='Life')  # default taxon
-    id_qual_names = [i.name for i in IdentificationQualifier.objects.all()]  # get list of id qualifier names
-    # If there is no scientific name, the taxon name list will be empty and default, 'Life' will be returned
-    if taxon_name_list_length >= 1:  # if there is a scientific name...
-        taxon_string = taxon_name_list[-1]  # get the last element
-        try:
-            # This method of getting the taxon risks matching the wrong species name
-            # If the taxonomy table only inlcudes Mammalia:Suidae:Kolpochoeris afarensis
-            # trying to match Mammalia:Primates:Australopithecus afarensis will succeed in error
-            taxon = Taxon.objects.get(name__exact=taxon_string)
-        except MultipleObjectsReturned:  # if multiple taxa match a species name
-            index = -2
-            parent_name = taxon_name_list[index]  # get the next name in the list
-            while parent_name in id_qual_names:  # if the name is an id qualifier ignore it and advance to next item
-                index -=1
-                parent_name = taxon_name_list[index]  # get first parent item in list that is not an id qualifier
-            parent = Taxon.objects.get(name__exact=parent_name)  # find the matching parent object
-            taxon = Taxon.objects.filter(name__exact=taxon_string).filter(parent=parent)[0]
-        except ObjectDoesNotExist:
-            print("No taxon found to match {}".format(taxon_string))
+    taxon_index = TaxonIndex.for_model(Taxon)  # names and id qualifiers are matched in memory
+    taxon = taxon_index.from_name_list(taxon_name_list)
+    if taxon is None:
+        # Matching on the last name risks matching the wrong species name
+        # If the taxonomy table only inlcudes Mammalia:Suidae:Kolpochoeris afarensis
+        # trying to match Mammalia:Primates:Australopithecus afarensis will succeed in error
+        print("No taxon found to match {}".format(taxon_name_list[-1]))
+        taxon = taxon_index.get('Life')  # default taxon
     return taxon
 
 
@@ -268,13 +259,7 @@ def get_finds():
     Get Finds that are not subclassses, e.g. Find but not Biology
     :return: Returns a queryset of Find objects
     """
-    all_find_ids = {f.id for f in Occurrence.objects.all()}
-    subclass_ids = {f.occurrence_ptr_id for f in Biology.objects.all()} | \
-                   {f.occurrence_ptr_id for f in Archaeology.objects.all()} | \
-                   {f.occurrence_ptr_id for f in Geology.objects.all()}
-    find_ids = all_find_ids.difference(subclass_ids)
-    # return list(find_ids)
-    return Occurrence.objects.filter(id__in=find_ids)
+    return OccurrenceSummary(Occurrence, subtype_models=[Archaeology, Biology, Geology]).no_subtype_occurrences()
 
 
 def subtype_finds():
@@ -460,44 +445,8 @@ def old_match(data_list):
 
 def match(data_list):
     print('\nMatching {} items in list'.format(len(data_list)))
-    full_match_list = []
-    coordinate_match_list = []
-    bad_match_list = []
-    for row in data_list:
-        catno = row[1]  # catalog number
-        lon = row[2]  # longitude
-        lat = row[3]  # latitude
-        basis = row[7]  # basis of record
-        cat_match_result = match_catalog_number(catno)
-        coord_match_result = match_coordinates(lon, lat)
-        # catalog match == coordinate match (only one object)
-        if cat_match_result[0] and coord_match_result[0] and cat_match_result[1] == coord_match_result[1][0]:
-            match_tuple = (row, cat_match_result[1])
-            full_match_list.append(match_tuple)
-        # coordinate match != catalog match, e.g. because there is an old or erroneous catalog number
-        elif coord_match_result[0] and not cat_match_result[0]:
-            match_tuple = (row, coord_match_result[1][0])
-            coordinate_match_list.append(match_tuple)
-        # catalog match in coordinate match list (more than one coordinate match)
-        elif cat_match_result[0] and len(coord_match_result[1]) >= 2:
-            matched_object = cat_match_result[1]
-            if matched_object in coord_match_result[1]:
-                match_tuple = (row, matched_object)
-                coordinate_match_list.append(match_tuple)
-        # No cat match and multiple coord matches, see if one is human observation
-        elif (not cat_match_result[0]) and (not coord_match_result[0]) and basis == 'HumanObservation':
-            if coord_match_result[1]:  # if there is a coordinate match result
-                if len(coord_match_result[1]) >= 2:
-                    matched_objects = [i for i in coord_match_result[1] if i.catalog_number == 'MLP-0']
-                    if len(matched_objects) == 1:
-                        match_tuple = (row, matched_objects[0])
-                        coordinate_match_list.append(match_tuple)
-        else:
-            # print "{}. Catalog number {} and coordinates {} {}, bad match.".format(count, catno, lon, lat)
-            match_tuple = (row, None)
-            bad_match_list.append(match_tuple)
-            #print match_tuple
-
+    matcher = OccurrenceMatcher(Biology, catalog_prefix='MLP')
+    full_match_list, coordinate_match_list, bad_match_list = matcher.match(data_list)
     print("Matches: {}\nCoordinate Matches: {}\nBad Matches: {}".format(len(full_match_list),
                                                                         len(coordinate_match_list),
                                                                         len(bad_match_list)))
@@ -621,8 +570,8 @@ def find_duplicate_catalog_number(mylist):
 def get_parent_name(taxon_name_list):
     index = -2
     parent_name = taxon_name_list[index]
-    id_qual_names = [i.name for i in IdentificationQualifier.objects.all()]
-    while parent_name in id_qual_names:
+    taxon_index = TaxonIndex.for_model(Taxon)
+    while taxon_index.is_qualifier(parent_name):
         index -= 1
         parent_name = taxon_name_list[index]
     return parent_name
@@ -747,9 +696,8 @@ def get_taxa_counts(rank=None):
     e.g. [(<Life>,<root>), (<Animalia>, <Kingdom>), ... ]
     """
 
-    biology_objects = Biology.objects.all()
-    taxon_set = set([b.taxon for b in biology_objects])
-    taxon_object_list = [(t, t.rank, taxon_count(t)) for t in taxon_set]
+    taxa = Taxon.objects.with_biology_counts().filter(biology_count__gt=0).select_related('rank')
+    taxon_object_list = [(t, t.rank, t.biology_count) for t in taxa]
     if rank:
         pass
     return taxon_object_list
@@ -0,0 +1,304 @@
+"""
+Indexed reader of GBIF occurrence downloads, tab separated files of several million rows.
+
+GbifDump builds a sidecar index next to the file once: the byte offset of every row, and for the indexed columns a
+dictionary of their distinct values with the value code of every row. Rows are then read in constant time from the
+memory mapped file, distinct values come from the dictionaries, and filters scan the value codes. Index builds and
+scans are split over worker processes.
+
+    dump = GbifDump('/data/gbif_fossil_data_200514.csv', columns=['countryCode'])
+    dump[1000]
+    dump.unique('countryCode')
+    dump.filter({'countryCode': 'KE', 'kingdom': 'Animalia'})
+
+This module does not import Django, so that the worker processes start without the project settings.
+"""
+import json
+import mmap
+import os
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+INDEX_VERSION = 1
+
+
+def _line_starts(data, start, end):
+    """
+    Byte offsets of the lines starting in [start, end) of a memory mapped file
+    """
+    if start > 0 and data[start - 1:start] != b'\n':
+        start = data.find(b'\n', start) + 1 or end  # skip the line started in the previous chunk
+    offsets = array('Q')
+    while start < end:
+        offsets.append(start)
+        start = data.find(b'\n', start) + 1 or len(data)
+    return offsets
+
+
+def _scan_chunk(path, start, end, column_indexes, delimiter, encoding):
+    """
+    Worker: offsets of the rows of a chunk and the dictionary encoding of their values in some columns
+    :return: (offsets, {column index: (values, codes)})
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offsets = _line_starts(data, start, end)
+        columns = {index: ({}, array('I')) for index in column_indexes}
+        if columns:
+            separator = delimiter.encode(encoding)
+            last = max(column_indexes)
+            for offset in offsets:
+                line_end = data.find(b'\n', offset)
+                fields = data[offset:line_end if line_end >= 0 else len(data)].rstrip(b'\r').split(separator,
+                                                                                               last + 1)
+                for index, (codes_by_value, codes) in columns.items():
+                    value = fields[index] if index < len(fields) else b''
+                    codes.append(codes_by_value.setdefault(value, len(codes_by_value)))
+        return offsets, {index: (list(codes_by_value), codes) for index, (codes_by_value, codes) in columns.items()}
+
+
+def _scan_codes(path, typecode, start, end, wanted):
+    """
+    Worker: row numbers in [start, end) whose value code is in wanted
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        codes = memoryview(data).cast(typecode)
+        try:
+            return array('Q', (row for row in range(start, end) if codes[row] in wanted))
+        finally:
+            codes.release()
+
+
+def _count_codes(path, typecode, start, end):
+    """
+    Worker: number of rows by value code in [start, end)
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        codes = memoryview(data).cast(typecode)
+        try:
+            return Counter(codes[start:end].tolist())
+        finally:
+            codes.release()
+
+
+class GbifDump(object):
+    """
+    A GBIF occurrence download with a sidecar index, in the directory index_path (by default <path>.index).
+    The index is built or extended on first use, and rebuilt when the file changes.
+    :param columns: names of the columns to index, more are indexed when they are first queried
+    :param workers: number of worker processes, by default the number of CPUs
+    """
+    def __init__(self, path, columns=(), index_path=None, workers=None, delimiter='\t', encoding='utf-8'):
+        self.path = path
+        self.index_path = index_path or path + '.index'
+        self.workers = workers or os.cpu_count() or 1
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = self._data.find(b'\n')
+        self.header = self._data[:header_end if header_end >= 0 else len(self._data)].rstrip(b'\r')\
+            .decode(encoding).split(delimiter)
+        self.meta = self._read_meta()
+        self._offsets = None
+        if self.meta is None:
+            self.build_index(columns)
+        else:
+            self.index_columns(columns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._offsets is not None:
+            self._offsets[1].release()
+            self._offsets[0].close()
+            self._offsets = None
+        self._data.close()
+        self._file.close()
+
+    # Index files
+    def _index_file(self, name):
+        return os.path.join(self.index_path, name)
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def _read_meta(self):
+        try:
+            with open(self._index_file('meta.json')) as f:
+                meta = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if meta.get('version') != INDEX_VERSION or meta.get('file') != self._file_signature():
+            return None  # stale index
+        return meta
+
+    def _write_meta(self):
+        with open(self._index_file('meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+
+    def _chunks(self, count, start=0):
+        """
+        Split [start, count) in ranges for the workers
+        """
+        size = max(1, -(-(count - start) // (self.workers * 4)))
+        return [(chunk_start, min(chunk_start + size, count)) for chunk_start in range(start, count, size)]
+
+    def _map(self, function, argument_lists):
+        if self.workers == 1 or len(argument_lists) == 1:
+            return [function(*arguments) for arguments in argument_lists]
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(function, *zip(*argument_lists)))
+
+    def _scan(self, column_indexes, with_offsets):
+        """
+        Scan the data rows in parallel chunks, return the row offsets and the dictionary encoded columns
+        """
+        data_start = self._data.find(b'\n') + 1 or len(self._data)
+        chunks = [(self.path, start, end, column_indexes, self.delimiter, self.encoding)
+                  for start, end in self._chunks(len(self._data), data_start)]
+        offsets = array('Q')
+        columns = {index: ([], {}, array('I')) for index in column_indexes}
+        for chunk_offsets, chunk_columns in self._map(_scan_chunk, chunks):
+            if with_offsets:
+                offsets.extend(chunk_offsets)
+            for index, (chunk_values, chunk_codes) in chunk_columns.items():
+                values, codes_by_value, codes = columns[index]
+                remap = []
+                for value in chunk_values:
+                    code = codes_by_value.get(value)
+                    if code is None:
+                        code = codes_by_value[value] = len(values)
+                        values.append(value)
+                    remap.append(code)
+                codes.extend(remap[code] for code in chunk_codes)
+        return offsets, columns
+
+    def build_index(self, columns=()):
+        """
+        Index the row offsets and some columns, replacing any previous index
+        """
+        os.makedirs(self.index_path, exist_ok=True)
+        column_indexes = [self.column_index(name) for name in columns]
+        offsets, encoded = self._scan(column_indexes, with_offsets=True)
+        offsets.append(len(self._data))  # end of the last row
+        with open(self._index_file('offsets.bin'), 'wb') as f:
+            offsets.tofile(f)
+        self.meta = {'version': INDEX_VERSION, 'file': self._file_signature(), 'row_count': len(offsets) - 1,
+                     'columns': {}}
+        self._save_columns(encoded)
+
+    def index_columns(self, columns):
+        """
+        Index more columns, in a single scan of the file
+        """
+        column_indexes = [self.column_index(name) for name in columns
+                          if name not in self.meta['columns']]
+        if column_indexes:
+            offsets, encoded = self._scan(column_indexes, with_offsets=False)
+            self._save_columns(encoded)
+
+    def _save_columns(self, encoded):
+        for index, (values, codes_by_value, codes) in encoded.items():
+            name = self.header[index]
+            # the narrowest array holding the codes
+            typecode = 'B' if len(values) <= 0xFF else 'H' if len(values) <= 0xFFFF else 'I'
+            if typecode != codes.typecode:
+                codes = array(typecode, codes)
+            with open(self._index_file('{}.codes'.format(index)), 'wb') as f:
+                codes.tofile(f)
+            with open(self._index_file('{}.values.json'.format(index)), 'w') as f:
+                json.dump([value.decode(self.encoding, 'replace') for value in values], f)
+            self.meta['columns'][name] = {'index': index, 'typecode': typecode, 'distinct': len(values)}
+        self._write_meta()
+
+    # Rows
+    def column_index(self, name):
+        try:
+            return self.header.index(name)
+        except ValueError:
+            raise KeyError('No column named {}'.format(name))
+
+    def __len__(self):
+        return self.meta['row_count']
+
+    def _get_offsets(self):
+        if self._offsets is None:
+            f = open(self._index_file('offsets.bin'), 'rb')
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            f.close()
+            self._offsets = (data, memoryview(data).cast('Q'))
+        return self._offsets[1]
+
+    def get_row(self, row_number):
+        """
+        A data row as a list of strings, the first row after the header is row 0
+        """
+        if not 0 <= row_number < len(self):
+            raise IndexError('Row {} out of range'.format(row_number))
+        offsets = self._get_offsets()
+        line = self._data[offsets[row_number]:offsets[row_number + 1]].rstrip(b'\r\n')
+        return line.decode(self.encoding).split(self.delimiter)
+
+    __getitem__ = get_row
+
+    def head(self, start=0, end=10):
+        return [self.get_row(row_number) for row_number in range(start, min(end, len(self)))]
+
+    def rows(self, row_numbers):
+        for row_number in row_numbers:
+            yield self.get_row(row_number)
+
+    # Columns
+    def values(self, column):
+        """
+        Distinct values of a column, in order of first appearance, indexed by value code
+        """
+        self.index_columns([column])
+        with open(self._index_file('{}.values.json'.format(self.column_index(column)))) as f:
+            return json.load(f)
+
+    def unique(self, column):
+        return set(self.values(column))
+
+    def _codes_args(self, column):
+        self.index_columns([column])
+        info = self.meta['columns'][column]
+        return self._index_file('{}.codes'.format(info['index'])), info['typecode']
+
+    def value_counts(self, column):
+        """
+        Number of rows by value of a column, counted in parallel
+        """
+        path, typecode = self._codes_args(column)
+        counts = Counter()
+        for chunk_counts in self._map(_count_codes, [(path, typecode, start, end)
+                                                     for start, end in self._chunks(len(self))]):
+            counts.update(chunk_counts)
+        values = self.values(column)
+        return Counter({values[code]: count for code, count in counts.items()})
+
+    def filter(self, criteria):
+        """
+        Numbers of the rows matching all the criteria, e.g. {'countryCode': 'KE', 'phylum': ['Chordata', 'Mollusca']}
+        Columns are scanned one after the other, each in parallel chunks, and the matching rows intersected.
+        """
+        self.index_columns(list(criteria))
+        row_numbers = None
+        for column, wanted in criteria.items():
+            wanted = set([wanted] if isinstance(wanted, str) else wanted)
+            wanted_codes = frozenset(code for code, value in enumerate(self.values(column)) if value in wanted)
+            if not wanted_codes:
+                return []
+            path, typecode = self._codes_args(column)
+            matches = array('Q')
+            for chunk_matches in self._map(_scan_codes, [(path, typecode, start, end, wanted_codes)
+                                                         for start, end in self._chunks(len(self))]):
+                matches.extend(chunk_matches)
+            row_numbers = matches if row_numbers is None else sorted(set(row_numbers).intersection(matches))
+        return list(row_numbers or [])
@@ -1,3 +1,41 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
+from standard.gbif import GbifDump
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+
+class GbifDumpTests(SimpleTestCase):
+    """
+    Test the indexed reader of GBIF downloads
+    """
+    rows = [['1', 'KE', 'Chordata'], ['2', 'ET', 'Mollusca'], ['3', 'KE', 'Mollusca'], ['4', '', 'Chordata']]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'gbif.csv')
+        with open(self.path, 'w') as f:
+            f.write('gbifID\tcountryCode\tphylum\n')
+            f.write(''.join('\t'.join(row) + '\n' for row in self.rows))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rows(self):
+        with GbifDump(self.path, workers=1) as dump:
+            self.assertEqual(len(dump), 4)
+            self.assertEqual(dump.header, ['gbifID', 'countryCode', 'phylum'])
+            self.assertEqual(dump[2], self.rows[2])
+            self.assertEqual(dump.head(0, 2), self.rows[:2])
+            with self.assertRaises(IndexError):
+                dump.get_row(4)
+
+    def test_columns(self):
+        with GbifDump(self.path, columns=['countryCode'], workers=1) as dump:
+            self.assertEqual(dump.unique('countryCode'), {'KE', 'ET', ''})
+            self.assertEqual(dump.value_counts('phylum'), {'Chordata': 2, 'Mollusca': 2})
+            self.assertEqual(dump.filter({'countryCode': 'KE', 'phylum': ['Mollusca']}), [2])
+            self.assertEqual(dump.filter({'countryCode': 'TZ'}), [])
+        with GbifDump(self.path, workers=1) as dump:  # the index is reused
+            self.assertEqual(sorted(dump.meta['columns']), ['countryCode', 'phylum'])
+            self.assertEqual(dump[3], self.rows[3])
@@ -6,6 +6,7 @@ from owlready2 import *
 import pandas
 from standard.models import Term, Project, TermCategory, ProjectTerm, TermStatus
 from pygbif import occurrences as occ
+from standard.gbif import GbifDump
 
 
 class Schema:
@@ -292,14 +293,23 @@ def get_csv_header():
     return header_list
 
 
+def get_gbif_dump(path=gbif_path):
+    """
+    Indexed reader of the GBIF download, the index is built on first use, see standard.gbif.GbifDump
+    """
+    if path not in _gbif_dumps:
+        _gbif_dumps[path] = GbifDump(path)
+    return _gbif_dumps[path]
+
+
+_gbif_dumps = {}
+
+
 def csv_head(start=1, end=10, verbose=True):
-    with open(gbif_path, newline='') as csvfile:
-        reader = csv.reader(csvfile, delimiter='\t')
-        header_list = next(reader)
-        array = [next(reader) for i in list(range(start, end+1))]
-        if verbose:
-            for r in array:
-                print(r)
+    array = get_gbif_dump().head(start - 1, end)
+    if verbose:
+        for r in array:
+            print(r)
     return array
 
 
@@ -309,39 +319,14 @@ def get_api_header():
 
 
 def get_unique(field_name):
-    with open(gbif_path, newline='') as csvfile:
-        reader = csv.reader(csvfile, delimiter='\t', quoting=csv.QUOTE_NONE)
-        header_list = next(reader)
-        field_index = header_list.index(field_name)
-        unique_set = set()
-        row_index = 0
-        error_count = 0
-        while row_index < 11642710:
-            row_index += 1
-            try:
-                row = next(reader)
-                unique_set.add(row[field_index])
-            except:
-                print('error reading row {}'.format(row_index))
-                error_count += 1
-            print("\r" + str(row_index), end="")
-        return unique_set
+    return get_gbif_dump().unique(field_name)
 
 
 def get_row(row_number):
-    with open(gbif_path, newline='') as csvfile:
-        #reader = csv.reader(csvfile, delimiter='\t')
-        reader = csv.reader(csvfile, delimiter='\t', quoting=csv.QUOTE_NONE)
-        header_list = next(reader)
-        row_index = 0
-        while row_index < 11642710:
-            row = next(reader)
-            row_index += 1
-            if row_index == row_number:
-                print(row)
-                break
+    row = get_gbif_dump().get_row(row_number - 1)
+    print(row)
+    return row
 
 
 def get_row_count(path=gbif_path):
-    with open(path, newline='') as f:
-        return sum(1 for line in f)
+    return len(get_gbif_dump(path)) + 1  # number of lines, including the header
@@ -1,5 +1,6 @@
 from django.contrib.gis.db import models
 import projects.models
+from projects.taxonomy import TaxonIndex
 from .ontologies import BASIS_OF_RECORD_VOCABULARY, ITEM_TYPE_VOCABULARY, COLLECTING_METHOD_VOCABULARY, \
     COLLECTOR_CHOICES, FIELD_SEASON_CHOICES, SIDE_VOCABULARY
 
@@ -223,12 +224,7 @@ class Fossil(Occurrence):
         find taxon objects from item_scientific_name
         Return: (True/False, match_count, match_list)
         """
-        match_list = Taxon.objects.filter(name=self.item_scientific_name)
-        if len(match_list) == 1:  # one match
-            result_tuple = (True, 1, match_list)
-        else:
-            result_tuple = (False, len(match_list), match_list)
-        return result_tuple
+        return TaxonIndex.for_model(Taxon).match(self.item_scientific_name)
 
     class Meta:
         verbose_name = app_name.upper()+" Fossil"